@@ -0,0 +1,152 @@
+"""Consumption rates and reorder suggestions from the stock history
+
+Every change of stanje is written to promene_stanja. The goods taken off
+the stock in the last WINDOW_DAYS days give each product a daily
+consumption, from which follow the days until it runs out and how much to
+order so it lasts LEAD_DAYS + COVER_DAYS.
+
+The sums are kept in a Forecast between calls. refresh() reads only the
+changes written since the previous call and recomputes only the products
+they touched, so asking again after a sale takes milliseconds however long
+the history is. numpy and pandas are imported on the first refresh, not
+when the application starts. Nothing here touches Tk.
+"""
+import datetime
+import threading
+
+import baza
+
+# Days of history the consumption is averaged over
+WINDOW_DAYS = 90
+
+# Days between ordering goods and receiving them
+LEAD_DAYS = 7
+
+# Days a suggested order should last once it arrives
+COVER_DAYS = 30
+
+# Products running out in this many days are shown on the dashboard
+SOON_DAYS = 7
+
+# Goods taken away for these reasons were used up. Deleting a product or
+# overwriting its stock from an import isn't consumption.
+CONSUMPTION_REASONS = (baza.RAZLOG_PRIJEM, baza.RAZLOG_POPIS)
+
+# Columns of Forecast.table(), besides the product id index
+COLUMNS = ("stanje", "potrosnja", "dnevno", "dana", "porudzbina")
+
+
+class Forecast:
+    """Consumption of every product in the window, updated incrementally"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._last_id = 0
+        self._start_day = None
+        self._by_day = {}        # day -> Series of consumption by product id
+        self._consumed = None    # Series of consumption in the window by product id
+        self._stanje = None      # Series of stanje of the products in _consumed
+
+    def reset(self):
+        """Forget everything, the next refresh() reads the whole window again"""
+        with self._lock:
+            self._path = None
+
+    def refresh(self):
+        """Read the changes made since the last refresh"""
+        import numpy as np
+        import pandas as pd
+
+        today = datetime.date.today().toordinal()
+        first_day = today - WINDOW_DAYS + 1
+        with self._lock:
+            if self._path != baza.DB_PATH:
+                self._path = baza.DB_PATH
+                self._last_id = 0
+                self._start_day = baza.fetch_history_start()
+                self._by_day = {}
+                self._consumed = pd.Series(dtype="int64")
+                self._stanje = pd.Series(dtype="int64")
+
+            rows = baza.fetch_consumption(self._last_id, first_day, CONSUMPTION_REASONS)
+            changes = np.array(rows, dtype=np.int64).reshape(-1, 4)
+            changed = set(changes[:, 1].tolist())
+            if len(changes):
+                self._last_id = int(changes[-1, 0])
+                used = pd.DataFrame(changes[:, 1:], columns=("proizvod_id", "dan", "potrosnja"))
+                used = used[used["potrosnja"] > 0]
+                for dan, group in used.groupby("dan"):
+                    per_product = group.groupby("proizvod_id")["potrosnja"].sum()
+                    if dan in self._by_day:
+                        per_product = self._by_day[dan].add(per_product, fill_value=0)
+                    self._by_day[dan] = per_product
+                self._consumed = self._consumed.add(
+                    used.groupby("proizvod_id")["potrosnja"].sum(), fill_value=0)
+
+            # Days that slid out of the window no longer count
+            for dan in [dan for dan in self._by_day if dan < first_day]:
+                expired = self._by_day.pop(dan)
+                self._consumed = self._consumed.sub(expired, fill_value=0)
+                changed.update(expired.index.tolist())
+
+            if changed:
+                self._consumed = self._consumed[self._consumed > 0].astype("int64")
+                wanted = [product_id for product_id in changed if product_id in self._consumed.index]
+                # Deleted products aren't found and drop out with their stanje
+                found = baza.fetch_products_by_ids(wanted) if wanted else []
+                self._stanje = pd.concat([
+                    self._stanje.drop(list(changed), errors="ignore"),
+                    pd.Series({row[0]: row[2] for row in found}, dtype="int64"),
+                ])
+
+    def table(self):
+        """DataFrame of the products consumed in the window, indexed by product id
+
+        stanje, potrosnja (consumed in the window), dnevno (per day), dana
+        (days until it runs out) and porudzbina (suggested order).
+        """
+        import numpy as np
+        import pandas as pd
+
+        self.refresh()
+        today = datetime.date.today().toordinal()
+        with self._lock:
+            frame = pd.DataFrame({"stanje": self._stanje, "potrosnja": self._consumed}).dropna()
+            start_day = self._start_day
+        # A younger history is averaged over the days it covers
+        days = WINDOW_DAYS if start_day is None else min(max(today - start_day + 1, 1), WINDOW_DAYS)
+        frame["dnevno"] = frame["potrosnja"] / days
+        frame["dana"] = frame["stanje"] / frame["dnevno"]
+        frame["porudzbina"] = np.ceil(
+            frame["dnevno"] * (LEAD_DAYS + COVER_DAYS) - frame["stanje"]).clip(lower=0).astype("int64")
+        return frame.astype({"stanje": "int64", "potrosnja": "int64"})[list(COLUMNS)]
+
+    def running_out(self, days=SOON_DAYS):
+        """Products still on stock that run out within days, soonest first
+
+        Returns (id, naziv, stanje, dnevno, dana, porudzbina) tuples.
+        """
+        frame = self.table()
+        frame = frame[(frame["stanje"] > 0) & (frame["dana"] <= days)].sort_values("dana")
+        names = {row[0]: row[1] for row in baza.fetch_products_by_ids(frame.index.tolist())} if len(frame) else {}
+        return [(product_id, names[product_id], row.stanje, row.dnevno, row.dana, row.porudzbina)
+                for product_id, row in zip(frame.index.tolist(), frame.itertuples())
+                if product_id in names]
+
+
+_forecast = Forecast()
+
+
+def table():
+    return _forecast.table()
+
+
+def running_out(days=SOON_DAYS):
+    return _forecast.running_out(days)
+
+
+def count_running_out(days=SOON_DAYS):
+    """Number of products on stock that run out within days"""
+    frame = _forecast.table()
+    return int(((frame["stanje"] > 0) & (frame["dana"] <= days)).sum())
@@ -1,12 +1,23 @@
+import time
+# Taken before the other imports, see report_startup_timing
+STARTUP_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk
-import time
+import sys
 import sqlite3
 import os
 from datetime import datetime
+import baza
+import analitika
 from vrste import VrsteFrame
 from zalihe import ZaliheFrame
 from kategorije import CategoriesFrame
+from tabela import VirtualTable
+import pozadina
+import dogadjaji
+import slike
+from izvoz_prozor import ExportWindow
 from tkinter import messagebox
 
 # Define a modern orange color scheme
@@ -59,15 +70,11 @@ class FilteredProductsWindow(tk.Toplevel):
         # Set window properties
         if filter_type == "low_stock":
             self.title("Proizvodi - Još malo pa nestalo")
-            self.filter_condition = "z.stanje BETWEEN 1 AND 10"
             self.iconbitmap("ico.ico")
-            self.sort_order = "z.stanje ASC"
             self.export_prefix = "jmpn"
         else:  # out_of_stock
             self.title("Proizvodi - Nestalo")
-            self.filter_condition = "z.stanje = 0"
             self.iconbitmap("ico.ico")
-            self.sort_order = "z.naziv"
             self.export_prefix = "nestalo"
             
         self.geometry("800x500")
@@ -117,8 +124,14 @@ class FilteredProductsWindow(tk.Toplevel):
         style.map('Treeview', 
                   background=[('selected', COLOR_ACCENT)])
         
-        # Create the Treeview widget for the table
-        self.tree = ttk.Treeview(table_frame, columns=("id", "naziv", "stanje"), show="headings")
+        # Create the table, only the visible rows are read from the database.
+        # The query needs the thresholds, it is built in the background, so
+        # the table says it is loading until the first rows are counted.
+        self.table = VirtualTable(table_frame, ("id", "naziv", "stanje"),
+                                  placeholder=("", "Učitavanje...", ""),
+                                  bg=COLOR_FRAME_BG, horizontal_scrollbar=False,
+                                  on_reload=self.loaded, on_error=self.show_load_error)
+        self.tree = self.table.tree
         
         # Define column headings
         self.tree.heading("id", text="ID")
@@ -130,177 +143,115 @@ class FilteredProductsWindow(tk.Toplevel):
         self.tree.column("naziv", width=250)
         self.tree.column("stanje", width=100)
         
-        # Add a scrollbar
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        # Pack the Treeview and scrollbar
-        self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        # Pack the table
+        self.table.pack(fill="both", expand=True)
         
         # Populate the table with data
         self.load_data()
+
+        # Products can move in and out of the list whenever their stock changes
+        pozadina.subscribe(self, dogadjaji.PRODUCT_EVENTS,
+                           lambda event: self.table.refresh_rows(event.ids))
+        pozadina.subscribe(self, (dogadjaji.SETTINGS_CHANGED, dogadjaji.EXTERNAL_CHANGE),
+                           lambda event: self.reload_query())
         self.lift()
         self.focus_force()
         self.grab_set()
     
     def load_data(self):
-        # Clear existing data
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        try:
-            # Connect to the database
-            conn = sqlite3.connect("garage.db")
-            cursor = conn.cursor()
-            
-            query = f"""
-                    SELECT z.id, z.naziv, 
-                    z.stanje 
-                    FROM zalihe z 
-                    WHERE {self.filter_condition}
-                    ORDER BY {self.sort_order}
-                """
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            # Insert data into the treeview
-            for row in rows:
-                self.tree.insert("", "end", values=row)
-                
-            # Ako nema podataka, dodaj poruku
-            if len(rows) == 0:
-                self.tree.insert("", "end", values=("", "Nema podataka", ""))
-                
-            conn.close()
-        except sqlite3.Error as e:
-            # Dodaj red sa greškom u tabelu da bi korisnik video
-            self.tree.insert("", "end", values=("", f"Greška: {e}", ""))
+        # Ako nema podataka, tabela prikazuje poruku "Nema podataka"
+        self.reload_query()
+
+    def loaded(self, total):
+        self.table.placeholder = ("", "Nema podataka", "")
+        if total == 0:
+            self.table.show_message(self.table.placeholder)
+
+    def reload_query(self):
+        # The thresholds may have changed, they are part of the query
+        pozadina.run(self, baza.filtered_products_query, self.filter_type,
+                     on_done=self.table.set_query, on_error=self.show_load_error)
+
+    def show_load_error(self, e):
+        # Dodaj red sa greškom u tabelu da bi korisnik video
+        self.table.show_message(("", f"Greška: {e}", ""))
     
     def export_data(self):
+        # Generate filename with current date and time
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        filename = f"export-{self.export_prefix}-{timestamp}.csv"
+        
+        # Written on its own thread into Documents/Garaza, with a progress bar
+        pozadina.run(self, baza.filtered_products_query, self.filter_type,
+                     on_done=lambda query: ExportWindow(self, query, ("ID", "Naziv", "Stanje"), filename))
+
+class ForecastWindow(tk.Toplevel):
+    """Products that run out soon by their consumption, with suggested orders"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Proizvodi - Nestaje ove nedelje")
         try:
-            # Connect to the database
-            conn = sqlite3.connect("garage.db")
-            cursor = conn.cursor()
-            
-            # Execute the query
-            query = f"""
-                SELECT z.id, z.naziv, z.stanje 
-                FROM zalihe z 
-                WHERE {self.filter_condition}
-                ORDER BY {self.sort_order}
-            """
-            
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            # Create directory if it doesn't exist
-            export_dir = os.path.join(os.path.expanduser("~"), "Documents", "garaza")
-            os.makedirs(export_dir, exist_ok=True)
-            
-            # Generate filename with current date and time
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            filename = f"export-{self.export_prefix}-{timestamp}.csv"
-            filepath = os.path.join(export_dir, filename)
-            
-            # Write data to CSV file
-            with open(filepath, "w", encoding="utf-8") as file:
-                # Write header
-                file.write("ID,Naziv,Stanje\n")
-                
-                # Write data rows
-                for row in rows:
-                    # Escape commas in text fields
-                    escaped_row = [str(cell).replace(",", ";") for cell in row]
-                    file.write(",".join(escaped_row) + "\n")
-            
-            # Show confirmation in a popup
-            confirm_window = tk.Toplevel(self)
-            confirm_window.title("Export uspešan")
-            confirm_window.geometry("400x150")
-            confirm_window.configure(bg=COLOR_BG)
-            
-            confirm_frame = tk.Frame(confirm_window, bg=COLOR_BG, padx=20, pady=20)
-            confirm_frame.pack(fill="both", expand=True)
-            
-            tk.Label(
-                confirm_frame,
-                text=f"Podaci su uspešno exportovani u:\n{filepath}",
-                font=("Segoe UI", 10),
-                bg=COLOR_BG,
-                fg=COLOR_TEXT,
-                wraplength=360,
-                justify="center"
-            ).pack(pady=10)
-            
-            close_button = ModernButton(
-                confirm_frame,
-                text="OK",
-                command=confirm_window.destroy
-            )
-            close_button.pack()
-            
-            conn.close()
-            
-        except Exception as e:
-            # Show error message
-            error_window = tk.Toplevel(self)
-            error_window.title("Greška")
-            error_window.geometry("400x150")
-            error_window.configure(bg=COLOR_BG)
-            
-            error_frame = tk.Frame(error_window, bg=COLOR_BG, padx=20, pady=20)
-            error_frame.pack(fill="both", expand=True)
-            
-            tk.Label(
-                error_frame,
-                text=f"Došlo je do greške prilikom exporta:\n{str(e)}",
-                font=("Segoe UI", 10),
-                bg=COLOR_BG,
-                fg="#e74c3c",  # Red color for error
-                wraplength=360,
-                justify="center"
-            ).pack(pady=10)
-            
-            close_button = ModernButton(
-                error_frame,
-                text="OK",
-                command=error_window.destroy
-            )
-            close_button.pack()
+            self.iconbitmap("ico.ico")
+        except tk.TclError:
+            pass
+        self.geometry("800x500")
+        self.configure(bg=COLOR_BG)
+
+        main_frame = tk.Frame(self, bg=COLOR_BG, padx=20, pady=20)
+        main_frame.pack(fill="both", expand=True)
+
+        tk.Label(main_frame, text=f"Proizvodi koji će nestati za {analitika.SOON_DAYS} dana ili manje",
+                 font=("Segoe UI", 14, "bold"), bg=COLOR_BG, fg=COLOR_TEXT).pack(anchor="w")
+        tk.Label(main_frame, text=f"Prosečna potrošnja u poslednjih {analitika.WINDOW_DAYS} dana, porudžbina "
+                                  f"treba da traje {analitika.LEAD_DAYS + analitika.COVER_DAYS} dana.",
+                 font=("Segoe UI", 9), bg=COLOR_BG, fg=COLOR_LIGHT_TEXT).pack(anchor="w", pady=(0, 15))
+
+        # Only a few products run out at a time, they are all shown at once
+        table_frame = tk.Frame(main_frame, bg=COLOR_FRAME_BG)
+        table_frame.pack(fill="both", expand=True)
+        columns = ("id", "naziv", "stanje", "dnevno", "dana", "porudzbina")
+        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("ID", "Naziv", "Stanje", "Dnevno", "Dana do kraja", "Poručiti"),
+                                    (50, 250, 80, 80, 100, 80)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor="w" if col == "naziv" else "center")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.load_data()
+        pozadina.subscribe(self, dogadjaji.PRODUCT_EVENTS + (dogadjaji.EXTERNAL_CHANGE,),
+                           lambda event: self.load_data())
+        self.lift()
+        self.focus_force()
+        self.grab_set()
+
+    def load_data(self):
+        pozadina.run(self, analitika.running_out, on_done=self.show_rows, on_error=self.show_load_error)
+
+    def show_rows(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        for product_id, naziv, stanje, dnevno, dana, porudzbina in rows:
+            self.tree.insert("", "end", values=(product_id, naziv, stanje, f"{dnevno:.1f}",
+                                                f"{dana:.1f}", porudzbina))
+        if not rows:
+            self.tree.insert("", "end", values=("", "Nema podataka", "", "", "", ""))
+
+    def show_load_error(self, e):
+        self.tree.delete(*self.tree.get_children())
+        self.tree.insert("", "end", values=("", f"Greška: {e}", "", "", "", ""))
 
 def check_database():
-    """Check if the database exists and create it if it doesn't"""
+    """Check if the database exists, create it and upgrade its schema if needed"""
     try:
-        if not os.path.exists("garage.db"):
-            # Database doesn't exist, create it
-            conn = sqlite3.connect("garage.db")
-            cursor = conn.cursor()
-            
-            # Create kategorije table
-            cursor.execute("""
-                CREATE TABLE kategorije (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    naziv TEXT NOT NULL UNIQUE
-                )
-            """)
-            
-            # Create zalihe table
-            cursor.execute("""
-                CREATE TABLE zalihe (
-                    id INTEGER PRIMARY KEY,
-                    naziv TEXT NOT NULL,
-                    slika TEXT,
-                    kategorija TEXT,
-                    stanje INTEGER DEFAULT 0
-                )
-            """)
-            
-            conn.commit()
-            conn.close()
+        created = not os.path.exists(baza.DB_PATH)
+        # Opening the pool runs the schema migrations
+        baza.get_pool()
+        if created:
             print("Database created successfully")
-            return True
-        return False
+        return created
     except sqlite3.Error as e:
         print(f"Database creation error: {e}")
         return False
@@ -411,6 +362,14 @@ class App(tk.Tk):
         self.content_frame.pack(expand=True, fill="both", padx=20, pady=15)
 
         self.trenutni_prikaz = None
+        # View class -> (view, data version it shows), see prikazi_kesirano
+        self.kesirani_prikazi = {}
+        self.pack_opcije = {}
+        # Dashboard counts follow every change of stock, here or in another program
+        pozadina.subscribe(self, (dogadjaji.PRODUCT_ADDED, dogadjaji.PRODUCT_DELETED,
+                                  dogadjaji.STOCK_CHANGED, dogadjaji.SETTINGS_CHANGED,
+                                  dogadjaji.EXTERNAL_CHANGE),
+                           self.on_stock_changed)
         self.prikazi_pocetnu()
 
         footer = tk.Label(self, text="© 2025 Alokyn | alokyn.com", bg=COLOR_BG, fg="#999999", font=("Segoe UI", 9))
@@ -422,10 +381,35 @@ class App(tk.Tk):
         self.after(1000, self.azuriraj_vreme)  # Update every 1 second
 
     def ocisti_prikaz(self):
-        if self.trenutni_prikaz:
-            self.trenutni_prikaz.destroy()
+        kesirani = [prikaz for prikaz, verzija in self.kesirani_prikazi.values()]
         for widget in self.content_frame.winfo_children():
-            widget.destroy()
+            if widget in kesirani:
+                # Cached views are only hidden, remember how they were packed
+                if widget.winfo_manager() == "pack":
+                    opcije = widget.pack_info()
+                    opcije.pop("in", None)
+                    self.pack_opcije[widget] = opcije
+                    widget.pack_forget()
+            else:
+                widget.destroy()
+        self.trenutni_prikaz = None
+
+    def prikazi_kesirano(self, frame_class):
+        """Show a view that is kept between menu clicks
+
+        The view is built once and after that only hidden and shown again.
+        Its data is read again only if the database changed in the meantime.
+        """
+        self.ocisti_prikaz()
+        verzija = baza.data_version()
+        prikaz, prikazana_verzija = self.kesirani_prikazi.get(frame_class, (None, None))
+        if prikaz is None:
+            prikaz = frame_class(self.content_frame)
+        elif prikazana_verzija != verzija:
+            prikaz.refresh()
+        self.kesirani_prikazi[frame_class] = (prikaz, verzija)
+        prikaz.pack(**self.pack_opcije.pop(prikaz, {"expand": True, "fill": "both"}))
+        self.trenutni_prikaz = prikaz
 
     def prikazi_pocetnu(self):
         self.ocisti_prikaz()
@@ -454,6 +438,14 @@ class App(tk.Tk):
         underline = tk.Frame(title_container, height=3, width=200, bg=COLOR_ACCENT)
         underline.pack(anchor="w", pady=(2, 0))
         
+        # Stock thresholds can be changed from the dashboard
+        settings_button = ModernButton(
+            title_frame,
+            text="Podešavanja",
+            command=self.prikazi_podesavanja
+        )
+        settings_button.place(relx=1.0, rely=0.0, anchor="ne")
+        
         # Create dashboard cards container
         cards_container = tk.Frame(main_container, bg=COLOR_BG)
         cards_container.pack(fill="x", pady=30)
@@ -462,7 +454,7 @@ class App(tk.Tk):
         self.frame_uskoro_nestalo = self.create_stat_card(
             cards_container, 
             "Jos malo pa nestalo", 
-            "Broj proizvoda koji imamo manje od 10 na stanju",
+            "",
             "#FF8C00",  # Orange color
             "low_stock"  # Add click_action parameter
         )
@@ -472,18 +464,91 @@ class App(tk.Tk):
         self.frame_nestalo = self.create_stat_card(
             cards_container, 
             "Nestalo", 
-            "Broj proizvoda koji su 0.",
+            "",
             "#FF8C00",  # Orange color
             "out_of_stock"  # Add click_action parameter
         )
         self.frame_nestalo.pack(side="left", padx=10, fill="both", expand=True)
+
+        # "Nestaje ove nedelje" Card, by consumption from the stock history
+        self.frame_nestaje = self.create_stat_card(
+            cards_container,
+            "Nestaje ove nedelje",
+            f"Proizvodi koji će nestati za {analitika.SOON_DAYS} dana ili manje",
+            "#FF8C00",  # Orange color
+            "runs_out"
+        )
+        self.frame_nestaje.pack(side="left", padx=10, fill="both", expand=True)
         
         # Fetch data from the database and update the cards
         self.fetch_product_counts()
+        self.fetch_running_out()
         
         # Store reference to current view
         self.trenutni_prikaz = main_container
 
+    def prikazi_podesavanja(self):
+        """Popup for changing the low stock and out of stock thresholds"""
+        pozadina.run(self, baza.fetch_thresholds,
+                     on_done=lambda pragovi: self.otvori_podesavanja(*pragovi))
+
+    def otvori_podesavanja(self, prag_malo, prag_nestalo):
+        popup = tk.Toplevel(self)
+        popup.title("Podešavanja")
+        popup.geometry("360x220")
+        popup.iconbitmap("ico.ico")
+        popup.resizable(False, False)
+        popup.configure(bg=COLOR_BG)
+        popup.grab_set()
+
+        frame = tk.Frame(popup, bg=COLOR_BG, padx=20, pady=20)
+        frame.pack(fill="both", expand=True)
+
+        tk.Label(frame, text="Još malo pa nestalo (najviše):", font=("Segoe UI", 10),
+                 bg=COLOR_BG, fg=COLOR_TEXT).grid(row=0, column=0, sticky="w", pady=8)
+        entry_malo = tk.Entry(frame, font=("Segoe UI", 10), bd=1, relief=tk.SOLID, width=8)
+        entry_malo.insert(0, str(prag_malo))
+        entry_malo.grid(row=0, column=1, sticky="w", padx=(10, 0), pady=8)
+
+        tk.Label(frame, text="Nestalo (najviše):", font=("Segoe UI", 10),
+                 bg=COLOR_BG, fg=COLOR_TEXT).grid(row=1, column=0, sticky="w", pady=8)
+        entry_nestalo = tk.Entry(frame, font=("Segoe UI", 10), bd=1, relief=tk.SOLID, width=8)
+        entry_nestalo.insert(0, str(prag_nestalo))
+        entry_nestalo.grid(row=1, column=1, sticky="w", padx=(10, 0), pady=8)
+
+        error_label = tk.Label(frame, text="", font=("Segoe UI", 9), bg=COLOR_BG, fg="#e74c3c")
+        error_label.grid(row=2, column=0, columnspan=2, sticky="w")
+
+        def sacuvaj(event=None):
+            try:
+                novi_malo = int(entry_malo.get())
+                novi_nestalo = int(entry_nestalo.get())
+            except ValueError:
+                error_label.config(text="Molimo unesite važeće brojeve")
+                return
+            if novi_nestalo >= novi_malo:
+                error_label.config(text="Prag za nestalo mora biti manji od praga za malo")
+                return
+
+            def sacuvano(result):
+                popup.destroy()
+                self.prikazi_pocetnu()
+
+            def greska(e):
+                messagebox.showerror("Greška", f"Greška pri čuvanju podešavanja: {e}")
+
+            pozadina.run(popup, baza.set_thresholds, novi_malo, novi_nestalo,
+                         on_done=sacuvano, on_error=greska)
+
+        button_frame = tk.Frame(frame, bg=COLOR_BG)
+        button_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
+        ModernButton(button_frame, text="Sačuvaj", command=sacuvaj).pack(side="left", padx=5)
+        ModernButton(button_frame, text="Odustani", bg="#e74c3c", command=popup.destroy).pack(side="left", padx=5)
+
+        entry_malo.bind("<Return>", sacuvaj)
+        entry_nestalo.bind("<Return>", sacuvaj)
+        popup.bind("<Escape>", lambda e: popup.destroy())
+
     def create_instruction_frame(self, parent, title, content, color_accent):
         """Creates an instruction frame for the UPUTSTVO section"""
         frame = tk.Frame(parent, bg=COLOR_FRAME_BG, bd=1, relief=tk.GROOVE)
@@ -577,11 +642,16 @@ class App(tk.Tk):
         )
         details_label.pack()
         
-        # Store the value label reference for easy updating
+        # Store the label references for easy updating
         if click_action == "low_stock":
             self.low_stock_label = value_label
+            self.low_stock_subtitle = subtitle_label
         elif click_action == "out_of_stock":
             self.out_of_stock_label = value_label
+            self.out_of_stock_subtitle = subtitle_label
+        elif click_action == "runs_out":
+            self.runs_out_label = value_label
+            self.runs_out_subtitle = subtitle_label
         
         # Add click functionality if specified
         if click_action:
@@ -599,50 +669,66 @@ class App(tk.Tk):
 
     def open_filtered_window(self, filter_type):
         """Opens a new window with filtered products"""
-        FilteredProductsWindow(self, filter_type)
+        if filter_type == "runs_out":
+            ForecastWindow(self)
+        else:
+            FilteredProductsWindow(self, filter_type)
+
+    def on_stock_changed(self, event):
+        # Only the dashboard shows the counts
+        if hasattr(self, 'low_stock_label') and self.low_stock_label.winfo_exists():
+            self.fetch_product_counts()
+            self.fetch_running_out()
+
+    def fetch_running_out(self):
+        # Only the changes since the last time are read, see analitika
+        def show(count):
+            if hasattr(self, 'runs_out_label') and self.runs_out_label.winfo_exists():
+                self.runs_out_label.config(text=str(count))
+
+        def failed(e):
+            # numpy and pandas aren't installed, or the history can't be read
+            if hasattr(self, 'runs_out_label') and self.runs_out_label.winfo_exists():
+                self.runs_out_label.config(text="-")
+                self.runs_out_subtitle.config(text=f"Procena nije dostupna: {e}")
+
+        pozadina.run(self, analitika.count_running_out, on_done=show, on_error=failed)
 
     def fetch_product_counts(self):
-        try:
-            # Open SQLite database connection
-            conn = sqlite3.connect("garage.db")
-            cursor = conn.cursor()
+        # Counts of products low on stock (Uskoro Nestalo) and out of
+        # stock (Nestalo), kept up to date by the database itself
+        def load():
+            return baza.fetch_thresholds(), baza.fetch_stock_counts()
 
-            # Count products with stanje between 1 and 10 (Uskoro Nestalo)
-            cursor.execute("SELECT COUNT(*) FROM zalihe WHERE stanje BETWEEN 1 AND 10")
-            uskoro_count = cursor.fetchone()[0]
+        def show(result):
+            (prag_malo, prag_nestalo), (uskoro_count, nestalo_count) = result
             
-            # Update the low stock count label
-            if hasattr(self, 'low_stock_label'):
+            # Update the low stock card
+            if hasattr(self, 'low_stock_label') and self.low_stock_label.winfo_exists():
                 self.low_stock_label.config(text=str(uskoro_count))
+                self.low_stock_subtitle.config(
+                    text=f"Broj proizvoda koji imamo najviše {prag_malo} na stanju")
 
-            # Count products with stanje equal to 0 (Nestalo)
-            cursor.execute("SELECT COUNT(*) FROM zalihe WHERE stanje = 0")
-            nestalo_count = cursor.fetchone()[0]
-            
-            # Update the out of stock count label
-            if hasattr(self, 'out_of_stock_label'):
+            # Update the out of stock card
+            if hasattr(self, 'out_of_stock_label') and self.out_of_stock_label.winfo_exists():
                 self.out_of_stock_label.config(text=str(nestalo_count))
+                self.out_of_stock_subtitle.config(
+                    text=f"Broj proizvoda koji su {prag_nestalo} ili manje.")
 
-            conn.close()  # Close the connection after use
-
-        except sqlite3.Error as e:
+        def failed(e):
             print(f"Error fetching data: {e}")
 
+        pozadina.run(self, load, on_done=show, on_error=failed)
+
     def prikazi_vrste(self):
-        self.ocisti_prikaz()
-        self.trenutni_prikaz = VrsteFrame(self.content_frame)
-        self.trenutni_prikaz.pack(expand=True, fill="both")
+        self.prikazi_kesirano(VrsteFrame)
 
     def prikazi_kategorije(self):
         """Display the Categories page"""
-        self.ocisti_prikaz()
-        self.trenutni_prikaz = CategoriesFrame(self.content_frame)
-        self.trenutni_prikaz.pack(expand=True, fill="both")
+        self.prikazi_kesirano(CategoriesFrame)
 
     def prikazi_zalihe(self):
-        self.ocisti_prikaz()
-        self.trenutni_prikaz = ZaliheFrame(self.content_frame)
-        self.trenutni_prikaz.pack(expand=True, fill="both")
+        self.prikazi_kesirano(ZaliheFrame)
 
     def prikazi_uputstvo(self):
         uputstvo_prozor = tk.Toplevel(self)
@@ -735,7 +821,30 @@ class App(tk.Tk):
         tekst_scroll.config(command=tekst.yview)
         uputstvo_prozor.grab_set()
 
+def report_startup_timing(app, imports_done):
+    """Print how long imports and the first paint of the main window took"""
+    def first_paint():
+        painted = time.perf_counter()
+        heavy = [name for name in ("pandas", "numpy", "openpyxl", "PIL") if name in sys.modules]
+        print(f"Imports: {(imports_done - STARTUP_STARTED) * 1000:.0f} ms")
+        print(f"First paint: {(painted - STARTUP_STARTED) * 1000:.0f} ms")
+        print(f"Heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+    # Idle callbacks run after Tk has drawn the pending window changes
+    app.after_idle(first_paint)
+
 if __name__ == "__main__":
+    imports_done = time.perf_counter()
     app = App()
     app.iconbitmap("ico.ico")
-    app.mainloop()
\ No newline at end of file
+    # Startup measurement, run with --timing or GARAZA_TIMING=1
+    if "--timing" in sys.argv or os.environ.get("GARAZA_TIMING"):
+        report_startup_timing(app, imports_done)
+    # HTTP/JSON access for scanners and other stations, run with --server
+    # or GARAZA_SERVER=1, see server.py
+    if "--server" in sys.argv or os.environ.get("GARAZA_SERVER"):
+        import server
+        server.start()
+    app.mainloop()
+    slike.close()
+    baza.close()
@@ -0,0 +1,886 @@
+import os
+import sys
+import sqlite3
+import re
+import datetime
+import threading
+import queue
+from contextlib import contextmanager
+import migracije
+import dogadjaji
+
+# Path to the SQLite database used by the whole application
+DB_PATH = "garage.db"
+
+# Number of read-only connections kept open next to the single writer
+READER_COUNT = 3
+
+# How many prepared statements each connection keeps in its cache
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a connection waits on a locked database before giving up
+BUSY_TIMEOUT = 10
+
+# WAL needs shared memory that only works when every station runs on the
+# computer holding the database, it corrupts databases on network drives.
+# None decides from the path (see is_network_path), GARAZA_WAL=1 or 0
+# forces it on or off.
+USE_WAL = {"1": True, "0": False}.get(os.environ.get("GARAZA_WAL", ""))
+
+# File systems of network drives in /proc/mounts
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "ncpfs"}
+
+# Most results shown by the as-you-type product search
+SEARCH_LIMIT = 20
+
+# Most values bound to a single "IN (...)" lookup, longer lists are split
+LOOKUP_CHUNK = 500
+
+# Stock changes written to promene_stanja between two snapshots of the
+# whole stock, see stock_as_of()
+SNAPSHOT_INTERVAL = 50000
+
+# Why stanje changed, saved with every row of promene_stanja
+RAZLOG_PRIJEM = "prijem"          # goods receipt and stock added or taken away
+RAZLOG_POPIS = "popis"            # stanje set to a counted value
+RAZLOG_UVOZ = "uvoz"              # import from a file
+RAZLOG_BRISANJE = "brisanje"      # product deleted with goods on stock
+
+# Products with their category name, as shown in the tables
+PRODUCT_COLUMNS = ("z.id", "z.naziv", "k.naziv", "z.stanje")
+PRODUCT_SOURCE = "zalihe z LEFT JOIN kategorije k ON k.id = z.kategorija_id"
+PRODUCT_COUNT_SOURCE = "zalihe z"
+
+# Filters used by the dashboard cards and FilteredProductsWindow, they take
+# the thresholds from podesavanja as parameters (see stock_filter_params).
+# The last column of each ordering is unique so it can be used as a page key
+STOCK_FILTERS = {
+    "low_stock": ("z.stanje > ? AND z.stanje <= ?", ("z.stanje", "z.naziv", "z.id")),
+    "out_of_stock": ("z.stanje <= ?", ("z.naziv", "z.id")),
+}
+
+
+def is_network_path(path):
+    """True if path is on a shared network drive"""
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        import ctypes
+        DRIVE_REMOTE = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == DRIVE_REMOTE
+    try:
+        with open("/proc/mounts", encoding="utf-8") as mounts:
+            # The longest mount point the path is under
+            fstype = max(((len(point), fstype) for device, point, fstype, *rest in map(str.split, mounts)
+                          if path == point or path.startswith(point.rstrip("/") + "/")), default=(0, ""))[1]
+    except OSError:
+        return False
+    return fstype in NETWORK_FILESYSTEMS
+
+
+class ConnectionPool:
+    """Keeps one writer and a few reader connections open for the whole session"""
+
+    def __init__(self, path=DB_PATH, readers=READER_COUNT):
+        self.path = path
+        self.wal = not is_network_path(path) if USE_WAL is None else USE_WAL
+        self._writer = self._connect()
+        self._writer_lock = threading.RLock()
+        # Only asked for PRAGMA data_version, see data_version()
+        self._monitor = self._connect()
+        self._monitor_lock = threading.Lock()
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        if self.wal:
+            # WAL lets readers keep working while the writer commits
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        else:
+            # Back from WAL if a station turned it on, only possible while
+            # nobody else has the database open, otherwise tried next time
+            try:
+                conn.execute("PRAGMA journal_mode=DELETE")
+            except sqlite3.OperationalError:
+                pass
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read connection from the pool"""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Use the writer connection inside a transaction"""
+        with self._writer_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    def data_version(self):
+        """Number that changes whenever anyone commits to the database
+
+        PRAGMA data_version of a connection changes with commits made by
+        every other connection, the writer here as well as other programs.
+        It doesn't wait for the writer lock, so it's cheap to ask often.
+        """
+        with self._monitor_lock:
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def external_version(self):
+        """PRAGMA data_version of the writer, or None if it is busy right now
+
+        The writer makes all changes of this program, so its data_version
+        only changes when some other program commits to the database.
+        """
+        if not self._writer_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._writer.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._writer_lock.release()
+
+    def close(self):
+        with self._monitor_lock:
+            self._monitor.close()
+        with self._writer_lock:
+            # Let SQLite refresh its statistics for the query planner
+            self._writer.execute("PRAGMA optimize")
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_executor = None
+
+
+def get_pool():
+    """Return the shared pool, opening it and upgrading the schema on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(DB_PATH)
+            try:
+                with pool._writer_lock:
+                    migracije.migrate(pool._writer)
+            except BaseException:
+                pool.close()
+                raise
+            _pool = pool
+        return _pool
+
+
+def configure(path):
+    """Point the data layer at another database file"""
+    global DB_PATH, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        DB_PATH = path
+
+
+def close():
+    """Wait for queued database work and close all pooled connections"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    configure(DB_PATH)
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn on a database worker thread, returns a concurrent.futures.Future
+
+    There is one worker per reader connection plus one for the writer, so
+    reads never wait behind a slow write.
+    """
+    global _executor
+    # Imported here, concurrent.futures pulls in logging and would slow
+    # down the start of the command line (cli), which never needs workers
+    from concurrent.futures import ThreadPoolExecutor
+
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=READER_COUNT + 1,
+                                           thread_name_prefix="baza")
+    return _executor.submit(fn, *args, **kwargs)
+
+
+def reader():
+    return get_pool().reader()
+
+
+def writer():
+    return get_pool().writer()
+
+
+def data_version():
+    return get_pool().data_version()
+
+
+def external_version():
+    return get_pool().external_version()
+
+
+def fetchall(query, params=()):
+    with reader() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def fetchone(query, params=()):
+    with reader() as conn:
+        return conn.execute(query, params).fetchone()
+
+
+def execute(query, params=()):
+    """Run a single write statement and return the cursor"""
+    with writer() as conn:
+        return conn.execute(query, params)
+
+
+class KeysetQuery:
+    """A SELECT that is read page by page instead of all at once
+
+    Pages are found with keyset pagination (WHERE key > ? LIMIT ?) so
+    reading the next page costs the same no matter how deep the user has
+    scrolled. Rows come back as (values, key) pairs. The last column of
+    order_by has to be unique, normally the row id. count_source can name
+    a cheaper FROM clause for counting, e.g. without joined lookup tables.
+    """
+
+    def __init__(self, columns, source, where="", params=(), order_by=("id",), count_source=None):
+        self.columns = list(columns)
+        self.source = source
+        self.count_source = count_source or source
+        self.where = where
+        self.params = tuple(params)
+        self.order_by = list(order_by)
+        self.id_column = self.order_by[-1]
+
+        self._width = len(self.columns)
+        self._select = f"SELECT {', '.join(self.columns + self.order_by)} FROM {source}"
+        if len(self.order_by) > 1:
+            self._key = f"({', '.join(self.order_by)})"
+            self._marks = f"({', '.join('?' * len(self.order_by))})"
+        else:
+            self._key = self.order_by[0]
+            self._marks = "?"
+        self._asc = ", ".join(f"{column} ASC" for column in self.order_by)
+        self._desc = ", ".join(f"{column} DESC" for column in self.order_by)
+
+    def _where(self, extra=None):
+        parts = [part for part in (self.where, extra) if part]
+        if not parts:
+            return ""
+        return " WHERE " + " AND ".join(f"({part})" for part in parts)
+
+    def _split(self, rows):
+        width = self._width
+        return [(row[:width], row[width:]) for row in rows]
+
+    def count(self):
+        return fetchone(f"SELECT COUNT(*) FROM {self.count_source}{self._where()}", self.params)[0]
+
+    def page_after(self, key, limit):
+        """Rows that come after key (or from the start if key is None)"""
+        if key is None:
+            query = f"{self._select}{self._where()} ORDER BY {self._asc} LIMIT ?"
+            return self._split(fetchall(query, self.params + (limit,)))
+        query = (f"{self._select}{self._where(f'{self._key} > {self._marks}')} "
+                 f"ORDER BY {self._asc} LIMIT ?")
+        return self._split(fetchall(query, self.params + tuple(key) + (limit,)))
+
+    def page_before(self, key, limit):
+        """Rows that come right before key, in ascending order"""
+        query = (f"{self._select}{self._where(f'{self._key} < {self._marks}')} "
+                 f"ORDER BY {self._desc} LIMIT ?")
+        rows = fetchall(query, self.params + tuple(key) + (limit,))
+        rows.reverse()
+        return self._split(rows)
+
+    def page_at(self, offset, limit):
+        """Rows starting at a position, used when the user jumps far away"""
+        query = f"{self._select}{self._where()} ORDER BY {self._asc} LIMIT ? OFFSET ?"
+        return self._split(fetchall(query, self.params + (limit, offset)))
+
+    def row(self, row_id):
+        """A single row by its id or None if it doesn't match the query"""
+        query = f"{self._select}{self._where(f'{self.id_column} = ?')}"
+        rows = self._split(fetchall(query, self.params + (row_id,)))
+        return rows[0] if rows else None
+
+    def position(self, key):
+        """Number of rows that come before key, where that row is in the whole result"""
+        query = f"SELECT COUNT(*) FROM {self.source}{self._where(f'{self._key} < {self._marks}')}"
+        return fetchone(query, self.params + tuple(key))[0]
+
+    def iter_pages(self, page_size):
+        """All rows in order as lists of values, page_size rows at a time
+
+        Every page is a separate short read, exports of any size never hold
+        more than one page in memory.
+        """
+        key = None
+        while True:
+            page = self.page_after(key, page_size)
+            if not page:
+                return
+            yield [values for values, _ in page]
+            key = page[-1][1]
+
+
+# Products
+
+def products_query(with_image=False):
+    """Rows for the Zalihe table, with_image adds the image path as the last column"""
+    columns = PRODUCT_COLUMNS + ("z.slika",) if with_image else PRODUCT_COLUMNS
+    return KeysetQuery(columns, PRODUCT_SOURCE, order_by=("z.id",),
+                       count_source=PRODUCT_COUNT_SOURCE)
+
+
+def product_list_query(with_image=False):
+    """Rows for the Vrste table, with_image adds the image path as the last column"""
+    columns = PRODUCT_COLUMNS[:3] + ("z.slika",) if with_image else PRODUCT_COLUMNS[:3]
+    return KeysetQuery(columns, PRODUCT_SOURCE, order_by=("z.id",),
+                       count_source=PRODUCT_COUNT_SOURCE)
+
+
+def fts_match(text):
+    """Turn user input into an FTS5 query that matches word prefixes
+
+    Returns None if the text contains no searchable words.
+    """
+    text = text.replace("đ", "dj").replace("Đ", "Dj")
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    # Quoting every word keeps FTS5 operators typed by the user harmless
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_products(text, limit=SEARCH_LIMIT):
+    """Best matching products for the search box, ordered by relevance"""
+    match = fts_match(text)
+    if match is None:
+        return []
+    return fetchall("""
+        SELECT z.id, z.naziv, k.naziv, z.stanje
+        FROM zalihe_fts f
+        JOIN zalihe z ON z.id = f.rowid
+        LEFT JOIN kategorije k ON k.id = z.kategorija_id
+        WHERE zalihe_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """, (match, limit))
+
+
+def naziv_search_query(naziv):
+    """All products whose name matches, for the search results table"""
+    match = fts_match(naziv)
+    if match is None:
+        return KeysetQuery(
+            PRODUCT_COLUMNS, PRODUCT_SOURCE, order_by=("z.id",),
+            count_source=PRODUCT_COUNT_SOURCE,
+            where="z.naziv LIKE ?", params=('%' + naziv + '%',)
+        )
+    return KeysetQuery(
+        PRODUCT_COLUMNS, PRODUCT_SOURCE, order_by=("z.id",),
+        count_source=PRODUCT_COUNT_SOURCE,
+        where="z.id IN (SELECT rowid FROM zalihe_fts WHERE zalihe_fts MATCH ?)",
+        params=(match,)
+    )
+
+
+def kategorija_query(category_id):
+    return KeysetQuery(
+        PRODUCT_COLUMNS, PRODUCT_SOURCE, order_by=("z.id",),
+        count_source=PRODUCT_COUNT_SOURCE,
+        where="z.kategorija_id = ?", params=(category_id,)
+    )
+
+
+def fetch_product(product_id):
+    """Return (id, naziv, slika, kategorija, stanje, sifra) of a product"""
+    return fetchone(f"""
+        SELECT z.id, z.naziv, z.slika, k.naziv, z.stanje, z.sifra
+        FROM {PRODUCT_SOURCE}
+        WHERE z.id = ?
+    """, (product_id,))
+
+
+def fetch_product_for_edit(product_id):
+    return fetchone(f"""
+        SELECT z.naziv, k.naziv, z.slika, z.sifra
+        FROM {PRODUCT_SOURCE}
+        WHERE z.id = ?
+    """, (product_id,))
+
+
+def find_product_by_sifra(sifra):
+    """Return the id of the product with this barcode or None, one probe of idx_zalihe_sifra"""
+    sifra = normalize_sifra(sifra)
+    if sifra is None:
+        return None
+    row = fetchone("SELECT id FROM zalihe WHERE sifra = ?", (sifra,))
+    return row[0] if row else None
+
+
+def normalize_sifra(sifra):
+    """sifra as saved, scanners may add spaces and no code is saved as NULL"""
+    sifra = (sifra or "").strip()
+    return sifra or None
+
+
+def fetch_used_categories():
+    """Categories that have at least one product, as (id, naziv) pairs"""
+    return fetchall("""
+        SELECT k.id, k.naziv FROM kategorije k
+        WHERE EXISTS (SELECT 1 FROM zalihe z WHERE z.kategorija_id = k.id)
+        ORDER BY k.naziv
+    """)
+
+
+# Every function changing data emits a dogadjaji event once the change is
+# committed, the views use them to refresh what is on screen
+
+def add_product(naziv, slika, category_id, sifra=None):
+    """Insert a product, raises sqlite3.IntegrityError if sifra is taken"""
+    product_id = execute(
+        "INSERT INTO zalihe (naziv, slika, kategorija_id, sifra) VALUES (?, ?, ?, ?)",
+        (naziv, slika, category_id, normalize_sifra(sifra))
+    ).lastrowid
+    dogadjaji.emit(dogadjaji.PRODUCT_ADDED, (product_id,))
+    return product_id
+
+
+def update_product(product_id, naziv, category_id, slika, sifra):
+    """Change a product, raises sqlite3.IntegrityError if sifra is taken"""
+    execute(
+        "UPDATE zalihe SET naziv = ?, kategorija_id = ?, slika = ?, sifra = ? WHERE id = ?",
+        (naziv, category_id, slika, normalize_sifra(sifra), product_id)
+    )
+    dogadjaji.emit(dogadjaji.PRODUCT_UPDATED, (product_id,))
+
+
+def delete_product(product_id):
+    with writer() as conn:
+        # Logged after the delete, a snapshot taken there must not see it
+        removed = conn.execute(
+            "DELETE FROM zalihe WHERE id = ? RETURNING id, -stanje", (product_id,)
+        ).fetchall()
+        _log_stock_changes(conn, removed, RAZLOG_BRISANJE)
+    dogadjaji.emit(dogadjaji.PRODUCT_DELETED, (product_id,))
+
+
+# Stock
+
+def _log_stock_changes(conn, changes, razlog):
+    """Write (product_id, delta) pairs to promene_stanja
+
+    Called inside the transaction that changes stanje, after the change,
+    so the history can't miss a change or hold one that was rolled back
+    and a snapshot taken here already includes it. Takes a new
+    snapshot once SNAPSHOT_INTERVAL changes were written since the last.
+    """
+    rows = [(product_id, delta, razlog) for product_id, delta in changes if delta]
+    if not rows:
+        return
+    conn.executemany("INSERT INTO promene_stanja (proizvod_id, promena, razlog) VALUES (?, ?, ?)", rows)
+    since_snapshot = conn.execute("""
+        SELECT MAX(id) - (SELECT COALESCE(MAX(poslednja_promena), 0) FROM preseci) FROM promene_stanja
+    """).fetchone()[0]
+    if since_snapshot >= SNAPSHOT_INTERVAL:
+        migracije.take_stock_snapshot(conn)
+
+
+def fetch_stock(product_id):
+    """Return the current stanje of a product or None if it doesn't exist"""
+    row = fetchone("SELECT stanje FROM zalihe WHERE id = ?", (product_id,))
+    return row[0] if row else None
+
+
+def set_stock(product_id, stanje):
+    """Set stanje of a product, returns False if the product doesn't exist
+
+    Overwrites changes other stations made in the meantime, use
+    adjust_stock() for goods that came in or went out.
+    """
+    with writer() as conn:
+        # The old stanje is read inside the write transaction, so no other
+        # station can change it before the update, and logged after it
+        conn.execute("BEGIN IMMEDIATE")
+        changes = conn.execute(
+            "SELECT id, ? - stanje FROM zalihe WHERE id = ?", (stanje, product_id)
+        ).fetchall()
+        found = conn.execute(
+            "UPDATE zalihe SET stanje = ? WHERE id = ?", (stanje, product_id)
+        ).rowcount > 0
+        _log_stock_changes(conn, changes, RAZLOG_POPIS)
+    if found:
+        dogadjaji.emit(dogadjaji.STOCK_CHANGED, (product_id,))
+    return found
+
+
+def adjust_stock(product_id, delta):
+    """Add delta (negative to take away) to stanje of a product
+
+    A single statement without reading stanje first, so changes made by
+    several stations at the same time all count. Returns the new stanje
+    or None if the product doesn't exist. Raises sqlite3.IntegrityError
+    if there isn't enough on stock.
+    """
+    with writer() as conn:
+        rows = conn.execute(
+            "UPDATE zalihe SET stanje = stanje + ? WHERE id = ? RETURNING stanje", (delta, product_id)
+        ).fetchall()
+        if rows:
+            _log_stock_changes(conn, [(product_id, delta)], RAZLOG_PRIJEM)
+    if not rows:
+        return None
+    dogadjaji.emit(dogadjaji.STOCK_CHANGED, (product_id,))
+    return rows[0][0]
+
+
+def _lookup(conn, select, column, values):
+    """Rows of select whose column is one of values, split into LOOKUP_CHUNK sized queries"""
+    values = list(dict.fromkeys(values))
+    rows = []
+    for i in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[i:i + LOOKUP_CHUNK]
+        rows += conn.execute(f"{select} WHERE {column} IN ({', '.join('?' * len(chunk))})",
+                             chunk).fetchall()
+    return rows
+
+
+def fetch_products_by_ids(product_ids):
+    """Return (id, naziv, stanje) of the products that exist among product_ids"""
+    with reader() as conn:
+        return _lookup(conn, "SELECT id, naziv, stanje FROM zalihe", "id", product_ids)
+
+
+def fetch_products_by_names(names):
+    """Return (id, naziv, stanje) of all products whose naziv is one of names"""
+    with reader() as conn:
+        return _lookup(conn, "SELECT id, naziv, stanje FROM zalihe", "naziv", names)
+
+
+def fetch_products_by_sifre(sifre):
+    """Return (id, naziv, stanje, sifra) of the products whose sifra is one of sifre"""
+    with reader() as conn:
+        return _lookup(conn, "SELECT id, naziv, stanje, sifra FROM zalihe", "sifra",
+                       [sifra for sifra in map(normalize_sifra, sifre) if sifra is not None])
+
+
+def receive_stock(changes):
+    """Add to stanje of many products in a single transaction
+
+    changes are (product_id, delta) pairs, a product may appear more than
+    once. Nothing is changed if one of the products doesn't exist, or
+    with sqlite3.IntegrityError if one would end up with negative stock.
+    """
+    changes = list(changes)
+    with writer() as conn:
+        updated = conn.executemany(
+            "UPDATE zalihe SET stanje = stanje + ? WHERE id = ?",
+            [(delta, product_id) for product_id, delta in changes]
+        ).rowcount
+        if updated != len(changes):
+            raise ValueError("Neki od proizvoda više ne postoje, stanje nije promenjeno")
+        _log_stock_changes(conn, changes, RAZLOG_PRIJEM)
+    dogadjaji.emit(dogadjaji.STOCK_CHANGED, dict.fromkeys(product_id for product_id, delta in changes))
+
+
+def import_products(rows):
+    """Add or update many products in one transaction, used by uvoz
+
+    rows are (row number, id, naziv, kategorija naziv, stanje) tuples. A
+    row with an id updates that product or adds it with this id. A row
+    without one updates the product with the same naziv, or adds a new
+    one. kategorija and stanje may be None to keep the current value
+    (no category and 0 for new products), missing categories are added.
+    Later rows win over earlier rows for the same product.
+
+    Returns (added, updated, categories added, errors), errors are
+    (row number, message) pairs of rows that were skipped.
+    """
+    errors = []
+    with writer() as conn:
+        # DDL doesn't open a transaction by itself, see fts_triggers_suspended
+        conn.execute("BEGIN IMMEDIATE")
+
+        names = {row[3] for row in rows if row[3]}
+        categories_added = conn.executemany(
+            "INSERT OR IGNORE INTO kategorije (naziv) VALUES (?)", [(naziv,) for naziv in names]
+        ).rowcount if names else 0
+        category_ids = dict(_lookup(conn, "SELECT naziv, id FROM kategorije", "naziv", names))
+
+        product_select = "SELECT id, naziv, kategorija_id, stanje FROM zalihe"
+        existing = {row[0]: row for row in
+                    _lookup(conn, product_select, "id", [row[1] for row in rows if row[1] is not None])}
+        by_name = {}
+        for row in _lookup(conn, product_select, "naziv", [row[2] for row in rows if row[1] is None]):
+            by_name.setdefault(row[1], []).append(row)
+
+        wanted = {}      # id -> row of products that exist
+        new = {}         # id or naziv -> row of products to add
+        for row_no, product_id, naziv, kategorija, stanje in rows:
+            kategorija_id = category_ids[kategorija] if kategorija else None
+            if product_id is None:
+                matches = by_name.get(naziv, [])
+                if len(matches) > 1:
+                    errors.append((row_no, f"Više proizvoda se zove '{naziv}', upišite ID"))
+                    continue
+                if matches:
+                    product_id = matches[0][0]
+                    existing.setdefault(product_id, matches[0])
+            if product_id in existing:
+                wanted[product_id] = (naziv, kategorija_id, stanje)
+            else:
+                new[naziv if product_id is None else product_id] = (product_id, naziv, kategorija_id, stanje)
+
+        changes = []
+        for product_id, (naziv, kategorija_id, stanje) in wanted.items():
+            old = existing[product_id]
+            change = (naziv,
+                      old[2] if kategorija_id is None else kategorija_id,
+                      old[3] if stanje is None else stanje)
+            if change != old[1:]:
+                changes.append(change + (product_id,))
+
+        with migracije.fts_triggers_suspended(conn):
+            conn.executemany(
+                "UPDATE zalihe SET naziv = ?, kategorija_id = ?, stanje = ? WHERE id = ?", changes
+            )
+            # Rows with an id first, a row without one takes the next free id
+            # and could take one that a later row asks for
+            added = [
+                (conn.execute(
+                    "INSERT INTO zalihe (id, naziv, kategorija_id, stanje) VALUES (?, ?, ?, ?)",
+                    (product_id, naziv, kategorija_id, 0 if stanje is None else stanje)
+                ).lastrowid, naziv, stanje)
+                for product_id, naziv, kategorija_id, stanje in sorted(new.values(), key=lambda row: row[0] is None)
+            ]
+            migracije.update_fts(conn, [(change[3], change[0]) for change in changes
+                                        if change[0] != existing[change[3]][1]],
+                                 [(product_id, naziv) for product_id, naziv, stanje in added])
+        _log_stock_changes(conn, [(change[3], change[2] - existing[change[3]][3]) for change in changes]
+                           + [(product_id, stanje or 0) for product_id, naziv, stanje in added], RAZLOG_UVOZ)
+
+    if categories_added:
+        dogadjaji.emit(dogadjaji.CATEGORY_CHANGED)
+    if added:
+        dogadjaji.emit(dogadjaji.PRODUCT_ADDED)
+    if changes:
+        dogadjaji.emit(dogadjaji.PRODUCT_UPDATED)
+        dogadjaji.emit(dogadjaji.STOCK_CHANGED)
+    return len(added), len(changes), categories_added, errors
+
+
+# Stock history
+
+def movements_query(product_id):
+    """Changes of stanje of one product, oldest first"""
+    return KeysetQuery(
+        ("m.id", "m.vreme", "m.promena", "m.razlog"), "promene_stanja m",
+        where="m.proizvod_id = ?", params=(product_id,), order_by=("m.id",)
+    )
+
+
+def _history_time(when):
+    """Text of when as saved in promene_stanja, a date means the end of that day"""
+    if isinstance(when, datetime.datetime):
+        return when.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(when, datetime.date):
+        return f"{when.isoformat()} 23:59:59"
+    return when
+
+
+def stock_as_of(when, product_id=None):
+    """Return {product_id: stanje} of the products that had goods on stock at when
+
+    when is a datetime, a date (its end) or text like "2024-05-01 12:00:00".
+    Starts from the last snapshot before when and adds the changes made
+    after it, so the cost doesn't grow with the length of the history.
+    Returns None if when is before the history starts. product_id limits
+    the answer to a single product.
+    """
+    when = _history_time(when)
+    product_filter = "" if product_id is None else "AND proizvod_id = :product_id"
+    with reader() as conn:
+        snapshot = conn.execute(
+            "SELECT id, poslednja_promena FROM preseci WHERE vreme <= ? ORDER BY vreme DESC, id DESC LIMIT 1",
+            (when,)
+        ).fetchone()
+        if snapshot is None:
+            return None
+        return dict(conn.execute(f"""
+            SELECT proizvod_id, SUM(stanje) FROM (
+                SELECT proizvod_id, stanje FROM preseci_stanja
+                WHERE presek_id = :presek_id {product_filter}
+                UNION ALL
+                SELECT proizvod_id, promena FROM promene_stanja
+                WHERE id > :poslednja_promena AND vreme <= :when {product_filter}
+            )
+            GROUP BY proizvod_id
+            HAVING SUM(stanje) != 0
+        """, {"presek_id": snapshot[0], "poslednja_promena": snapshot[1],
+              "when": when, "product_id": product_id}).fetchall())
+
+
+# Day of a promene_stanja time as a number, the same as date.toordinal()
+ORDINAL_DAY = "CAST(julianday(substr(vreme, 1, 10)) - 1721424.5 AS INTEGER)"
+
+
+def fetch_consumption(after_id, since_day, reasons):
+    """Return (id, product_id, day, consumed) of the changes after after_id, made on since_day or later
+
+    day is as date.toordinal(). consumed is how much was taken away by a
+    change with one of reasons, 0 for the other changes, which are still
+    returned so the caller knows their product's stanje changed.
+    """
+    since = datetime.date.fromordinal(since_day).isoformat()
+    with reader() as conn:
+        # Times only grow with the id, so the first change of since_day is
+        # found on the vreme index and the rest is read in id order
+        first = conn.execute("SELECT MIN(id) FROM promene_stanja WHERE vreme >= ?", (since,)).fetchone()[0]
+        if first is None:
+            return []
+        return conn.execute(f"""
+            SELECT id, proizvod_id, {ORDINAL_DAY},
+                   CASE WHEN promena < 0 AND razlog IN ({', '.join('?' * len(reasons))}) THEN -promena ELSE 0 END
+            FROM promene_stanja
+            WHERE id > ?
+            ORDER BY id
+        """, (*reasons, max(after_id, first - 1))).fetchall()
+
+
+def fetch_history_start():
+    """Day (as date.toordinal()) the stock history starts, None before migration v7"""
+    row = fetchone(f"SELECT MIN({ORDINAL_DAY}) FROM preseci")
+    return row[0] if row else None
+
+
+def fetch_stock_counts():
+    """Return (low stock count, out of stock count) for the dashboard
+
+    The counts are kept up to date by triggers on zalihe, so this reads a
+    single row no matter how many products there are.
+    """
+    row = fetchone("SELECT malo, nestalo FROM zalihe_zbirno WHERE kategorija_id = 0")
+    return tuple(row) if row else (0, 0)
+
+
+def fetch_thresholds():
+    """Return (low stock limit, out of stock limit)
+
+    A product is low on stock when out limit < stanje <= low limit and out
+    of stock when stanje <= out limit.
+    """
+    values = dict(fetchall("""
+        SELECT naziv, vrednost FROM podesavanja
+        WHERE naziv IN ('prag_malo', 'prag_nestalo')
+    """))
+    return values["prag_malo"], values["prag_nestalo"]
+
+
+def set_thresholds(low, out):
+    """Change the stock thresholds and count the dashboard numbers again"""
+    with writer() as conn:
+        conn.executemany(
+            "UPDATE podesavanja SET vrednost = ? WHERE naziv = ?",
+            [(low, "prag_malo"), (out, "prag_nestalo")]
+        )
+        migracije.rebuild_stock_summary(conn)
+    dogadjaji.emit(dogadjaji.SETTINGS_CHANGED)
+
+
+def stock_filter_params(filter_type):
+    low, out = fetch_thresholds()
+    return (out, low) if filter_type == "low_stock" else (out,)
+
+
+def filtered_products_query(filter_type):
+    condition, order = STOCK_FILTERS[filter_type]
+    return KeysetQuery(("z.id", "z.naziv", "z.stanje"), "zalihe z", where=condition,
+                       params=stock_filter_params(filter_type), order_by=order)
+
+
+# Categories
+
+def ensure_default_categories():
+    """Add the default categories if the table is empty"""
+    with writer() as conn:
+        if conn.execute("SELECT COUNT(*) FROM kategorije").fetchone()[0] != 0:
+            return
+        conn.executemany(
+            "INSERT INTO kategorije (naziv) VALUES (?)",
+            [("Alati",), ("Srafovi",)]
+        )
+    dogadjaji.emit(dogadjaji.CATEGORY_CHANGED)
+
+
+def fetch_category_ids():
+    """Map of category name to id, used by the category comboboxes"""
+    return dict(fetchall("SELECT naziv, id FROM kategorije ORDER BY naziv"))
+
+
+def categories_query():
+    """Categories with the number of their products"""
+    return KeysetQuery(
+        ("k.id", "k.naziv", "COALESCE(s.ukupno, 0)"),
+        "kategorije k LEFT JOIN zalihe_zbirno s ON s.kategorija_id = k.id",
+        order_by=("k.naziv", "k.id"), count_source="kategorije k"
+    )
+
+
+def fetch_category_name(category_id):
+    row = fetchone("SELECT naziv FROM kategorije WHERE id = ?", (category_id,))
+    return row[0] if row else None
+
+
+def add_category(naziv):
+    """Insert a category, raises sqlite3.IntegrityError if the name is taken"""
+    category_id = execute("INSERT INTO kategorije (naziv) VALUES (?)", (naziv,)).lastrowid
+    dogadjaji.emit(dogadjaji.CATEGORY_CHANGED, (category_id,))
+    return category_id
+
+
+def rename_category(category_id, naziv):
+    execute("UPDATE kategorije SET naziv = ? WHERE id = ?", (naziv, category_id))
+    dogadjaji.emit(dogadjaji.CATEGORY_CHANGED, (category_id,))
+
+
+def count_products_in_category(category_id):
+    row = fetchone("SELECT ukupno FROM zalihe_zbirno WHERE kategorija_id = ?", (category_id,))
+    return row[0] if row else 0
+
+
+def delete_category(category_id):
+    execute("DELETE FROM kategorije WHERE id = ?", (category_id,))
+    dogadjaji.emit(dogadjaji.CATEGORY_CHANGED, (category_id,))
+
+
+def delete_all_categories():
+    execute("DELETE FROM kategorije")
+    dogadjaji.emit(dogadjaji.CATEGORY_CHANGED)
@@ -0,0 +1,13 @@
+"""Benchmarks on generated databases of any size
+
+    python -m benchmark generisi 100k bench-100k.db
+    python -m benchmark pokreni bench-100k.db --izlaz pre.json
+    python -m benchmark uporedi pre.json posle.json
+
+generator makes a garage database with realistic names, categories, long
+image paths, barcodes and a stock history. runner times the data layer
+work behind the hot paths of the application: opening Zalihe, the
+dashboard counts, searches, the filtered lists, exports and stock changes.
+Results are JSON, so runs of two versions can be compared. Neither module
+needs Tk or a display.
+"""
@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+
+from benchmark import generator, runner
+
+
+def cmd_generisi(args):
+    products = generator.parse_size(args.broj)
+    written = generator.generate(args.putanja, products, categories=args.kategorije,
+                                 movements=args.promene, seed=args.seed,
+                                 progress=lambda text: print(text, file=sys.stderr))
+    print("Proizvoda: {}, kategorija: {}, promena stanja: {}".format(*written))
+
+
+def cmd_pokreni(args):
+    result = runner.run(args.putanja, only=args.samo, seed=args.seed,
+                        progress=lambda name: print(name, file=sys.stderr))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.izlaz:
+        with open(args.izlaz, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+def cmd_uporedi(args):
+    results = []
+    for path in (args.pre, args.posle):
+        with open(path, encoding="utf-8") as file:
+            results.append(json.load(file))
+    print(f"{'benchmark':<28}{'pre ms':>12}{'posle ms':>12}{'odnos':>9}")
+    for name, before, after, ratio in runner.compare(*results):
+        print(f"{name:<28}{before:>12.3f}{after:>12.3f}{'' if ratio is None else f'{ratio:.2f}x':>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Merenje brzine na generisanim bazama")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="komanda")
+
+    command = commands.add_parser("generisi", help="napravi novu bazu sa izmišljenim proizvodima")
+    command.add_argument("broj", help="broj proizvoda, npr. 10k, 100k ili 1M")
+    command.add_argument("putanja", help="fajl nove baze")
+    command.add_argument("--kategorije", type=int, help="broj kategorija (podrazumevano 1 na 200 proizvoda)")
+    command.add_argument("--promene", type=int, help="broj promena u istoriji stanja (podrazumevano 1 po proizvodu)")
+    command.add_argument("--seed", type=int, default=1)
+    command.set_defaults(run=cmd_generisi)
+
+    command = commands.add_parser("pokreni", help="izmeri brzinu na bazi, rezultat je JSON")
+    command.add_argument("putanja", help="fajl baze")
+    command.add_argument("--izlaz", metavar="PUTANJA", help="upiši JSON u fajl umesto na izlaz")
+    command.add_argument("--samo", nargs="+", metavar="NAZIV", help="samo merenja čiji naziv sadrži neki od ovih")
+    command.add_argument("--seed", type=int, default=1)
+    command.set_defaults(run=cmd_pokreni)
+
+    command = commands.add_parser("uporedi", help="uporedi dva JSON rezultata")
+    command.add_argument("pre")
+    command.add_argument("posle")
+    command.set_defaults(run=cmd_uporedi)
+
+    args = parser.parse_args(argv)
+    try:
+        args.run(args)
+    except (ValueError, OSError) as e:
+        print(f"Greška: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Synthetic garage databases for the benchmarks
+
+Everything comes from a seeded random.Random, the same arguments always
+give the same database. Rows are written in one transaction through the
+same helpers as uvoz (full-text triggers off, the index updated per chunk).
+
+The stock history is made up on its own, its sums don't add up to the
+stanje of the products.
+"""
+import datetime
+import os
+import random
+
+import baza
+import migracije
+
+# Rows written with one executemany
+CHUNK_SIZE = 50000
+
+# Days the generated stock history goes back
+HISTORY_DAYS = 730
+
+PARTS = ("Filter ulja", "Filter vazduha", "Filter goriva", "Kočione pločice", "Kočioni disk",
+         "Amortizer", "Svećica", "Sijalica H7", "Klinasti kaiš", "Zupčasti kaiš", "Akumulator",
+         "Metlica brisača", "Pumpa za vodu", "Termostat", "Ležaj točka", "Spona volana",
+         "Motorno ulje 5W-30", "Antifriz", "Poklopac rezervoara", "Šelna creva", "Čaura ramena",
+         "Hladnjak motora", "Senzor ABS", "Lambda sonda", "Kvačilo komplet")
+BRANDS = ("Bosch", "Mann", "Febi", "Sachs", "NGK", "Castrol", "Osram", "Gates", "Varta",
+          "Valeo", "Brembo", "Mahle", "SKF", "Denso", "Hella", "Lemförder", "TRW", "Continental")
+MODELS = ("Golf IV", "Golf VII", "Passat B6", "Astra H", "Corsa D", "Punto", "Clio III", "Megane II",
+          "Octavia II", "Fabia", "Focus II", "Fiesta", "Yaris", "Corolla", "Zastava 101", "Yugo 45")
+GROUPS = ("Filteri", "Kočioni sistem", "Vešanje", "Paljenje", "Rasveta", "Kaiševi", "Elektrika",
+          "Hlađenje", "Ulja i tečnosti", "Karoserija", "Alat", "Potrošni materijal")
+
+# Images sit deep in the user's folders, like on the garage PCs
+IMAGE_DIR = "C:\\Users\\Radionica\\Documents\\Garaza\\Slike proizvoda\\{group}\\{brand}"
+
+
+def parse_size(text):
+    """Number of products from "10k", "100k", "1M" or a plain number"""
+    text = text.strip().lower()
+    factor = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    number = int(text[:-1] if factor > 1 else text)
+    if number <= 0:
+        raise ValueError("Broj proizvoda mora biti veći od 0")
+    return number * factor
+
+
+def _categories(rng, count):
+    names = []
+    for i in range(count):
+        names.append(f"{GROUPS[i % len(GROUPS)]} {rng.choice(BRANDS)} {i + 1}")
+    return names
+
+
+def _products(rng, count, category_count, start_id):
+    """(id, naziv, slika, kategorija_id, stanje, sifra) rows"""
+    for product_id in range(start_id, start_id + count):
+        part = rng.choice(PARTS)
+        brand = rng.choice(BRANDS)
+        naziv = f"{part} {brand} {rng.choice(MODELS)} {rng.randrange(10000, 99999)}"
+        category_id = rng.randrange(1, category_count + 1)
+        slika = (IMAGE_DIR.format(group=GROUPS[(category_id - 1) % len(GROUPS)], brand=brand)
+                 + f"\\{part.lower().replace(' ', '_')}_{brand.lower()}_{product_id:07d}_originalna_fotografija.jpg")
+        # About a tenth sold out and a fifth running low
+        roll = rng.random()
+        stanje = 0 if roll < 0.1 else rng.randint(1, 10) if roll < 0.3 else rng.randint(11, 500)
+        yield product_id, naziv, slika, category_id, stanje, f"380{product_id:010d}"
+
+
+def _movements(rng, count, product_count):
+    """(proizvod_id, promena, razlog, vreme) rows, oldest first"""
+    start = datetime.datetime.now() - datetime.timedelta(days=HISTORY_DAYS)
+    step = HISTORY_DAYS * 86400 / max(count, 1)
+    for i in range(count):
+        vreme = start + datetime.timedelta(seconds=i * step)
+        # Mostly single items taken off the stock, now and then a delivery
+        promena = rng.randint(5, 50) if rng.random() < 0.15 else -rng.randint(1, 3)
+        razlog = baza.RAZLOG_PRIJEM if rng.random() < 0.95 else baza.RAZLOG_POPIS
+        yield rng.randrange(1, product_count + 1), promena, razlog, vreme.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate(path, products, categories=None, movements=None, seed=1, progress=None):
+    """Create a new database at path, returns (products, categories, movements) written
+
+    categories defaults to one per 200 products, movements (the stock
+    history) to one per product. progress(text) is called between steps.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} već postoji")
+    categories = categories or min(max(products // 200, 10), 5000)
+    movements = products if movements is None else movements
+    progress = progress or (lambda text: None)
+    rng = random.Random(seed)
+
+    # The pool creates the schema with the migrations of the application
+    baza.configure(path)
+    try:
+        with baza.writer() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            progress(f"Kategorije: {categories}")
+            conn.executemany("INSERT INTO kategorije (id, naziv) VALUES (?, ?)",
+                             enumerate(_categories(rng, categories), start=1))
+
+            with migracije.fts_triggers_suspended(conn):
+                written = 0
+                for chunk in _chunks(_products(rng, products, categories, 1)):
+                    conn.executemany("""
+                        INSERT INTO zalihe (id, naziv, slika, kategorija_id, stanje, sifra)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, chunk)
+                    migracije.update_fts(conn, [], [(row[0], row[1]) for row in chunk])
+                    written += len(chunk)
+                    progress(f"Proizvodi: {written}/{products}")
+
+            # The history starts with an empty stock, HISTORY_DAYS ago
+            conn.execute("UPDATE preseci SET vreme = datetime('now', 'localtime', ?)", (f"-{HISTORY_DAYS} days",))
+            written = 0
+            for chunk in _chunks(_movements(rng, movements, products)):
+                conn.executemany(
+                    "INSERT INTO promene_stanja (proizvod_id, promena, razlog, vreme) VALUES (?, ?, ?, ?)", chunk
+                )
+                written += len(chunk)
+                progress(f"Istorija stanja: {written}/{movements}")
+            migracije.take_stock_snapshot(conn)
+    finally:
+        baza.close()
+    return products, categories, movements
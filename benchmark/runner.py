@@ -0,0 +1,179 @@
+"""Timing of the hot paths on one database
+
+Every benchmark calls the same data layer functions the window does for
+that action, without Tk. The first call is reported on its own (cold
+caches, prepared statements), the other runs give min/median/mean.
+
+The stock change benchmarks put every stanje back as it was, but they do
+add rows to the stock history of the database.
+"""
+import importlib.util
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import baza
+import izvoz
+
+# Rows the tables read when they open, tabela.PAGE_SIZE (not imported,
+# tabela needs Tk)
+PAGE_SIZE = 200
+
+# Runs of every benchmark after the first one
+REPEAT = 20
+
+# Exports write the whole database, they run fewer times
+EXPORT_REPEAT = 2
+
+
+def _open_table(query, offset=0):
+    """What VirtualTable.reload() reads: the row count and one page"""
+    total = query.count()
+    return total, query.page_at(min(offset, max(total - 1, 0)), PAGE_SIZE)
+
+
+def _export(query, header, extension):
+    with tempfile.TemporaryDirectory() as directory:
+        return izvoz.export_atomic(query, os.path.join(directory, f"export{extension}"), header)
+
+
+def _benchmarks(rng):
+    """(name, function, runs) of every benchmark"""
+    product_count = baza.fetchone("SELECT COUNT(*) FROM zalihe")[0]
+    category_ids = [row[0] for row in baza.fetchall("SELECT id FROM kategorije")]
+    max_id = baza.fetchone("SELECT MAX(id) FROM zalihe")[0] or 1
+    words = ("filter", "bosch", "kocione plocice", "golf", "svecica ngk", "sel", "amortizer sachs")
+    sifre = [row[0] for row in baza.fetchall("SELECT sifra FROM zalihe WHERE sifra IS NOT NULL LIMIT 1000")]
+
+    def pick_id():
+        return rng.randint(1, max_id)
+
+    def set_stock():
+        # update_product_status, "Postavi" writes the same stanje back
+        product_id = pick_id()
+        stanje = baza.fetch_stock(product_id)
+        if stanje is not None:
+            baza.set_stock(product_id, stanje + 1)
+            baza.set_stock(product_id, stanje)
+
+    def adjust_stock():
+        product_id = pick_id()
+        if baza.adjust_stock(product_id, 1) is not None:
+            baza.adjust_stock(product_id, -1)
+
+    product_header = ("ID", "Naziv", "Kategorija", "Stanje")
+    benchmarks = [
+        # ZaliheFrame.load_data, and jumping to the middle with the scrollbar
+        ("zalihe_load_data", lambda: _open_table(baza.products_query(with_image=True)), REPEAT),
+        ("zalihe_scroll_middle", lambda: _open_table(baza.products_query(with_image=True), product_count // 2), REPEAT),
+        # App.fetch_product_counts
+        ("dashboard_counts", lambda: (baza.fetch_thresholds(), baza.fetch_stock_counts()), REPEAT),
+        # The search box while typing, and its results table after Enter
+        ("search_naziv", lambda: baza.search_products(rng.choice(words)), REPEAT),
+        ("search_naziv_table", lambda: _open_table(baza.naziv_search_query(rng.choice(words))), REPEAT),
+        ("search_kategorija_table",
+         lambda: _open_table(baza.kategorija_query(rng.choice(category_ids))) if category_ids else None, REPEAT),
+        # FilteredProductsWindow.load_data
+        ("filtered_low_stock", lambda: _open_table(baza.filtered_products_query("low_stock")), REPEAT),
+        ("filtered_out_of_stock", lambda: _open_table(baza.filtered_products_query("out_of_stock")), REPEAT),
+        ("scan_lookup", lambda: baza.find_product_by_sifra(rng.choice(sifre)) if sifre else None, REPEAT),
+        # ZaliheFrame.update_product_status and the stock popup buttons
+        ("update_product_status", set_stock, REPEAT),
+        ("adjust_stock", adjust_stock, REPEAT),
+        # ZaliheFrame.export_to_excel, and the CSV export of the filtered lists
+        ("export_csv", lambda: _export(baza.products_query(), product_header, ".csv"), EXPORT_REPEAT),
+    ]
+    if importlib.util.find_spec("openpyxl"):
+        benchmarks.append(("export_to_excel", lambda: _export(baza.products_query(), product_header, ".xlsx"),
+                           EXPORT_REPEAT))
+    if importlib.util.find_spec("pandas"):
+        import analitika
+        # The first run reads the whole window of history, later ones only what changed
+        benchmarks.append(("forecast_running_out", analitika.count_running_out, REPEAT))
+    return benchmarks
+
+
+def _measure(function, runs):
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    result = {"first_ms": round(first * 1000, 3), "runs": runs}
+    if times:
+        result.update(min_ms=round(min(times) * 1000, 3),
+                      median_ms=round(statistics.median(times) * 1000, 3),
+                      mean_ms=round(statistics.mean(times) * 1000, 3),
+                      max_ms=round(max(times) * 1000, 3))
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(baza.__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(path, only=None, seed=1, progress=None):
+    """Run the benchmarks on the database at path, returns a JSON-ready dict
+
+    only limits the run to benchmarks whose name contains one of its
+    strings. progress(name) is called before every benchmark.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} ne postoji")
+    rng = random.Random(seed)
+    baza.configure(path)
+    try:
+        started = time.perf_counter()
+        baza.get_pool()
+        opened = time.perf_counter() - started
+        results = {"open_database": {"first_ms": round(opened * 1000, 3), "runs": 0}}
+        for name, function, runs in _benchmarks(rng):
+            if only and not any(part in name for part in only):
+                continue
+            if progress is not None:
+                progress(name)
+            results[name] = _measure(function, runs)
+
+        return {
+            "commit": _git_commit(),
+            "database": os.path.abspath(path),
+            "database_bytes": os.path.getsize(path),
+            "products": baza.fetchone("SELECT COUNT(*) FROM zalihe")[0],
+            "categories": baza.fetchone("SELECT COUNT(*) FROM kategorije")[0],
+            "movements": baza.fetchone("SELECT COUNT(*) FROM promene_stanja")[0],
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "argv": sys.argv[1:],
+            "results": results,
+        }
+    finally:
+        baza.close()
+
+
+def compare(before, after):
+    """(name, before ms, after ms, after / before) of the benchmarks in both results
+
+    Compares the median, or the first run for single runs.
+    """
+    rows = []
+    for name, result in after["results"].items():
+        if name not in before["results"]:
+            continue
+        key = "median_ms" if "median_ms" in result and "median_ms" in before["results"][name] else "first_ms"
+        old, new = before["results"][name][key], result[key]
+        rows.append((name, old, new, new / old if old else None))
+    return rows
@@ -0,0 +1,167 @@
+"""Stock operations from the command line, without opening the window
+
+    python -m cli stanje 12
+    python -m cli promeni 12 -3
+    python -m cli postavi 12 40
+    python -m cli malo
+    python -m cli izvoz zalihe.xlsx --filter nestalo
+    python -m cli uvoz cenovnik.csv
+    python -m cli prijem prijemnica.txt
+
+Works on the same data layer as the application (baza, izvoz, uvoz and
+prijem) and never imports tkinter or PIL, so it starts fast enough to be
+called from scripts in a loop. Lists are printed tab separated, errors go
+to stderr with exit code 1.
+"""
+import argparse
+import sqlite3
+import sys
+
+import baza
+
+# Names of the filters on the command line and in baza.STOCK_FILTERS
+FILTERS = {"malo": "low_stock", "nestalo": "out_of_stock"}
+
+# Rows read from the database at once when listing products
+PAGE_SIZE = 2000
+
+
+class CommandError(Exception):
+    """A command can't be done, the message is shown to the user"""
+
+
+def _print_rows(rows):
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+def cmd_stanje(args):
+    stanje = baza.fetch_stock(args.id)
+    if stanje is None:
+        raise CommandError(f"Proizvod sa ID {args.id} ne postoji")
+    print(stanje)
+
+
+def cmd_promeni(args):
+    try:
+        stanje = baza.adjust_stock(args.id, args.kolicina)
+    except sqlite3.IntegrityError:
+        raise CommandError("Na stanju nema dovoljno proizvoda.")
+    if stanje is None:
+        raise CommandError(f"Proizvod sa ID {args.id} ne postoji")
+    print(stanje)
+
+
+def cmd_postavi(args):
+    if args.stanje < 0:
+        raise CommandError("Stanje ne može biti negativno")
+    if not baza.set_stock(args.id, args.stanje):
+        raise CommandError(f"Proizvod sa ID {args.id} ne postoji")
+
+
+def cmd_lista(args):
+    for rows in baza.filtered_products_query(FILTERS[args.command]).iter_pages(PAGE_SIZE):
+        _print_rows(rows)
+
+
+def cmd_broj(args):
+    prag_malo, prag_nestalo = baza.fetch_thresholds()
+    malo, nestalo = baza.fetch_stock_counts()
+    _print_rows([("malo", prag_malo, malo), ("nestalo", prag_nestalo, nestalo)])
+
+
+def cmd_izvoz(args):
+    import izvoz
+
+    if args.filter:
+        query = baza.filtered_products_query(FILTERS[args.filter])
+        header = ("ID", "Naziv", "Stanje")
+    else:
+        query = baza.products_query()
+        header = ("ID", "Naziv", "Kategorija", "Stanje")
+    written = izvoz.export_atomic(query, args.putanja, header)
+    print(f"Izvezeno redova: {written}")
+
+
+def cmd_uvoz(args):
+    import uvoz
+
+    result = uvoz.import_file(args.putanja)
+    for error in result.errors:
+        print(f"Red {error.row_no}: {error.message}", file=sys.stderr)
+    print(f"Dodato: {result.added}, izmenjeno: {result.updated}, "
+          f"novih kategorija: {result.categories_added}, preskočeno: {len(result.errors)}")
+
+
+def cmd_prijem(args):
+    import prijem
+
+    if args.putanja == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.putanja, encoding="utf-8-sig") as file:
+            text = file.read()
+    lines, errors = prijem.check(text)
+    if errors:
+        for error in errors:
+            print(f"Red {error.line_no}: {error.text}: {error.message}", file=sys.stderr)
+        raise CommandError("Prijem nije primenjen, ispravite redove sa greškom")
+    if not lines:
+        raise CommandError("Prijem je prazan")
+    print(f"Stanje je promenjeno za {prijem.apply(lines)} redova.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Moja E-Garaža bez prozora")
+    parser.add_argument("--baza", metavar="PUTANJA", help=f"fajl baze (podrazumevano {baza.DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="komanda")
+
+    command = commands.add_parser("stanje", help="stanje jednog proizvoda")
+    command.add_argument("id", type=int)
+    command.set_defaults(run=cmd_stanje)
+
+    command = commands.add_parser("promeni", help="dodaj na stanje ili oduzmi (negativna količina)")
+    command.add_argument("id", type=int)
+    command.add_argument("kolicina", type=int)
+    command.set_defaults(run=cmd_promeni)
+
+    command = commands.add_parser("postavi", help="postavi stanje na izbrojanu količinu")
+    command.add_argument("id", type=int)
+    command.add_argument("stanje", type=int)
+    command.set_defaults(run=cmd_postavi)
+
+    commands.add_parser("malo", help="proizvodi kojih je još malo").set_defaults(run=cmd_lista)
+    commands.add_parser("nestalo", help="proizvodi kojih nema").set_defaults(run=cmd_lista)
+    commands.add_parser("broj", help="pragovi i broj proizvoda kojih je malo i kojih nema").set_defaults(run=cmd_broj)
+
+    command = commands.add_parser("izvoz", help="izvoz u CSV ili Excel (.xlsx) fajl")
+    command.add_argument("putanja")
+    command.add_argument("--filter", choices=sorted(FILTERS), help="samo proizvodi kojih je malo ili nema")
+    command.set_defaults(run=cmd_izvoz)
+
+    command = commands.add_parser("uvoz", help="uvoz iz CSV ili Excel (.xlsx) fajla")
+    command.add_argument("putanja")
+    command.set_defaults(run=cmd_uvoz)
+
+    command = commands.add_parser("prijem", help="prijem robe iz tekstualnog fajla, - za standardni ulaz")
+    command.add_argument("putanja")
+    command.set_defaults(run=cmd_prijem)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.baza:
+        baza.configure(args.baza)
+    try:
+        args.run(args)
+    except (CommandError, ValueError, OSError, sqlite3.Error) as e:
+        print(f"Greška: {e}", file=sys.stderr)
+        return 1
+    finally:
+        baza.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
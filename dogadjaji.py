@@ -0,0 +1,74 @@
+"""Notifications about changed data
+
+The data layer in baza emits an event after every change it commits, the
+views subscribe to the kinds of events they show and refresh only what
+changed. Changes made by other programs are noticed by polling PRAGMA
+data_version and reported as EXTERNAL_CHANGE, without ids.
+
+This module doesn't know about Tk. Subscribers are called through the
+dispatcher, which calls them right away on the emitting thread unless
+set_dispatcher() says otherwise; pozadina installs one that hands them to
+the Tk main thread.
+"""
+import threading
+from collections import namedtuple
+
+PRODUCT_ADDED = "product_added"
+PRODUCT_UPDATED = "product_updated"
+PRODUCT_DELETED = "product_deleted"
+STOCK_CHANGED = "stock_changed"
+CATEGORY_CHANGED = "category_changed"
+SETTINGS_CHANGED = "settings_changed"
+EXTERNAL_CHANGE = "external_change"
+
+# Events after which a list of products may look different
+PRODUCT_EVENTS = (PRODUCT_ADDED, PRODUCT_UPDATED, PRODUCT_DELETED, STOCK_CHANGED)
+
+# ids are the ids of the changed products or categories, empty when it
+# isn't known which rows changed
+Event = namedtuple("Event", ("kind", "ids"))
+
+_subscribers = {}   # token -> (kinds, callback, owner)
+_next_token = 0
+_lock = threading.Lock()
+
+
+def _call(owner, callback, event):
+    callback(event)
+
+
+_dispatch = _call
+
+
+def set_dispatcher(dispatch):
+    """Deliver events with dispatch(owner, callback, event) from now on
+
+    owner is what was given to subscribe(), a dispatcher can use it to
+    drop events for subscribers that are gone.
+    """
+    global _dispatch
+    _dispatch = dispatch
+
+
+def subscribe(kinds, callback, owner=None):
+    """Call callback(event) for every event of one of kinds, returns a token for unsubscribe()"""
+    global _next_token
+    with _lock:
+        _next_token += 1
+        _subscribers[_next_token] = (frozenset(kinds), callback, owner)
+        return _next_token
+
+
+def unsubscribe(token):
+    with _lock:
+        _subscribers.pop(token, None)
+
+
+def emit(kind, ids=()):
+    """Tell the subscribers about a committed change, safe from any thread"""
+    event = Event(kind, tuple(ids))
+    with _lock:
+        subscribers = list(_subscribers.values())
+    for kinds, callback, owner in subscribers:
+        if kind in kinds:
+            _dispatch(owner, callback, event)
@@ -0,0 +1,152 @@
+"""Export of product lists to CSV and Excel files
+
+Rows are read from a baza.KeysetQuery page by page and written out right
+away, so exporting a million products takes as little memory as exporting
+ten. The export functions block, ExportJob runs one on its own thread with
+progress reports and cancellation.
+"""
+import csv
+import os
+import tempfile
+import threading
+
+# Rows read from the database and written at once
+PAGE_SIZE = 2000
+
+# Where the application saves exported files
+EXPORT_DIR = os.path.join(os.path.expanduser("~"), "Documents", "Garaza")
+
+
+class Cancelled(Exception):
+    """The export was stopped before it finished"""
+
+
+def export_path(filename):
+    return os.path.join(EXPORT_DIR, filename)
+
+
+def _write_pages(query, write_rows, progress):
+    total = query.count()
+    written = 0
+    if progress is not None:
+        progress(written, total)
+    for rows in query.iter_pages(PAGE_SIZE):
+        write_rows(rows)
+        written += len(rows)
+        if progress is not None:
+            progress(written, total)
+    return written
+
+
+def export_csv(query, path, header, progress=None):
+    """Write all rows of query to a CSV file, returns the number of rows
+
+    progress(written, total) is called after every page, on the thread
+    running the export.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        return _write_pages(query, writer.writerows, progress)
+
+
+def export_xlsx(query, path, header, progress=None):
+    """Write all rows of query to an Excel file, returns the number of rows"""
+    # openpyxl takes a good part of a second to import, only load it when
+    # somebody actually exports to Excel
+    from openpyxl import Workbook
+
+    # A write-only workbook streams rows to disk instead of keeping cells
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+
+    def append(rows):
+        for row in rows:
+            sheet.append(row)
+
+    written = _write_pages(query, append, progress)
+    workbook.save(path)
+    return written
+
+
+def export(query, path, header, progress=None):
+    """Export to CSV or Excel depending on the extension of path"""
+    if os.path.splitext(path)[1].lower() == ".xlsx":
+        return export_xlsx(query, path, header, progress)
+    return export_csv(query, path, header, progress)
+
+
+def export_atomic(query, path, header, progress=None, cancel_event=None):
+    """Like export(), but path only appears once the whole file is written
+
+    Rows go to a hidden temporary file in the same directory which is then
+    renamed to path. Setting cancel_event stops the export after the
+    current page with Cancelled, the temporary file is removed.
+    """
+    # A bare filename is written to the current directory
+    directory, filename = os.path.split(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{filename}.",
+                                         suffix=os.path.splitext(filename)[1])
+    os.close(handle)
+
+    def report(written, total):
+        if cancel_event is not None and cancel_event.is_set():
+            raise Cancelled()
+        if progress is not None:
+            progress(written, total)
+
+    try:
+        written = export(query, temp_path, header, report)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+class ExportJob(threading.Thread):
+    """Export running on its own thread
+
+    The callbacks are called on the export thread: on_progress(written,
+    total) after every page, then exactly one of on_done(path, written),
+    on_error(exception) or on_cancel().
+    """
+
+    def __init__(self, query, path, header, on_progress=None, on_done=None,
+                 on_error=None, on_cancel=None):
+        super().__init__(name="izvoz")
+        self.query = query
+        self.path = path
+        self.header = header
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop the export after the page that is being written"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            written = export_atomic(self.query, self.path, self.header,
+                                    self.on_progress, self._cancel_event)
+        except Cancelled:
+            if self.on_cancel is not None:
+                self.on_cancel()
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+        else:
+            if self.on_done is not None:
+                self.on_done(self.path, written)
@@ -0,0 +1,111 @@
+import tkinter as tk
+from tkinter import ttk
+
+import izvoz
+import pozadina
+
+# Define an orange color scheme
+COLOR_BG = "#ffffff"
+COLOR_ACCENT = "#FF8C00"  # Dark Orange
+COLOR_BUTTON = "#FF8C00"  # Dark Orange
+COLOR_BUTTON_TEXT = "#ffffff"
+COLOR_TEXT = "#333333"
+COLOR_LIGHT_TEXT = "#666666"
+COLOR_ERROR = "#e74c3c"
+
+class ModernButton(tk.Button):
+    def __init__(self, master=None, **kwargs):
+        # Extract specific styling params or use defaults
+        bg_color = kwargs.pop('bg', COLOR_BUTTON)
+        fg_color = kwargs.pop('fg', COLOR_BUTTON_TEXT)
+
+        # Call the parent constructor with our modified parameters
+        super().__init__(
+            master,
+            bg=bg_color,
+            fg=fg_color,
+            relief=tk.FLAT,
+            padx=10,
+            pady=4,
+            font=('Segoe UI', 9),
+            cursor="hand2",
+            activebackground=COLOR_ACCENT,
+            activeforeground=COLOR_BUTTON_TEXT,
+            **kwargs
+        )
+
+class ExportWindow(tk.Toplevel):
+    """Runs an izvoz.ExportJob and shows its progress
+
+    The file is written on the export thread, the window only shows how
+    many rows are done and lets the user stop the export. Closing the
+    window stops it as well, a half written file is never left behind.
+    """
+
+    def __init__(self, parent, query, header, filename):
+        super().__init__(parent)
+        self.title("Export")
+        self.geometry("420x170")
+        self.configure(bg=COLOR_BG)
+        self.resizable(False, False)
+        try:
+            self.iconbitmap("ico.ico")
+        except tk.TclError:
+            pass
+
+        frame = tk.Frame(self, bg=COLOR_BG, padx=20, pady=20)
+        frame.pack(fill="both", expand=True)
+
+        self.message_label = tk.Label(frame, text=f"Exportovanje u {filename}...",
+                                      font=("Segoe UI", 10), bg=COLOR_BG, fg=COLOR_TEXT,
+                                      wraplength=380, justify="center")
+        self.message_label.pack(pady=(0, 10))
+
+        self.progress = ttk.Progressbar(frame, mode="determinate", length=380)
+        self.progress.pack(fill="x")
+
+        self.count_label = tk.Label(frame, text="", font=("Segoe UI", 9),
+                                    bg=COLOR_BG, fg=COLOR_LIGHT_TEXT)
+        self.count_label.pack(pady=(5, 10))
+
+        self.button = ModernButton(frame, text="Prekini", bg=COLOR_ERROR, command=self.cancel)
+        self.button.pack()
+
+        self.bind("<Escape>", lambda e: self.destroy())
+        self.bind("<Destroy>", self.on_destroy)
+
+        self.job = izvoz.ExportJob(
+            query, izvoz.export_path(filename), header,
+            on_progress=lambda written, total: pozadina.call_in_main(self, self.show_progress, written, total),
+            on_done=lambda path, written: pozadina.call_in_main(self, self.show_done, path, written),
+            on_error=lambda e: pozadina.call_in_main(self, self.show_error, e),
+            on_cancel=lambda: pozadina.call_in_main(self, self.destroy)
+        )
+        pozadina.start(self)
+        self.job.start()
+
+    def show_progress(self, written, total):
+        self.progress.config(maximum=max(total, 1), value=written)
+        self.count_label.config(text=f"{written} / {total} redova")
+
+    def show_done(self, path, written):
+        self.progress.config(maximum=1, value=1)
+        self.message_label.config(text=f"Podaci su uspešno exportovani u:\n{path}")
+        self.count_label.config(text=f"Ukupno redova: {written}")
+        self.button.config(text="OK", bg=COLOR_BUTTON, command=self.destroy)
+
+    def show_error(self, e):
+        self.message_label.config(text=f"Došlo je do greške prilikom exporta:\n{e}", fg=COLOR_ERROR)
+        self.button.config(text="OK", bg=COLOR_BUTTON, command=self.destroy)
+
+    def cancel(self):
+        # The window closes once the export thread has cleaned up
+        self.job.cancel()
+        self.button.config(state=tk.DISABLED)
+        self.message_label.config(text="Prekidanje exporta...")
+
+    def on_destroy(self, event):
+        # Also called for every child widget, closing the window (or the
+        # whole application) stops an unfinished export
+        if event.widget is self and self.job.is_alive():
+            self.job.cancel()
@@ -3,6 +3,10 @@ from tkinter import ttk
 from tkinter import filedialog, Toplevel, messagebox, font
 import sqlite3
 import os
+import baza
+from tabela import VirtualTable
+import pozadina
+import dogadjaji
 
 # Define a modern ORANGE color scheme
 COLOR_BG = "#ffffff"
@@ -52,7 +56,7 @@ class CategoriesFrame(tk.Frame):
                             foreground=COLOR_TEXT)
         self.style.map('Treeview', background=[('selected', COLOR_ACCENT)])
         
-        # Initialize database if not exists
+        # Add default categories if there are none
         self.initialize_db()
 
         # Main container with two frames
@@ -106,64 +110,45 @@ class CategoriesFrame(tk.Frame):
                               relief=tk.GROOVE)
         self.frame_table.pack(expand=True, fill="both", pady=10)
 
-        # Add a scrollbar to the treeview
-        tree_frame = tk.Frame(self.frame_table, bg=COLOR_FRAME_BG)
-        tree_frame.pack(expand=True, fill="both", padx=5, pady=5)
-        
-        # Add vertical scrollbar
-        scrollbar_y = ttk.Scrollbar(tree_frame)
-        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Add horizontal scrollbar
-        scrollbar_x = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL)
-        scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        self.tree = ttk.Treeview(tree_frame, columns=("ID", "Naziv"), show="headings",
-                                yscrollcommand=scrollbar_y.set, 
-                                xscrollcommand=scrollbar_x.set)
-        scrollbar_y.config(command=self.tree.yview)
-        scrollbar_x.config(command=self.tree.xview)
-        self.tree.pack(expand=True, fill="both")
+        # Table with scrollbars, rows are read from the database as the user scrolls
+        self.table = VirtualTable(self.frame_table, ("ID", "Naziv", "Proizvoda"),
+                                  baza.categories_query(), bg=COLOR_FRAME_BG,
+                                  on_error=self.load_data_error)
+        self.table.pack(expand=True, fill="both", padx=5, pady=5)
+        self.tree = self.table.tree
         
         # Configure columns
         self.tree.heading("ID", text="ID")
         self.tree.heading("Naziv", text="Naziv")
+        self.tree.heading("Proizvoda", text="Broj proizvoda")
         
         # Set column widths
         self.tree.column("ID", width=50, anchor="center")
         self.tree.column("Naziv", width=350)
+        self.tree.column("Proizvoda", width=120, anchor="center")
 
         # Bind right-click event for context menu
         self.tree.bind("<Button-3>", self.on_right_click)
 
+        # Renamed or added categories only refresh their own rows, product
+        # changes can change the counts of any category
+        pozadina.subscribe(self, (dogadjaji.CATEGORY_CHANGED,),
+                           lambda event: self.table.refresh_rows(event.ids))
+        pozadina.subscribe(self, (dogadjaji.PRODUCT_ADDED, dogadjaji.PRODUCT_UPDATED,
+                                  dogadjaji.PRODUCT_DELETED, dogadjaji.EXTERNAL_CHANGE),
+                           lambda event: self.load_data())
+
         # Load data initially
         self.load_data()
     
     def initialize_db(self):
-        """Create kategorije table if it doesn't exist"""
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                
-                # Create categories table if not exists
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS kategorije (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        naziv TEXT NOT NULL UNIQUE
-                    )
-                ''')
-                
-                # Add some default categories if the table is empty
-                cursor.execute("SELECT COUNT(*) FROM kategorije")
-                if cursor.fetchone()[0] == 0:
-                    default_categories = ["Alati", "Srafovi"]
-                    for category in default_categories:
-                        cursor.execute("INSERT INTO kategorije (naziv) VALUES (?)", (category,))
-                
-                conn.commit()
-        except Exception as e:
+        """Add the default categories if there are none"""
+        def failed(e):
             messagebox.showerror("Database Error", f"Failed to initialize database: {e}")
 
+        # Added categories show up through the CATEGORY_CHANGED event
+        pozadina.run(self, baza.ensure_default_categories, on_error=failed)
+
     def add_category(self):
         """Add a new category to the database"""
         naziv = self.entry_naziv.get().strip()
@@ -172,40 +157,31 @@ class CategoriesFrame(tk.Frame):
             messagebox.showerror("Greška", "Unesite naziv kategorije")
             return
         
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("INSERT INTO kategorije (naziv) VALUES (?)", (naziv,))
-                conn.commit()
-            
+        def added(category_id):
             # Clear the form
             self.entry_naziv.delete(0, tk.END)
             
-            self.load_data()  # Reload the table
             messagebox.showinfo("Uspeh", "Kategorija uspešno dodata!")
-            
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri dodavanju kategorije: {e}")
+
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError):
+                messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
+            else:
+                messagebox.showerror("Greška", f"Greška pri dodavanju kategorije: {e}")
+
+        pozadina.run(self, baza.add_category, naziv, on_done=added, on_error=failed)
 
     def load_data(self):
         """Load categories from the database into the treeview"""
-        # Clear existing rows in the treeview
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        # Fetch data from the database and show it in the table
+        self.table.reload(keep_position=True)
 
-        # Fetch data from the database and insert into the treeview
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, naziv FROM kategorije ORDER BY naziv")
-                categories = cursor.fetchall()
-
-                for category in categories:
-                    self.tree.insert("", "end", values=category)
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri učitavanju podataka: {e}")
+    def refresh(self):
+        """Read the data again after it was changed while this view was hidden"""
+        self.load_data()
+
+    def load_data_error(self, e):
+        messagebox.showerror("Greška", f"Greška pri učitavanju podataka: {e}")
     
     def on_right_click(self, event):
         """Handle right-click on a category in the treeview"""
@@ -225,17 +201,14 @@ class CategoriesFrame(tk.Frame):
     def edit_category(self, category_id):
         """Open a popup to edit the selected category"""
         # Get the current value for the category
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT naziv FROM kategorije WHERE id = ?", (category_id,))
-            category = cursor.fetchone()
-        
-        if not category:
+        pozadina.run(self, baza.fetch_category_name, category_id,
+                     on_done=lambda naziv: self.open_edit_popup(category_id, naziv))
+
+    def open_edit_popup(self, category_id, naziv):
+        if naziv is None:
             messagebox.showerror("Greška", "Kategorija nije pronađena")
             return
 
-        naziv = category[0]
-
         # Open an edit popup
         popup = Toplevel(self.master)
         popup.title("Izmeni kategoriju")
@@ -278,21 +251,19 @@ class CategoriesFrame(tk.Frame):
                 messagebox.showerror("Greška", "Unesite naziv kategorije")
                 return
 
-            # Update the category in the database
-            try:
-                with sqlite3.connect("garage.db") as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE kategorije SET naziv = ? WHERE id = ?",
-                                (new_naziv, category_id))
-                    conn.commit()
-
-                self.load_data()  # Reload table with updated data
+            def renamed(result):
                 popup.destroy()
                 messagebox.showinfo("Uspeh", "Kategorija uspešno izmenjena!")
-            except sqlite3.IntegrityError:
-                messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
-            except Exception as e:
-                messagebox.showerror("Greška", f"Greška pri izmeni kategorije: {e}")
+
+            def failed(e):
+                if isinstance(e, sqlite3.IntegrityError):
+                    messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
+                else:
+                    messagebox.showerror("Greška", f"Greška pri izmeni kategorije: {e}")
+
+            # Update the category in the database
+            pozadina.run(popup, baza.rename_category, category_id, new_naziv,
+                         on_done=renamed, on_error=failed)
 
         # Buttons frame
         btn_frame = tk.Frame(main_frame, bg=COLOR_BG)
@@ -310,36 +281,34 @@ class CategoriesFrame(tk.Frame):
     def delete_category(self, category_id):
         """Delete the selected category from the database"""
         # Check if category is in use in zalihe table
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                # Get category name first for the confirmation message
-                cursor.execute("SELECT naziv FROM kategorije WHERE id = ?", (category_id,))
-                category_name = cursor.fetchone()[0]
-                
-                # Check if category is in use
-                cursor.execute("SELECT COUNT(*) FROM zalihe WHERE kategorija = ?", (category_name,))
-                in_use_count = cursor.fetchone()[0]
-                
-                if in_use_count > 0:
-                    messagebox.showerror(
-                        "Greška", 
-                        f"Kategorija '{category_name}' se koristi u zalihama i ne može biti obrisana.\n"
-                        f"Broj stavki koje koriste ovu kategoriju: {in_use_count}"
-                    )
-                    return
-                
-                # Confirm deletion
-                confirm = messagebox.askyesno(
-                    "Potvrda brisanja", 
-                    f"Da li ste sigurni da želite da obrišete kategoriju '{category_name}'?"
+        def check():
+            # Get category name first for the confirmation message
+            return baza.fetch_category_name(category_id), baza.count_products_in_category(category_id)
+
+        def checked(result):
+            category_name, in_use_count = result
+            
+            if in_use_count > 0:
+                messagebox.showerror(
+                    "Greška", 
+                    f"Kategorija '{category_name}' se koristi u zalihama i ne može biti obrisana.\n"
+                    f"Broj stavki koje koriste ovu kategoriju: {in_use_count}"
                 )
-                
-                if confirm:
-                    cursor.execute("DELETE FROM kategorije WHERE id = ?", (category_id,))
-                    conn.commit()
-                    self.load_data()  # Reload table
-                    messagebox.showinfo("Uspeh", "Kategorija uspešno obrisana!")
-                    
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri brisanju kategorije: {e}")
\ No newline at end of file
+                return
+            
+            # Confirm deletion
+            confirm = messagebox.askyesno(
+                "Potvrda brisanja", 
+                f"Da li ste sigurni da želite da obrišete kategoriju '{category_name}'?"
+            )
+            
+            if confirm:
+                pozadina.run(self, baza.delete_category, category_id, on_done=deleted, on_error=failed)
+
+        def deleted(result):
+            messagebox.showinfo("Uspeh", "Kategorija uspešno obrisana!")
+
+        def failed(e):
+            messagebox.showerror("Greška", f"Greška pri brisanju kategorije: {e}")
+
+        pozadina.run(self, check, on_done=checked, on_error=failed)
\ No newline at end of file
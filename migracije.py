@@ -0,0 +1,391 @@
+"""Schema versions of garage.db
+
+Every migration upgrades the database by one version, the current version
+is kept in PRAGMA user_version. migrate() is safe to call at every startup,
+migrations that were already applied are skipped.
+"""
+from contextlib import contextmanager
+
+
+def _column_names(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _rebuild_table(conn, table, create_sql, copy_sql, drop_objects=()):
+    """Recreate a table with a new definition, keeping its indexes and triggers
+
+    SQLite can't change columns or constraints in place, this follows the
+    procedure from https://www.sqlite.org/lang_altertable.html. create_sql
+    and copy_sql use {new} for the name of the temporary table. Indexes and
+    triggers named in drop_objects are not recreated.
+    """
+    new = f"{table}_new"
+    saved = conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (table,)).fetchall()
+    conn.execute(create_sql.format(new=new))
+    conn.execute(copy_sql.format(new=new))
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {new} RENAME TO {table}")
+    for name, sql in saved:
+        if name not in drop_objects:
+            conn.execute(sql)
+
+
+def _v1_base_tables(conn):
+    """Tables the application started with"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kategorije (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            naziv TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS zalihe (
+            id INTEGER PRIMARY KEY,
+            naziv TEXT NOT NULL,
+            slika TEXT,
+            kategorija TEXT,
+            stanje INTEGER DEFAULT 0
+        )
+    """)
+    # Databases created from the Vrste screen had no stanje column
+    if "stanje" not in _column_names(conn, "zalihe"):
+        conn.execute("ALTER TABLE zalihe ADD COLUMN stanje INTEGER DEFAULT 0")
+
+
+def _v2_zalihe_indexes(conn):
+    """Indexes for the stock filters, category filters and name ordering"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_zalihe_stanje ON zalihe (stanje, naziv)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_zalihe_kategorija ON zalihe (kategorija)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_zalihe_naziv ON zalihe (naziv)")
+    conn.execute("ANALYZE zalihe")
+
+
+# SQL expression that folds letters the FTS tokenizer keeps as they are,
+# remove_diacritics already handles č, ć, š and ž
+FTS_NORMALIZE = "replace(replace({}, 'đ', 'dj'), 'Đ', 'Dj')"
+
+
+def _v3_naziv_search(conn):
+    """Full-text index over product names, kept in sync by triggers"""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS zalihe_fts USING fts5(
+            naziv,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS zalihe_fts_insert AFTER INSERT ON zalihe BEGIN
+            INSERT INTO zalihe_fts (rowid, naziv) VALUES (new.id, {FTS_NORMALIZE.format("new.naziv")});
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS zalihe_fts_delete AFTER DELETE ON zalihe BEGIN
+            DELETE FROM zalihe_fts WHERE rowid = old.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS zalihe_fts_update AFTER UPDATE OF id, naziv ON zalihe BEGIN
+            DELETE FROM zalihe_fts WHERE rowid = old.id;
+            INSERT INTO zalihe_fts (rowid, naziv) VALUES (new.id, {FTS_NORMALIZE.format("new.naziv")});
+        END
+    """)
+    conn.execute("DELETE FROM zalihe_fts")
+    conn.execute(f"""
+        INSERT INTO zalihe_fts (rowid, naziv)
+        SELECT id, {FTS_NORMALIZE.format("naziv")} FROM zalihe
+    """)
+
+
+# Triggers keeping zalihe_fts up to date row by row, see fts_triggers_suspended
+FTS_ROW_TRIGGERS = ("zalihe_fts_insert", "zalihe_fts_update")
+
+
+@contextmanager
+def fts_triggers_suspended(conn):
+    """Leave zalihe_fts alone while many products are written at once
+
+    Every trigger call flushes the full-text index on its own, which makes
+    bulk writes several times slower. The caller updates the index once
+    for all written rows with update_fts(). Has to be used inside a
+    transaction, so other connections never see the triggers missing.
+    """
+    saved = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name IN ({", ".join("?" * len(FTS_ROW_TRIGGERS))})
+    """, FTS_ROW_TRIGGERS).fetchall()
+    for name, sql in saved:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        for name, sql in saved:
+            conn.execute(sql)
+
+
+def update_fts(conn, renamed, added):
+    """Index products written with the triggers suspended, both are (id, naziv) pairs"""
+    # Deleting from the index flushes what was added before, so delete first.
+    # Plain VALUES inserts, an INSERT ... SELECT would flush after every row
+    conn.executemany("DELETE FROM zalihe_fts WHERE rowid = ?",
+                     [(product_id,) for product_id, naziv in renamed])
+    conn.executemany(
+        f"INSERT INTO zalihe_fts (rowid, naziv) VALUES (?, {FTS_NORMALIZE.format('?')})",
+        renamed + added
+    )
+
+
+def _v4_kategorija_id(conn):
+    """Products point to kategorije.id instead of storing the category name"""
+    # Names that were typed in but never added as a category
+    conn.execute("""
+        INSERT OR IGNORE INTO kategorije (naziv)
+        SELECT DISTINCT kategorija FROM zalihe
+        WHERE kategorija IS NOT NULL AND kategorija != ''
+    """)
+    _rebuild_table(
+        conn, "zalihe",
+        """
+            CREATE TABLE {new} (
+                id INTEGER PRIMARY KEY,
+                naziv TEXT NOT NULL,
+                slika TEXT,
+                kategorija_id INTEGER REFERENCES kategorije (id)
+                    ON UPDATE CASCADE ON DELETE RESTRICT,
+                stanje INTEGER DEFAULT 0
+            )
+        """,
+        """
+            INSERT INTO {new} (id, naziv, slika, kategorija_id, stanje)
+            SELECT z.id, z.naziv, z.slika, k.id, z.stanje
+            FROM zalihe z
+            LEFT JOIN kategorije k ON k.naziv = z.kategorija
+        """,
+        drop_objects=("idx_zalihe_kategorija",)
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_zalihe_kategorija_id ON zalihe (kategorija_id)")
+    # Only zalihe, statistics of the nearly empty full-text index tables
+    # would make the index slower to update as products are added
+    conn.execute("ANALYZE zalihe")
+
+
+# Stock thresholds read by the summary triggers, see podesavanja
+LOW_STOCK_LIMIT = "(SELECT vrednost FROM podesavanja WHERE naziv = 'prag_malo')"
+OUT_OF_STOCK_LIMIT = "(SELECT vrednost FROM podesavanja WHERE naziv = 'prag_nestalo')"
+
+
+def _is_low(stanje):
+    return f"COALESCE({stanje} > {OUT_OF_STOCK_LIMIT} AND {stanje} <= {LOW_STOCK_LIMIT}, 0)"
+
+
+def _is_out(stanje):
+    return f"COALESCE({stanje} <= {OUT_OF_STOCK_LIMIT}, 0)"
+
+
+def rebuild_stock_summary(conn):
+    """Count zalihe_zbirno from scratch, needed after the thresholds change"""
+    conn.execute("DELETE FROM zalihe_zbirno")
+    conn.execute(f"""
+        INSERT INTO zalihe_zbirno (kategorija_id, ukupno, malo, nestalo)
+        SELECT COALESCE(kategorija_id, -1), COUNT(*), SUM({_is_low("stanje")}), SUM({_is_out("stanje")})
+        FROM zalihe
+        GROUP BY COALESCE(kategorija_id, -1)
+    """)
+    conn.execute("""
+        INSERT INTO zalihe_zbirno (kategorija_id, ukupno, malo, nestalo)
+        SELECT 0, COALESCE(SUM(ukupno), 0), COALESCE(SUM(malo), 0), COALESCE(SUM(nestalo), 0)
+        FROM zalihe_zbirno
+    """)
+
+
+def _v5_stock_summary(conn):
+    """Stock counters for the dashboard, kept up to date by triggers"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS podesavanja (
+            naziv TEXT PRIMARY KEY,
+            vrednost
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO podesavanja (naziv, vrednost)
+        VALUES ('prag_malo', 10), ('prag_nestalo', 0)
+    """)
+    # One row per category (-1 for products without one), row 0 holds the totals
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS zalihe_zbirno (
+            kategorija_id INTEGER PRIMARY KEY,
+            ukupno INTEGER NOT NULL DEFAULT 0,
+            malo INTEGER NOT NULL DEFAULT 0,
+            nestalo INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    add_new = f"""
+            INSERT OR IGNORE INTO zalihe_zbirno (kategorija_id)
+            VALUES (0), (COALESCE(new.kategorija_id, -1));
+            UPDATE zalihe_zbirno
+            SET ukupno = ukupno + 1,
+                malo = malo + {_is_low("new.stanje")},
+                nestalo = nestalo + {_is_out("new.stanje")}
+            WHERE kategorija_id IN (0, COALESCE(new.kategorija_id, -1));"""
+    remove_old = f"""
+            UPDATE zalihe_zbirno
+            SET ukupno = ukupno - 1,
+                malo = malo - {_is_low("old.stanje")},
+                nestalo = nestalo - {_is_out("old.stanje")}
+            WHERE kategorija_id IN (0, COALESCE(old.kategorija_id, -1));"""
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS zalihe_zbirno_insert AFTER INSERT ON zalihe BEGIN{add_new}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS zalihe_zbirno_delete AFTER DELETE ON zalihe BEGIN{remove_old}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS zalihe_zbirno_update
+        AFTER UPDATE OF stanje, kategorija_id ON zalihe BEGIN{remove_old}{add_new}
+        END
+    """)
+    rebuild_stock_summary(conn)
+
+
+def _v6_stanje_check(conn):
+    """stanje can't be NULL or negative any more
+
+    Stock is now changed with stanje = stanje + delta by several stations
+    at once, the database itself has to refuse taking more than there is.
+    """
+    _rebuild_table(
+        conn, "zalihe",
+        """
+            CREATE TABLE {new} (
+                id INTEGER PRIMARY KEY,
+                naziv TEXT NOT NULL,
+                slika TEXT,
+                kategorija_id INTEGER REFERENCES kategorije (id)
+                    ON UPDATE CASCADE ON DELETE RESTRICT,
+                stanje INTEGER NOT NULL DEFAULT 0 CHECK (stanje >= 0)
+            )
+        """,
+        """
+            INSERT INTO {new} (id, naziv, slika, kategorija_id, stanje)
+            SELECT id, naziv, slika, kategorija_id, MAX(COALESCE(stanje, 0), 0)
+            FROM zalihe
+        """
+    )
+    # Products that had NULL or negative stock now count as out of stock
+    rebuild_stock_summary(conn)
+
+
+# Local time of a change, text in this format sorts in time order
+NOW = "datetime('now', 'localtime')"
+
+
+def take_stock_snapshot(conn):
+    """Save stanje of every product, as of the last row of promene_stanja
+
+    Questions about the stock at some time start from the closest snapshot
+    before it and only add the changes after that. Products with no stock
+    are left out.
+    """
+    presek_id = conn.execute(f"""
+        INSERT INTO preseci (vreme, poslednja_promena)
+        VALUES ({NOW}, (SELECT COALESCE(MAX(id), 0) FROM promene_stanja))
+    """).lastrowid
+    conn.execute("""
+        INSERT INTO preseci_stanja (presek_id, proizvod_id, stanje)
+        SELECT ?, id, stanje FROM zalihe WHERE stanje != 0
+    """, (presek_id,))
+
+
+def _v7_stock_history(conn):
+    """Every change of stanje is written to promene_stanja
+
+    The table is only ever added to. Products are deliberately not a
+    foreign key, the history of deleted products stays.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS promene_stanja (
+            id INTEGER PRIMARY KEY,
+            proizvod_id INTEGER NOT NULL,
+            promena INTEGER NOT NULL,
+            razlog TEXT NOT NULL,
+            vreme TEXT NOT NULL DEFAULT ({NOW})
+        )
+    """)
+    # The id (rowid) is part of every index, so one product's changes come
+    # in the order they were made
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_promene_proizvod ON promene_stanja (proizvod_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_promene_vreme ON promene_stanja (vreme)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS preseci (
+            id INTEGER PRIMARY KEY,
+            vreme TEXT NOT NULL,
+            poslednja_promena INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_preseci_vreme ON preseci (vreme)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS preseci_stanja (
+            presek_id INTEGER NOT NULL,
+            proizvod_id INTEGER NOT NULL,
+            stanje INTEGER NOT NULL,
+            PRIMARY KEY (presek_id, proizvod_id)
+        ) WITHOUT ROWID
+    """)
+    # The history starts with the stock as it is now
+    take_stock_snapshot(conn)
+
+
+def _v8_sifra(conn):
+    """Barcode or SKU of a product, scanned to find it
+
+    Optional, products without one keep NULL, which the partial unique
+    index leaves out. A scan is a single probe of that index.
+    """
+    if "sifra" not in _column_names(conn, "zalihe"):
+        conn.execute("ALTER TABLE zalihe ADD COLUMN sifra TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_zalihe_sifra ON zalihe (sifra) WHERE sifra IS NOT NULL")
+
+
+# (version, migration) pairs in the order they have to be applied
+MIGRATIONS = [
+    (1, _v1_base_tables),
+    (2, _v2_zalihe_indexes),
+    (3, _v3_naziv_search),
+    (4, _v4_kategorija_id),
+    (5, _v5_stock_summary),
+    (6, _v6_stanje_check),
+    (7, _v7_stock_history),
+    (8, _v8_sifra),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply all missing migrations, returns the list of applied versions"""
+    applied = []
+    for version, migration in MIGRATIONS:
+        if schema_version(conn) >= version:
+            continue
+        # IMMEDIATE takes the write lock up front, so two stations starting
+        # at the same time can't both apply the same migration
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied.append(version)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return applied
@@ -0,0 +1,128 @@
+"""Database work off the Tk main thread
+
+run() hands a function to the database workers from baza.submit() and
+delivers its result back on the Tk main thread. Tk isn't thread safe, so
+workers only put finished results on a queue which the main thread polls
+with after(). dogadjaji events reach their subscribers the same way.
+"""
+import queue
+import sqlite3
+from tkinter import messagebox
+
+import baza
+import dogadjaji
+
+# How often (ms) the main thread picks up finished database work
+POLL_MS = 25
+
+# How often (ms) to check whether another program changed the database
+EXTERNAL_POLL_MS = 1000
+
+_results = queue.SimpleQueue()
+_polling_root = None
+
+
+def _poll(root):
+    global _polling_root
+    while True:
+        try:
+            widget, callback, args = _results.get_nowait()
+        except queue.Empty:
+            break
+        # The window that asked for the data may be closed by now
+        if widget is not None and not widget.winfo_exists():
+            continue
+        try:
+            callback(*args)
+        except Exception as e:
+            root.report_callback_exception(type(e), e, e.__traceback__)
+    try:
+        root.after(POLL_MS, _poll, root)
+    except Exception:
+        # Main window was destroyed, stop polling
+        _polling_root = None
+
+
+def start(widget):
+    """Start delivering results on the main loop of widget's application"""
+    global _polling_root
+    root = widget.nametowidget(".")
+    if _polling_root is not root:
+        _polling_root = root
+        root.after(POLL_MS, _poll, root)
+        root.after(EXTERNAL_POLL_MS, _check_external, root, None)
+
+
+def _check_external(root, last_version):
+    if _polling_root is not root:
+        return
+    try:
+        version = baza.external_version()
+    except sqlite3.Error:
+        version = None
+    if version is None:
+        # The writer is busy, look again next time
+        version = last_version
+    elif last_version is not None and version != last_version:
+        dogadjaji.emit(dogadjaji.EXTERNAL_CHANGE)
+    try:
+        root.after(EXTERNAL_POLL_MS, _check_external, root, version)
+    except Exception:
+        pass
+
+
+def call_in_main(widget, callback, *args):
+    """Queue callback to be called on the Tk main thread, safe from any thread"""
+    _results.put((widget, callback, args))
+
+
+# Subscribers from subscribe() below are always called on the main thread
+dogadjaji.set_dispatcher(call_in_main)
+
+
+def subscribe(widget, kinds, callback):
+    """dogadjaji.subscribe() for a widget, called on the main thread
+
+    The subscription ends when the widget is destroyed.
+    """
+    start(widget)
+    token = dogadjaji.subscribe(kinds, callback, widget)
+
+    def destroyed(event):
+        # Toplevel windows also get the <Destroy> of their children
+        if event.widget is widget:
+            dogadjaji.unsubscribe(token)
+
+    widget.bind("<Destroy>", destroyed, add="+")
+    return token
+
+
+def show_error(error):
+    messagebox.showerror("Greška", f"Greška u radu sa bazom: {error}")
+
+
+def run(widget, fn, *args, on_done=None, on_error=None):
+    """Run fn(*args) on a database worker
+
+    on_done(result) or on_error(exception) is then called on the main
+    thread, unless widget has been destroyed in the meantime.
+    """
+    return watch(widget, baza.submit(fn, *args), on_done=on_done, on_error=on_error)
+
+
+def watch(widget, future, on_done=None, on_error=None):
+    """Like run(), for a future that was submitted somewhere else"""
+    start(widget)
+
+    def finished(future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            if on_done is not None:
+                call_in_main(widget, on_done, future.result())
+        else:
+            call_in_main(widget, on_error or show_error, error)
+
+    future.add_done_callback(finished)
+    return future
@@ -0,0 +1,101 @@
+"""Goods receipts, the stock of many products changed at once
+
+A receipt is plain text with one line per product: the product ID or its
+exact naziv, followed by the quantity received. Lines copied from Excel
+(tab separated), CSV lines and "naziv 5" all work. Negative quantities
+take goods off the stock.
+
+check() reads the products of all lines at once and reports every line
+that can't be applied, apply() then changes the stock of all of them in
+one transaction. Neither touches Tk, both run on a database worker.
+"""
+import re
+import sqlite3
+from collections import namedtuple
+
+import baza
+
+# Product (ID or naziv), a separator and the quantity at the end of the line
+LINE_PATTERN = re.compile(r"^(?P<proizvod>.+?)[\s;,]+(?P<kolicina>[+-]?\d+)$")
+
+# A line that can be applied, stanje is the stock before the receipt
+ReceiptLine = namedtuple("ReceiptLine", ("line_no", "product_id", "naziv", "stanje", "kolicina"))
+
+# A line that can't be applied and why
+ReceiptError = namedtuple("ReceiptError", ("line_no", "text", "message"))
+
+
+def parse(text):
+    """Split text into (line number, product, quantity), plus the lines that aren't readable
+
+    product is an int if the line starts with a number, otherwise the naziv.
+    """
+    entries, errors = [], []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        match = LINE_PATTERN.match(line)
+        if match is None:
+            errors.append(ReceiptError(line_no, line, "Očekuje se ID ili naziv i količina"))
+            continue
+        proizvod = match.group("proizvod").strip().strip('"').strip()
+        kolicina = int(match.group("kolicina"))
+        if kolicina == 0:
+            errors.append(ReceiptError(line_no, line, "Količina ne može biti 0"))
+            continue
+        entries.append((line_no, int(proizvod) if proizvod.isdigit() else proizvod, kolicina))
+    return entries, errors
+
+
+def check(text):
+    """Return (lines, errors) for a receipt, it can only be applied without errors"""
+    entries, errors = parse(text)
+    ids = [proizvod for line_no, proizvod, kolicina in entries if isinstance(proizvod, int)]
+    names = [proizvod for line_no, proizvod, kolicina in entries if isinstance(proizvod, str)]
+
+    by_id = {row[0]: row for row in baza.fetch_products_by_ids(ids)} if ids else {}
+    by_name = {}
+    for row in baza.fetch_products_by_names(names) if names else ():
+        by_name.setdefault(row[1], []).append(row)
+
+    lines = []
+    for line_no, proizvod, kolicina in entries:
+        if isinstance(proizvod, int):
+            row = by_id.get(proizvod)
+            if row is None:
+                errors.append(ReceiptError(line_no, str(proizvod), f"Proizvod sa ID {proizvod} ne postoji"))
+                continue
+        else:
+            rows = by_name.get(proizvod, [])
+            if not rows:
+                errors.append(ReceiptError(line_no, proizvod, "Proizvod sa ovim nazivom ne postoji"))
+                continue
+            if len(rows) > 1:
+                errors.append(ReceiptError(line_no, proizvod,
+                                           "Više proizvoda ima ovaj naziv, upišite ID"))
+                continue
+            row = rows[0]
+        lines.append(ReceiptLine(line_no, row[0], row[1], row[2], kolicina))
+
+    # The same product may be on several lines, check where it ends up
+    totals = {}
+    for line in lines:
+        totals[line.product_id] = totals.get(line.product_id, line.stanje) + line.kolicina
+    for line in lines:
+        if totals[line.product_id] < 0:
+            errors.append(ReceiptError(line.line_no, line.naziv,
+                                       f"Stanje bi bilo {totals[line.product_id]}, na stanju je {line.stanje}"))
+
+    errors.sort()
+    return lines, errors
+
+
+def apply(lines):
+    """Change the stock of all lines from check() in one transaction"""
+    try:
+        baza.receive_stock((line.product_id, line.kolicina) for line in lines)
+    except sqlite3.IntegrityError:
+        # Another station took goods off the stock after the check
+        raise ValueError("Stanje nekog proizvoda bi bilo negativno, proverite prijem ponovo")
+    return len(lines)
@@ -0,0 +1,168 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import prijem
+import pozadina
+
+# Define an orange color scheme
+COLOR_BG = "#ffffff"
+COLOR_FRAME_BG = "#f9f9f9"
+COLOR_ACCENT = "#FF8C00"  # Dark Orange
+COLOR_BUTTON = "#FF8C00"  # Dark Orange
+COLOR_BUTTON_TEXT = "#ffffff"
+COLOR_TEXT = "#333333"
+COLOR_LIGHT_TEXT = "#666666"
+COLOR_ERROR = "#e74c3c"
+
+class ModernButton(tk.Button):
+    def __init__(self, master=None, **kwargs):
+        # Extract specific styling params or use defaults
+        bg_color = kwargs.pop('bg', COLOR_BUTTON)
+        fg_color = kwargs.pop('fg', COLOR_BUTTON_TEXT)
+
+        # Call the parent constructor with our modified parameters
+        super().__init__(
+            master,
+            bg=bg_color,
+            fg=fg_color,
+            relief=tk.FLAT,
+            padx=10,
+            pady=4,
+            font=('Segoe UI', 9),
+            cursor="hand2",
+            activebackground=COLOR_ACCENT,
+            activeforeground=COLOR_BUTTON_TEXT,
+            **kwargs
+        )
+
+class ReceiptWindow(tk.Toplevel):
+    """Goods receipt, the stock of many products is changed at once
+
+    The lines are typed or pasted, checked with prijem.check() and shown
+    with their new stock. Only a receipt without errors can be applied,
+    all lines are then written in a single transaction.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Prijem robe")
+        self.geometry("640x600")
+        self.configure(bg=COLOR_BG)
+        try:
+            self.iconbitmap("ico.ico")
+        except tk.TclError:
+            pass
+
+        # Lines of the last check, None until the receipt is checked again
+        self.lines = None
+
+        frame = tk.Frame(self, bg=COLOR_BG, padx=20, pady=15)
+        frame.pack(fill="both", expand=True)
+
+        tk.Label(frame, text="Prijem robe", font=("Segoe UI", 14, "bold"),
+                 bg=COLOR_BG, fg=COLOR_TEXT).pack(anchor="w")
+        tk.Label(frame, text="Jedan proizvod u redu: ID ili tačan naziv, pa količina (npr. \"12  5\" ili \"Sraf M8;-2\").\n"
+                             "Redovi se mogu nalepiti iz Excel tabele.",
+                 font=("Segoe UI", 9), bg=COLOR_BG, fg=COLOR_LIGHT_TEXT, justify="left").pack(anchor="w", pady=(0, 8))
+
+        # Lines of the receipt
+        input_frame = tk.Frame(frame, bg=COLOR_FRAME_BG, bd=1, relief=tk.GROOVE)
+        input_frame.pack(fill="both", expand=True)
+        self.text = tk.Text(input_frame, height=10, font=("Consolas", 10), bd=0, undo=True)
+        text_scroll = ttk.Scrollbar(input_frame, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=text_scroll.set)
+        text_scroll.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.bind("<<Modified>>", self.on_text_changed)
+        self.text.focus_set()
+
+        button_frame = tk.Frame(frame, bg=COLOR_BG)
+        button_frame.pack(fill="x", pady=10)
+        ModernButton(button_frame, text="Proveri", command=self.check).pack(side="left")
+        self.apply_button = ModernButton(button_frame, text="Primeni", command=self.apply, state=tk.DISABLED)
+        self.apply_button.pack(side="left", padx=5)
+        ModernButton(button_frame, text="Zatvori", bg=COLOR_ERROR, command=self.destroy).pack(side="right")
+
+        self.status_label = tk.Label(frame, text="", font=("Segoe UI", 9), bg=COLOR_BG, fg=COLOR_TEXT, anchor="w")
+        self.status_label.pack(fill="x")
+
+        # Checked lines with their new stock, errors are shown in red
+        result_frame = tk.Frame(frame, bg=COLOR_FRAME_BG)
+        result_frame.pack(fill="both", expand=True, pady=(5, 0))
+        columns = ("Red", "Proizvod", "Stanje", "Promena", "Novo")
+        self.tree = ttk.Treeview(result_frame, columns=columns, show="headings", height=8)
+        for col, text, width in zip(columns, ("Red", "Proizvod", "Stanje", "Promena", "Novo stanje"),
+                                    (50, 250, 80, 80, 120)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor="w" if col == "Proizvod" else "center")
+        self.tree.tag_configure("greska", foreground=COLOR_ERROR)
+        tree_scroll = ttk.Scrollbar(result_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=tree_scroll.set)
+        tree_scroll.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.bind("<Escape>", lambda e: self.destroy())
+
+    def on_text_changed(self, event=None):
+        # Anything typed after a check has to be checked again
+        if self.text.edit_modified():
+            self.text.edit_modified(False)
+            self.lines = None
+            self.apply_button.config(state=tk.DISABLED)
+
+    def receipt_text(self):
+        return self.text.get("1.0", "end-1c")
+
+    def check(self):
+        text = self.receipt_text()
+        if not text.strip():
+            self.status_label.config(text="Unesite bar jedan red", fg=COLOR_ERROR)
+            return
+        self.status_label.config(text="Provera...", fg=COLOR_LIGHT_TEXT)
+        pozadina.run(self, prijem.check, text,
+                     on_done=lambda result: self.show_check(text, *result),
+                     on_error=self.show_error)
+
+    def show_check(self, text, lines, errors):
+        # The receipt was changed while it was checked
+        if text != self.receipt_text():
+            return
+
+        self.tree.delete(*self.tree.get_children())
+        rows = [(line.line_no, (line.line_no, f"{line.naziv} (ID {line.product_id})", line.stanje,
+                                f"{line.kolicina:+d}", line.stanje + line.kolicina), ())
+                for line in lines]
+        rows += [(error.line_no, (error.line_no, error.text, "", "", error.message), ("greska",))
+                 for error in errors]
+        rows.sort(key=lambda row: row[0])
+        for line_no, values, tags in rows:
+            self.tree.insert("", "end", values=values, tags=tags)
+
+        if errors:
+            self.lines = None
+            self.apply_button.config(state=tk.DISABLED)
+            self.status_label.config(text=f"Ispravite redove sa greškom ({len(errors)})", fg=COLOR_ERROR)
+        else:
+            self.lines = lines
+            self.apply_button.config(state=tk.NORMAL)
+            self.status_label.config(text=f"Spremno za prijem: {len(lines)} redova", fg=COLOR_TEXT)
+
+    def apply(self):
+        if not self.lines:
+            return
+        lines = self.lines
+        self.apply_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Upisivanje...", fg=COLOR_LIGHT_TEXT)
+
+        def applied(count):
+            # The tables show the new stock through the STOCK_CHANGED event
+            messagebox.showinfo("Uspeh", f"Stanje je promenjeno za {count} redova.", parent=self)
+            self.destroy()
+
+        pozadina.run(self, prijem.apply, lines, on_done=applied, on_error=self.show_error)
+
+    def show_error(self, e):
+        # Check again before applying, the products may have changed
+        self.lines = None
+        self.apply_button.config(state=tk.DISABLED)
+        self.status_label.config(text=f"Greška: {e}", fg=COLOR_ERROR)
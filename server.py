@@ -0,0 +1,249 @@
+"""HTTP/JSON access to the stock for scanners and other stations
+
+    python -m server --host 0.0.0.0 --port 8765
+
+or started next to the window with app.py --server. Every request runs
+on its own thread with the connection pool of baza, so other stations
+never open garage.db themselves and never fight the application for its
+locks. Connections are kept alive (HTTP/1.1).
+
+    GET  /proizvodi/<id>        one product
+    GET  /proizvodi?ids=1,2,3   many products at once
+    GET  /pretraga?q=<text>     best matches, like the search box
+    GET  /malo, /nestalo        products low on stock and out of stock
+    POST /stanje                {"id": 12, "promena": -1} or a list of them
+
+GET answers carry an ETag made from PRAGMA data_version, a client sending
+it back in If-None-Match gets 304 Not Modified as long as nobody changed
+the database. A list of changes sent to /stanje is applied in a single
+transaction, all or nothing.
+
+There is no authentication, only listen on addresses of the garage
+network.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import baza
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Largest request body accepted, a few thousand stock changes
+MAX_BODY = 1024 * 1024
+
+# Most ids in one GET /proizvodi?ids= request
+MAX_IDS = 5000
+
+# data_version starts over with every run, the ETag needs both
+_RUN = os.urandom(4).hex()
+
+
+class ApiError(Exception):
+    """Ends the request with status and {"greska": message}"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _product(row):
+    product_id, naziv, slika, kategorija, stanje, sifra = row
+    return {"id": product_id, "sifra": sifra, "naziv": naziv, "kategorija": kategorija, "stanje": stanje}
+
+
+def _products(rows):
+    """(id, naziv, stanje) rows as JSON objects"""
+    return [{"id": product_id, "naziv": naziv, "stanje": stanje} for product_id, naziv, stanje in rows]
+
+
+def _ids(text):
+    try:
+        ids = [int(value) for value in text.split(",") if value.strip()]
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "ids moraju biti brojevi odvojeni zarezom")
+    if len(ids) > MAX_IDS:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Najviše {MAX_IDS} proizvoda u jednom zahtevu")
+    return ids
+
+
+def get_product(product_id):
+    row = baza.fetch_product(product_id)
+    if row is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Proizvod sa ID {product_id} ne postoji")
+    return _product(row)
+
+
+def get_products(query):
+    ids = _ids(query.get("ids", [""])[0])
+    # Products that don't exist are left out, in the order they were asked for
+    found = {row[0]: row for row in baza.fetch_products_by_ids(ids)} if ids else {}
+    return _products(found[product_id] for product_id in dict.fromkeys(ids) if product_id in found)
+
+
+def get_search(query):
+    text = query.get("q", [""])[0].strip()
+    return [{"id": product_id, "naziv": naziv, "kategorija": kategorija, "stanje": stanje}
+            for product_id, naziv, kategorija, stanje in baza.search_products(text)]
+
+
+def get_filtered(filter_type):
+    rows = []
+    for page in baza.filtered_products_query(filter_type).iter_pages(2000):
+        rows += page
+    return _products(rows)
+
+
+def post_stock(body):
+    """Apply one {"id", "promena"} change or a list of them, returns the new stanje"""
+    single = isinstance(body, dict)
+    changes = [body] if single else body
+    if not isinstance(changes, list) or not changes:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Očekuje se {\"id\", \"promena\"} ili lista takvih")
+    try:
+        changes = [(int(change["id"]), int(change["promena"])) for change in changes]
+    except (TypeError, KeyError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Svaka promena mora imati celobrojne id i promena")
+
+    try:
+        if single:
+            product_id, delta = changes[0]
+            stanje = baza.adjust_stock(product_id, delta)
+            if stanje is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Proizvod sa ID {product_id} ne postoji")
+            return {"id": product_id, "stanje": stanje}
+        baza.receive_stock(changes)
+    except sqlite3.IntegrityError:
+        raise ApiError(HTTPStatus.CONFLICT, "Na stanju nema dovoljno proizvoda.")
+    except ValueError as e:
+        # receive_stock(), one of the products doesn't exist
+        raise ApiError(HTTPStatus.NOT_FOUND, str(e))
+    return _products(baza.fetch_products_by_ids([product_id for product_id, delta in changes]))
+
+
+# Path -> function(query) of the GET endpoints besides /proizvodi/<id>
+GET_ROUTES = {
+    "/proizvodi": get_products,
+    "/pretraga": get_search,
+    "/malo": lambda query: get_filtered("low_stock"),
+    "/nestalo": lambda query: get_filtered("out_of_stock"),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive, every answer has a Content-Length
+    protocol_version = "HTTP/1.1"
+    server_version = "Garaza"
+    # Headers and body are written separately, with Nagle's algorithm the
+    # body waits for the client's delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        try:
+            # Asked before reading, a change made meanwhile only makes the
+            # next request with this ETag read again
+            etag = f'"{_RUN}-{baza.data_version()}"'
+            if etag in (value.strip() for value in self.headers.get("If-None-Match", "").split(",")):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if path.startswith("/proizvodi/"):
+                try:
+                    product_id = int(path[len("/proizvodi/"):])
+                except ValueError:
+                    raise ApiError(HTTPStatus.NOT_FOUND, "Nepoznata putanja")
+                result = get_product(product_id)
+            elif path in GET_ROUTES:
+                result = GET_ROUTES[path](parse_qs(url.query))
+            else:
+                raise ApiError(HTTPStatus.NOT_FOUND, "Nepoznata putanja")
+        except ApiError as e:
+            self.send_json(e.status, {"greska": str(e)})
+        except sqlite3.Error as e:
+            self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"greska": str(e)})
+        else:
+            self.send_json(HTTPStatus.OK, result, etag)
+
+    def do_POST(self):
+        try:
+            if urlsplit(self.path).path.rstrip("/") != "/stanje":
+                # The body isn't read, the connection can't be reused
+                self.close_connection = True
+                raise ApiError(HTTPStatus.NOT_FOUND, "Nepoznata putanja")
+            result = post_stock(self.read_json())
+        except ApiError as e:
+            self.send_json(e.status, {"greska": str(e)})
+        except sqlite3.Error as e:
+            self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"greska": str(e)})
+        else:
+            self.send_json(HTTPStatus.OK, result)
+
+    def read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 < length <= MAX_BODY:
+            self.close_connection = True
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Telo zahteva mora imati između 1 i {MAX_BODY} bajtova")
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Telo zahteva nije ispravan JSON")
+
+    def send_json(self, status, value, etag=None):
+        body = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Hundreds of requests a second would flood the console
+        pass
+
+
+def start(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve on a daemon thread, returns the server, stop it with shutdown()"""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="server", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m server", description="HTTP/JSON pristup zalihama")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"adresa (podrazumevano {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (podrazumevano {DEFAULT_PORT})")
+    parser.add_argument("--baza", metavar="PUTANJA", help=f"fajl baze (podrazumevano {baza.DB_PATH})")
+    args = parser.parse_args(argv)
+    if args.baza:
+        baza.configure(args.baza)
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"Server radi na http://{args.host}:{args.port}/, Ctrl+C za kraj")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        baza.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Stock changes from a barcode scanner, written in groups
+
+A keyboard wedge scanner types the sifra of a product followed by Enter,
+ten or more times a second while goods are unpacked. Every scan only adds
+to a ScanQueue, repeated scans of the same product are added together.
+The window takes what has gathered every FLUSH_MS and apply() writes it
+in a single transaction, so a stream of scans costs a few commits a
+second instead of one per scan.
+
+Neither ScanQueue nor apply() touches Tk, apply() runs on a database
+worker.
+"""
+import sqlite3
+import threading
+from collections import namedtuple
+
+import baza
+
+# How often (ms) the gathered scans are written
+FLUSH_MS = 300
+
+# Wait (ms) before scans are written again after the database was busy
+RETRY_MS = 2000
+
+# A written change: the product, how much it changed and its new stanje
+ScanResult = namedtuple("ScanResult", ("sifra", "product_id", "naziv", "kolicina", "stanje"))
+
+# Scans of a sifra that couldn't be written and why. retry is set when
+# nothing was wrong with the scans themselves (the database was busy), they
+# can be queued again.
+ScanError = namedtuple("ScanError", ("sifra", "kolicina", "message", "retry"), defaults=(False,))
+
+
+class ScanQueue:
+    """Scans waiting to be written, as the summed quantity of every sifra"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}      # sifra -> summed kolicina, in the order first scanned
+        self.scans = 0          # scans waiting, a sifra scanned twice counts twice
+
+    def add(self, sifra, kolicina=1):
+        sifra = baza.normalize_sifra(sifra)
+        if sifra is None or not kolicina:
+            return
+        with self._lock:
+            self._pending[sifra] = self._pending.get(sifra, 0) + kolicina
+            self.scans += 1
+
+    def take(self):
+        """Return the waiting {sifra: kolicina} and start over"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self.scans = 0
+        return {sifra: kolicina for sifra, kolicina in pending.items() if kolicina}
+
+    def __len__(self):
+        return self.scans
+
+
+def apply(pending):
+    """Write {sifra: kolicina} from ScanQueue.take(), returns (results, errors)
+
+    All changes go into one transaction. If one product doesn't have
+    enough on stock the changes are written one by one instead, so only
+    that product is left out. sqlite3.OperationalError (database locked)
+    before anything is written is raised, once some changes are written
+    the rest come back as ScanError with retry set.
+    """
+    products = {row[3]: row for row in baza.fetch_products_by_sifre(pending)}
+    errors = [ScanError(sifra, kolicina, "Nepoznata šifra")
+              for sifra, kolicina in pending.items() if sifra not in products]
+    changes = [(sifra, products[sifra][0], kolicina) for sifra, kolicina in pending.items() if sifra in products]
+    if not changes:
+        return [], errors
+
+    try:
+        baza.receive_stock((product_id, kolicina) for sifra, product_id, kolicina in changes)
+        written = changes
+    except (sqlite3.IntegrityError, ValueError):
+        # Not enough on stock or a product deleted since the lookup
+        written = []
+        for i, (sifra, product_id, kolicina) in enumerate(changes):
+            try:
+                stanje = baza.adjust_stock(product_id, kolicina)
+            except sqlite3.IntegrityError:
+                errors.append(ScanError(sifra, kolicina, "Na stanju nema dovoljno proizvoda."))
+                continue
+            except sqlite3.OperationalError as e:
+                errors.extend(ScanError(sifra, kolicina, f"Greška: {e}", True)
+                              for sifra, product_id, kolicina in changes[i:])
+                break
+            if stanje is None:
+                errors.append(ScanError(sifra, kolicina, "Proizvod više ne postoji"))
+            else:
+                written.append((sifra, product_id, kolicina))
+
+    try:
+        stanja = {row[0]: row[2] for row in baza.fetch_products_by_ids([product_id for sifra, product_id, kolicina in written])}
+    except sqlite3.OperationalError:
+        # Already written, raising would queue the scans again
+        stanja = {}
+    results = [ScanResult(sifra, product_id, products[sifra][1], kolicina, stanja.get(product_id))
+               for sifra, product_id, kolicina in written]
+    return results, errors
@@ -0,0 +1,223 @@
+import sqlite3
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import baza
+import skeniranje
+import pozadina
+
+# Define an orange color scheme
+COLOR_BG = "#ffffff"
+COLOR_FRAME_BG = "#f9f9f9"
+COLOR_ACCENT = "#FF8C00"  # Dark Orange
+COLOR_BUTTON = "#FF8C00"  # Dark Orange
+COLOR_BUTTON_TEXT = "#ffffff"
+COLOR_TEXT = "#333333"
+COLOR_LIGHT_TEXT = "#666666"
+COLOR_ERROR = "#e74c3c"
+
+class ModernButton(tk.Button):
+    def __init__(self, master=None, **kwargs):
+        # Extract specific styling params or use defaults
+        bg_color = kwargs.pop('bg', COLOR_BUTTON)
+        fg_color = kwargs.pop('fg', COLOR_BUTTON_TEXT)
+
+        # Call the parent constructor with our modified parameters
+        super().__init__(
+            master,
+            bg=bg_color,
+            fg=fg_color,
+            relief=tk.FLAT,
+            padx=10,
+            pady=4,
+            font=('Segoe UI', 9),
+            cursor="hand2",
+            activebackground=COLOR_ACCENT,
+            activeforeground=COLOR_BUTTON_TEXT,
+            **kwargs
+        )
+
+class ScanWindow(tk.Toplevel):
+    """Scan mode, every scanned sifra adds one to the stock or takes one away
+
+    Scans only go into a skeniranje.ScanQueue, the main thread never waits
+    for the database. The queue is written every skeniranje.FLUSH_MS, one
+    write at a time, so scans keep coming in while the previous group is
+    being written.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Skeniranje")
+        self.geometry("640x520")
+        self.configure(bg=COLOR_BG)
+        try:
+            self.iconbitmap("ico.ico")
+        except tk.TclError:
+            pass
+
+        self.queue = skeniranje.ScanQueue()
+        self.flush_after_id = None
+        self.writing = False
+        # sifra -> total change written in this window
+        self.totals = {}
+
+        frame = tk.Frame(self, bg=COLOR_BG, padx=20, pady=15)
+        frame.pack(fill="both", expand=True)
+
+        tk.Label(frame, text="Skeniranje", font=("Segoe UI", 14, "bold"),
+                 bg=COLOR_BG, fg=COLOR_TEXT).pack(anchor="w")
+        tk.Label(frame, text="Skenirajte proizvode, svako skeniranje menja stanje za 1. "
+                             "F2 prijem, F3 izdavanje.",
+                 font=("Segoe UI", 9), bg=COLOR_BG, fg=COLOR_LIGHT_TEXT).pack(anchor="w", pady=(0, 8))
+
+        mode_frame = tk.Frame(frame, bg=COLOR_BG)
+        mode_frame.pack(fill="x")
+        self.mode = tk.IntVar(value=1)
+        for text, value in (("Prijem (+1)", 1), ("Izdavanje (-1)", -1)):
+            tk.Radiobutton(mode_frame, text=text, variable=self.mode, value=value,
+                           font=("Segoe UI", 10), bg=COLOR_BG, fg=COLOR_TEXT, activebackground=COLOR_BG,
+                           command=lambda: self.entry.focus_set()).pack(side="left", padx=(0, 15))
+
+        # The scanner types into this field, Enter ends every code
+        self.entry = tk.Entry(frame, font=("Consolas", 14), bd=1, relief=tk.SOLID)
+        self.entry.pack(fill="x", pady=10)
+        self.entry.bind("<Return>", self.on_scan)
+        self.entry.focus_set()
+
+        self.status_label = tk.Label(frame, text="", font=("Segoe UI", 9), bg=COLOR_BG, fg=COLOR_TEXT, anchor="w")
+        self.status_label.pack(fill="x")
+
+        # Products scanned in this window, the last one on top
+        result_frame = tk.Frame(frame, bg=COLOR_FRAME_BG)
+        result_frame.pack(fill="both", expand=True, pady=(5, 0))
+        columns = ("Sifra", "Proizvod", "Promena", "Stanje")
+        self.tree = ttk.Treeview(result_frame, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("Šifra", "Proizvod", "Promena", "Stanje"), (130, 250, 80, 80)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor="w" if col == "Proizvod" else "center")
+        self.tree.tag_configure("greska", foreground=COLOR_ERROR)
+        self.tree.tag_configure("ceka", foreground=COLOR_LIGHT_TEXT)
+        tree_scroll = ttk.Scrollbar(result_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=tree_scroll.set)
+        tree_scroll.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        ModernButton(frame, text="Zatvori", bg=COLOR_ERROR, command=self.close).pack(side="bottom", pady=(10, 0))
+
+        self.bind("<F2>", lambda e: self.mode.set(1))
+        self.bind("<F3>", lambda e: self.mode.set(-1))
+        self.bind("<Escape>", lambda e: self.close())
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        # However the window goes (Zatvori, closed with other windows or
+        # with the application), scans that weren't written yet are
+        self.bind("<Destroy>", self.on_destroy, add="+")
+        self.show_status()
+
+    def on_scan(self, event=None):
+        sifra = self.entry.get()
+        self.entry.delete(0, tk.END)
+        if not sifra.strip():
+            return "break"
+        self.queue.add(sifra, self.mode.get())
+        self.show_status()
+        if self.flush_after_id is None and not self.writing:
+            self.flush_after_id = self.after(skeniranje.FLUSH_MS, self.flush)
+        return "break"
+
+    def flush(self):
+        self.flush_after_id = None
+        pending = self.queue.take()
+        if not pending:
+            return
+        self.writing = True
+        self.show_status()
+        pozadina.run(self, skeniranje.apply, pending,
+                     on_done=lambda result: self.show_written(*result),
+                     on_error=lambda e: self.show_failed(pending, e))
+
+    def written(self, delay=skeniranje.FLUSH_MS):
+        # Scans that came in while writing, or are queued again, are written next
+        self.writing = False
+        if len(self.queue) and self.flush_after_id is None:
+            self.flush_after_id = self.after(delay, self.flush)
+        self.show_status()
+
+    def retry(self, pending, e):
+        # The database was busy, the scans go back into the queue
+        for sifra, kolicina in pending.items():
+            self.queue.add(sifra, kolicina)
+            self.show_row(f"ceka-{sifra}", (sifra, f"Čeka ponovni upis ({e})", f"{kolicina:+d}", ""), ("ceka",))
+
+    def show_written(self, results, errors):
+        for result in results:
+            if self.tree.exists(f"ceka-{result.sifra}"):
+                self.tree.delete(f"ceka-{result.sifra}")
+            self.totals[result.sifra] = self.totals.get(result.sifra, 0) + result.kolicina
+            self.show_row(result.sifra, (result.sifra, result.naziv, f"{self.totals[result.sifra]:+d}",
+                                         "" if result.stanje is None else result.stanje), ())
+        retry = {error.sifra: error.kolicina for error in errors if error.retry}
+        for error in errors:
+            if not error.retry:
+                self.show_row(f"greska-{error.sifra}", (error.sifra, error.message, f"{error.kolicina:+d}", ""),
+                              ("greska",))
+        if retry:
+            self.retry(retry, "baza je zauzeta")
+        if len(retry) < len(errors):
+            self.bell()
+        self.written(skeniranje.RETRY_MS if retry else skeniranje.FLUSH_MS)
+
+    def show_failed(self, pending, e):
+        if isinstance(e, sqlite3.OperationalError):
+            # Nothing was written, e.g. the database stayed locked
+            self.retry(pending, e)
+            self.written(skeniranje.RETRY_MS)
+            return
+        for sifra, kolicina in pending.items():
+            self.show_row(f"greska-{sifra}", (sifra, f"Greška: {e}", f"{kolicina:+d}", ""), ("greska",))
+        self.bell()
+        self.written()
+
+    def show_row(self, iid, values, tags):
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values, tags=tags)
+            self.tree.move(iid, "", 0)
+        else:
+            self.tree.insert("", 0, iid=iid, values=values, tags=tags)
+
+    def show_status(self):
+        waiting = len(self.queue)
+        text = f"Skenirano proizvoda: {len(self.totals)}"
+        if waiting or self.writing:
+            text += f", upisivanje... ({waiting} na čekanju)"
+        self.status_label.config(text=text)
+
+    def close(self):
+        self.destroy()
+
+    def on_destroy(self, event):
+        # Toplevel windows also get the <Destroy> of their children
+        if event.widget is not self:
+            return
+        if self.flush_after_id is not None:
+            self.after_cancel(self.flush_after_id)
+            self.flush_after_id = None
+        pending = self.queue.take()
+        if not pending:
+            return
+        parent = self.master
+
+        def report(result):
+            results, errors = result
+            if errors:
+                messagebox.showerror("Greška", "Neka skeniranja nisu upisana:\n" + "\n".join(
+                    f"{error.sifra}: {error.message}" for error in errors), parent=parent)
+
+        # Submitted before anything else, baza.close() waits for it when
+        # the application is closing
+        future = baza.submit(skeniranje.apply, pending)
+        try:
+            pozadina.watch(parent, future, on_done=report)
+        except tk.TclError:
+            # The main window is going as well, nobody is left to tell
+            pass
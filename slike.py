@@ -0,0 +1,152 @@
+"""Product image thumbnails
+
+Originals live wherever the user picked them and can be full size camera
+photos. A small PNG is made once per image and size and kept in a cache
+directory next to the database. The cache name is a hash of the source
+path, its modification time and size, so a replaced photo gets a new
+thumbnail on its own.
+
+load() reads files and runs on the image workers from submit(). photo(),
+cached_photo() and placeholder() create Tk images and have to be called on
+the main thread.
+
+PIL is imported on first use, it isn't needed to show the main window.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import baza
+
+# Size of the image in the product details window
+DETAILS_SIZE = (150, 150)
+
+# Size of the thumbnails in the table rows
+ROW_SIZE = (24, 24)
+
+# Threads decoding images, kept apart from the database workers so
+# scrolling never waits behind a batch of photos
+IMAGE_WORKERS = 2
+
+# Directory next to the database holding the generated thumbnails
+CACHE_DIR_NAME = "slike_cache"
+
+# Most Tk images kept in memory, least recently used are dropped first
+PHOTO_CACHE_SIZE = 256
+
+_photos = OrderedDict()
+_keys = {}          # (source, size) -> key of the last thumbnail loaded for it
+_placeholders = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit(fn, *args):
+    """Run fn on an image worker, returns a concurrent.futures.Future"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS,
+                                           thread_name_prefix="slike")
+    return _executor.submit(fn, *args)
+
+
+def close():
+    """Drop queued image work, used when the application exits"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def cache_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(baza.DB_PATH)), CACHE_DIR_NAME)
+
+
+def _cache_path(key):
+    return os.path.join(cache_dir(), f"{key}.png")
+
+
+def cache_key(source, size=DETAILS_SIZE):
+    """Name of the thumbnail for source, changes whenever the file does"""
+    stat = os.stat(source)
+    ident = f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+def _make_thumbnail(source, size, path):
+    from PIL import Image
+
+    with Image.open(source) as img:
+        # JPEG files can be decoded at a fraction of their size right away
+        img.draft("RGB", size)
+        img.thumbnail(size)
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        img.save(temp_path, "PNG")
+    # Readers never see a half written file, two workers making the same
+    # thumbnail at once both end up with a complete one
+    os.replace(temp_path, path)
+
+
+def load(source, size=DETAILS_SIZE):
+    """Return (key, PIL image) of the thumbnail, making it if needed
+
+    Raises OSError if the original can't be read.
+    """
+    from PIL import Image
+
+    key = cache_key(source, size)
+    _keys[(source, size)] = key
+    if key in _photos:
+        return key, None
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        _make_thumbnail(source, size, path)
+    with Image.open(path) as img:
+        img.load()
+        return key, img
+
+
+def photo(key, image=None):
+    """Tk image for a thumbnail from load(), kept in a small LRU cache"""
+    from PIL import Image, ImageTk
+
+    cached = _photos.get(key)
+    if cached is not None:
+        _photos.move_to_end(key)
+        return cached
+    if image is None:
+        # Dropped from memory since load() looked, the small PNG is still on disk
+        with Image.open(_cache_path(key)) as img:
+            cached = ImageTk.PhotoImage(img)
+    else:
+        cached = ImageTk.PhotoImage(image)
+    _photos[key] = cached
+    if len(_photos) > PHOTO_CACHE_SIZE:
+        _photos.popitem(last=False)
+    return cached
+
+
+def cached_photo(source, size=DETAILS_SIZE):
+    """Tk image for source if it was loaded before and is still in memory"""
+    key = _keys.get((source, size))
+    if key is None or key not in _photos:
+        return None
+    return photo(key)
+
+
+def placeholder(size=ROW_SIZE):
+    """Grey square shown until a thumbnail is ready"""
+    from PIL import Image, ImageTk
+
+    image = _placeholders.get(size)
+    if image is None:
+        image = ImageTk.PhotoImage(Image.new("RGBA", size, (224, 224, 224, 255)))
+        _placeholders[size] = image
+    return image
@@ -0,0 +1,529 @@
+import tkinter as tk
+from tkinter import ttk
+from bisect import bisect_left
+
+import pozadina
+import slike
+
+# Rows read from the database at once while scrolling
+PAGE_SIZE = 200
+
+# Most rows kept in memory around the visible part of the table
+BUFFER_SIZE = 3 * PAGE_SIZE
+
+# Used until the real heading and row sizes are known
+DEFAULT_ROW_HEIGHT = 25
+
+# Style of tables showing thumbnails, rows are tall enough for the image
+THUMBNAIL_STYLE = "Slike.Treeview"
+
+# More changed rows than this are shown by reading the page again
+REFRESH_ROWS_LIMIT = 20
+
+
+def fill_buffer(query, rows, start, total, want_start, want_end):
+    """Read rows so that want_start..want_end is covered, returns (rows, start)
+
+    rows is a list of (values, key) pairs starting at position start of the
+    whole result. Runs on a database worker, rows may be changed in place.
+    """
+    want_end = min(want_end, total)
+    if want_start >= want_end:
+        return rows, start
+
+    buffer_end = start + len(rows)
+    if rows and start <= want_start and want_end <= buffer_end:
+        return rows, start
+
+    if rows and start <= want_start < buffer_end + PAGE_SIZE:
+        # Scrolling down, continue after the last row we have
+        while start + len(rows) < want_end:
+            page = query.page_after(rows[-1][1], PAGE_SIZE)
+            if not page:
+                break
+            rows.extend(page)
+    elif rows and start - PAGE_SIZE < want_end <= buffer_end:
+        # Scrolling up, continue before the first row we have
+        while start > want_start:
+            page = query.page_before(rows[0][1], PAGE_SIZE)
+            if not page:
+                start = want_start
+                break
+            rows[:0] = page
+            start -= len(page)
+    else:
+        # Jumped far away with the scrollbar
+        rows = query.page_at(want_start, max(PAGE_SIZE, want_end - want_start))
+        start = want_start
+
+    if len(rows) > BUFFER_SIZE:
+        keep_from = max(start, want_start - PAGE_SIZE)
+        rows = rows[keep_from - start:keep_from - start + BUFFER_SIZE]
+        start = keep_from
+    return rows, start
+
+
+class VirtualTable(tk.Frame):
+    """Treeview that only holds the rows currently visible on screen
+
+    Rows are read from a baza.KeysetQuery page by page as the user scrolls.
+    The Treeview never holds more than one screen of items, so opening and
+    scrolling a table costs the same with 100 or 100 000 products.
+
+    All reads run on the database workers. Until they finish the table keeps
+    showing the rows it already has, so the window never freezes.
+
+    With image_column set, that column holds an image path. It is not shown
+    as text, a thumbnail of the image is shown in the tree column instead.
+    Thumbnails are only made for rows on screen, on the image workers.
+    """
+
+    def __init__(self, master, columns, query=None, placeholder=None, bg=None,
+                 horizontal_scrollbar=True, on_reload=None, on_error=None,
+                 image_column=None, **kwargs):
+        super().__init__(master, bg=bg)
+        self.query = query
+        self.placeholder = placeholder
+        self.on_reload = on_reload      # called with the row count after every reload
+        self.on_error = on_error or pozadina.show_error
+
+        self._rows = []     # (values, key) pairs read from the database
+        self._start = 0     # position of self._rows[0] in the whole result
+        self._offset = 0    # position of the first visible row
+        self._total = 0
+        self._visible = 1
+        self._header_height = None
+        self._index = {}    # row id -> Treeview iid of the rows on screen
+        self._generation = 0    # changes whenever the buffered rows are replaced
+        self._fill_pending = False
+        self._select_id = None  # row to select once show_row() has drawn it
+
+        self.image_column = image_column
+        self.show_images = False
+        self._image_jobs = {}       # image path -> Future of its thumbnail
+        self._broken_images = set()
+
+        # Vertical scrollbar is driven by us, not by the Treeview
+        self.scrollbar_y = ttk.Scrollbar(self, command=self.yview)
+        self.scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
+
+        if horizontal_scrollbar:
+            scrollbar_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL)
+            scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
+            kwargs["xscrollcommand"] = scrollbar_x.set
+
+        displaycolumns = [column for column in columns if column != image_column]
+        self.tree = ttk.Treeview(self, columns=columns, displaycolumns=displaycolumns,
+                                 show="headings", **kwargs)
+        if horizontal_scrollbar:
+            scrollbar_x.config(command=self.tree.xview)
+        self.tree.pack(expand=True, fill="both")
+
+        if image_column is not None:
+            self._image_index = list(columns).index(image_column)
+            self.tree.column("#0", width=slike.ROW_SIZE[0] + 16, stretch=False, anchor="center")
+            self.set_show_images(True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self._scroll_by(-self._visible))
+        self.tree.bind("<Next>", lambda e: self._scroll_by(self._visible))
+        self.tree.bind("<Control-Home>", lambda e: self._scroll_to(0))
+        self.tree.bind("<Control-End>", lambda e: self._scroll_to(self._total))
+
+    @property
+    def total(self):
+        """Number of rows in the whole result, not only the visible ones"""
+        return self._total
+
+    def set_show_images(self, show):
+        """Show or hide the thumbnail column of a table with an image_column"""
+        self.show_images = bool(show) and self.image_column is not None
+        if self.show_images:
+            ttk.Style().configure(THUMBNAIL_STYLE, rowheight=slike.ROW_SIZE[1] + 6)
+            self.tree.configure(show="tree headings", style=THUMBNAIL_STYLE)
+        else:
+            self.tree.configure(show="headings", style="Treeview")
+            for future in self._image_jobs.values():
+                future.cancel()
+            self._image_jobs = {}
+        # Rows have a different height now
+        self._update_visible(self.tree.winfo_height())
+        self._render()
+
+    def set_query(self, query):
+        self.query = query
+        self.reload()
+
+    def reload(self, keep_position=False):
+        """Count the rows again and show them from the top"""
+        self._generation += 1
+        self._select_id = None
+        generation = self._generation
+        query = self.query
+        offset = self._offset if keep_position else 0
+        visible = self._visible
+
+        if query is None:
+            self._total, self._rows, self._start, self._offset = 0, [], 0, 0
+            self._render()
+            return
+
+        def load():
+            total = query.count()
+            first = max(0, min(offset, total - visible))
+            rows, start = fill_buffer(query, [], 0, total, first, first + visible)
+            return total, rows, start, first
+
+        def loaded(result):
+            if generation != self._generation:
+                return
+            self._total, self._rows, self._start, self._offset = result
+            self._render()
+            if self.on_reload is not None:
+                self.on_reload(self._total)
+
+        pozadina.run(self, load, on_done=loaded, on_error=self.on_error)
+
+    def refresh_row(self, row_id):
+        """Read a single row again after it was added, changed or deleted
+
+        Only that row is patched, the rest of the table stays as it is.
+        """
+        if not self._rows or self.query is None:
+            self.reload(keep_position=True)
+            return
+
+        generation = self._generation
+        query = self.query
+        in_buffer = self._find(row_id) is not None
+
+        def load():
+            # The row count is only needed for rows we don't have
+            return query.row(row_id), None if in_buffer else query.count()
+
+        def loaded(result):
+            if generation != self._generation or (self._find(row_id) is not None) != in_buffer:
+                # Other rows were read in the meantime, positions may be off
+                self.reload(keep_position=True)
+                return
+            self._apply_row(row_id, *result)
+
+        pozadina.run(self, load, on_done=loaded, on_error=self.on_error)
+
+    def refresh_rows(self, row_ids):
+        """refresh_row() for a few rows, reload for many or unknown ones"""
+        if not row_ids or len(row_ids) > REFRESH_ROWS_LIMIT:
+            self.reload(keep_position=True)
+            return
+        for row_id in row_ids:
+            self.refresh_row(row_id)
+
+    def show_row(self, row_id, on_missing=None):
+        """Scroll to a row and select it, without reading the table again
+
+        A row already in memory is shown right away. Otherwise its key is
+        read and the rows before it counted, then only the page around it
+        is read. on_missing() is called if the row isn't in this table.
+        """
+        position = self._find(row_id)
+        if position is not None:
+            self._show_position(self._start + position, row_id)
+            return
+        if self.query is None:
+            if on_missing is not None:
+                on_missing()
+            return
+
+        generation = self._generation
+        query = self.query
+
+        def load():
+            row = query.row(row_id)
+            return None if row is None else query.position(row[1])
+
+        def loaded(position):
+            if position is None:
+                if on_missing is not None:
+                    on_missing()
+            elif generation == self._generation:
+                self._show_position(position, row_id)
+            else:
+                # The rows were replaced meanwhile, look again
+                self.show_row(row_id, on_missing)
+
+        pozadina.run(self, load, on_done=loaded, on_error=self.on_error)
+
+    def _show_position(self, position, row_id):
+        # The row ends up in the middle of the table when possible
+        self._select_id = str(row_id)
+        self._offset = self._clamp(position - self._visible // 2)
+        self._render()
+
+    def _apply_row(self, row_id, row, total):
+        position = self._find(row_id)
+
+        if row is not None and position is not None and self._rows[position][1] == row[1]:
+            # Still at the same place in the ordering, update the values only
+            self._rows[position] = row
+            iid = self._index.get(str(row_id))
+            if iid is not None:
+                self.tree.item(iid, values=row[0], **self._image_options(row[0]))
+            return
+
+        if position is None:
+            if row is None and total == self._total:
+                # Not part of this table at all
+                return
+            if row is None or total != self._total + 1:
+                # Changed somewhere outside of the rows we have,
+                # read the visible page again to get the positions right
+                self.reload(keep_position=True)
+                return
+
+        self._generation += 1
+        try:
+            if position is not None:
+                del self._rows[position]
+                self._total -= 1
+            if row is not None:
+                self._insert_sorted(row)
+        except TypeError:
+            # Keys that can't be compared (NULL values), read the page again
+            self.reload(keep_position=True)
+            return
+
+        self._offset = self._clamp(self._offset)
+        self._render()
+
+    def _find(self, row_id):
+        row_id = str(row_id)
+        for position, (values, key) in enumerate(self._rows):
+            if str(key[-1]) == row_id:
+                return position
+        return None
+
+    def _insert_sorted(self, row):
+        key = row[1]
+        buffer_end = self._start + len(self._rows)
+        if not self._rows:
+            self._rows = [row]
+        elif key < self._rows[0][1]:
+            if self._start == 0:
+                self._rows.insert(0, row)
+            else:
+                # Lands before the rows we have, everything moves down by one
+                self._start += 1
+                self._offset += 1
+        elif key > self._rows[-1][1]:
+            if buffer_end == self._total:
+                self._rows.append(row)
+        else:
+            keys = [existing[1] for existing in self._rows]
+            self._rows.insert(bisect_left(keys, key), row)
+        self._total += 1
+
+    def show_message(self, values):
+        """Replace the table content with a single informational row"""
+        self._generation += 1
+        self._total = 0
+        self._rows = []
+        self._index = {}
+        self.tree.delete(*self.tree.get_children())
+        self.tree.insert("", "end", values=values)
+        self.scrollbar_y.set(0, 1)
+
+    def yview(self, *args):
+        """Scrollbar callback, works on rows of the whole result"""
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * self._total))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self._visible
+            self._scroll_by(amount)
+
+    def _clamp(self, offset):
+        return max(0, min(offset, self._total - self._visible))
+
+    def _scroll_to(self, offset):
+        offset = self._clamp(offset)
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+        return "break"
+
+    def _scroll_by(self, amount):
+        return self._scroll_to(self._offset + amount)
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_arrow(self, step):
+        # Moving past the first or last visible row scrolls the table
+        children = self.tree.get_children()
+        if not children:
+            return None
+        edge = children[0] if step < 0 else children[-1]
+        if self.tree.focus() != edge:
+            return None
+        self._scroll_by(step)
+        children = self.tree.get_children()
+        if children:
+            edge = children[0] if step < 0 else children[-1]
+            self.tree.selection_set(edge)
+            self.tree.focus(edge)
+        return "break"
+
+    def _on_resize(self, event):
+        if self._update_visible(event.height):
+            self._render()
+
+    def _update_visible(self, height):
+        """Count the rows that fit in height, returns True if that changed"""
+        style = self.tree.cget("style") or "Treeview"
+        row_height = int(ttk.Style().lookup(style, "rowheight") or DEFAULT_ROW_HEIGHT)
+        header_height = self._header_height or DEFAULT_ROW_HEIGHT
+        visible = max(1, (height - header_height) // row_height)
+        if visible == self._visible:
+            return False
+        self._visible = visible
+        self._offset = self._clamp(self._offset)
+        return True
+
+    def _covers(self, start, end):
+        end = min(end, self._total)
+        return start >= end or self._start <= start and end <= self._start + len(self._rows)
+
+    def _render(self):
+        if self.query is None or self._covers(self._offset, self._offset + self._visible):
+            self._draw()
+        else:
+            self._request_fill()
+        self._update_scrollbar()
+
+    def _request_fill(self):
+        """Read the rows for the current scroll position on a worker"""
+        if self._fill_pending:
+            return
+        self._fill_pending = True
+        generation = self._generation
+        want_start = self._offset
+
+        def filled(result):
+            self._fill_pending = False
+            if generation != self._generation:
+                self._render()
+                return
+            self._rows, self._start = result
+            if self._offset == want_start:
+                self._draw()
+            else:
+                # Scrolled further while the rows were read
+                self._render()
+
+        def failed(error):
+            self._fill_pending = False
+            self.on_error(error)
+
+        pozadina.run(self, fill_buffer, self.query, list(self._rows), self._start, self._total,
+                     want_start, want_start + self._visible, on_done=filled, on_error=failed)
+
+    def _draw(self):
+        selection = self.tree.selection()
+        focus = self.tree.focus()
+        self.tree.delete(*self.tree.get_children())
+        self._index = {}
+
+        if self._total == 0:
+            if self.placeholder:
+                self.tree.insert("", "end", values=self.placeholder)
+        else:
+            for values, key in self._visible_rows():
+                row_id = str(key[-1])
+                self._index[row_id] = self.tree.insert("", "end", iid=row_id, values=values,
+                                                       **self._image_options(values))
+        self._cancel_hidden_images()
+
+        # Keep the selection of rows that are still on screen
+        selection = [iid for iid in selection if self.tree.exists(iid)]
+        if self._select_id is not None and self.tree.exists(self._select_id):
+            selection = focus = self._select_id
+            self._select_id = None
+            self.tree.see(focus)
+        if selection:
+            self.tree.selection_set(selection)
+        if focus and self.tree.exists(focus):
+            self.tree.focus(focus)
+
+        children = self.tree.get_children()
+        if children and self._header_height is None:
+            bbox = self.tree.bbox(children[0])
+            if bbox:
+                self._header_height = bbox[1]
+
+    def _visible_rows(self):
+        first = self._offset - self._start
+        return self._rows[first:first + self._visible] if self._total else []
+
+    def _image_options(self, values):
+        """Treeview item options for the thumbnail of a row"""
+        if not self.show_images:
+            return {}
+        path = values[self._image_index]
+        if not path or path in self._broken_images:
+            return {"image": ""}
+        photo = slike.cached_photo(path, slike.ROW_SIZE)
+        if photo is None:
+            self._load_image(path)
+            photo = slike.placeholder(slike.ROW_SIZE)
+        return {"image": photo}
+
+    def _load_image(self, path):
+        if path in self._image_jobs:
+            return
+        self._image_jobs[path] = pozadina.watch(
+            self, slike.submit(slike.load, path, slike.ROW_SIZE),
+            on_done=lambda thumbnail: self._image_loaded(path, thumbnail),
+            on_error=lambda error: self._image_failed(path)
+        )
+
+    def _image_loaded(self, path, thumbnail):
+        self._image_jobs.pop(path, None)
+        if not self.show_images:
+            return
+        photo = slike.photo(*thumbnail)
+        for values, key in self._visible_rows():
+            iid = self._index.get(str(key[-1]))
+            if iid is not None and values[self._image_index] == path:
+                self.tree.item(iid, image=photo)
+
+    def _image_failed(self, path):
+        # Missing or unreadable file, don't try again for every redraw
+        self._image_jobs.pop(path, None)
+        self._broken_images.add(path)
+        for values, key in self._visible_rows():
+            iid = self._index.get(str(key[-1]))
+            if iid is not None and values[self._image_index] == path:
+                self.tree.item(iid, image="")
+
+    def _cancel_hidden_images(self):
+        """Drop queued thumbnails of rows that were scrolled away"""
+        if not self._image_jobs:
+            return
+        visible = {values[self._image_index] for values, key in self._visible_rows()}
+        for path, future in list(self._image_jobs.items()):
+            if path not in visible and future.cancel():
+                del self._image_jobs[path]
+
+    def _update_scrollbar(self):
+        if self._total:
+            first = self._offset / self._total
+            last = min(1.0, (self._offset + self._visible) / self._total)
+            self.scrollbar_y.set(first, last)
+        else:
+            self.scrollbar_y.set(0, 1)
@@ -0,0 +1,226 @@
+"""Import of products from CSV and Excel files
+
+Reads the columns the export writes (ID, Naziv, Kategorija, Stanje), only
+Naziv is required and the order doesn't matter. Rows are read one at a
+time and written in batches of BATCH_SIZE, each batch in a single
+transaction, so large files take little memory and the rest of the
+application can keep writing between batches. Rows that can't be imported
+are skipped and reported with their row number.
+
+The import functions block, ImportJob runs one on its own thread with
+progress reports and cancellation, like izvoz.ExportJob.
+"""
+import csv
+import os
+import threading
+from collections import namedtuple
+
+import baza
+
+# Rows written in one transaction
+BATCH_SIZE = 5000
+
+# Column names as written by the export, matched without regard to case
+COLUMNS = ("id", "naziv", "kategorija", "stanje")
+
+# Row number in the file and why the row was skipped
+RowError = namedtuple("RowError", ("row_no", "message"))
+
+ImportResult = namedtuple("ImportResult", ("added", "updated", "categories_added", "errors"))
+
+
+class Cancelled(Exception):
+    """The import was stopped before it finished"""
+
+
+def _read_csv(path, progress):
+    size = os.path.getsize(path) or 1
+    # utf-8-sig also reads files saved by Excel, which start with a BOM
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for row_no, row in enumerate(csv.reader(file, dialect), start=1):
+            yield row_no, row
+            if row_no % BATCH_SIZE == 0:
+                # Position of the underlying file, the text layer doesn't
+                # tell while it is being iterated
+                progress(file.buffer.tell(), size)
+
+
+def _read_xlsx(path, progress):
+    from openpyxl import load_workbook
+
+    # Read-only workbooks stream the rows instead of loading every cell
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row or 0
+        for row_no, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            yield row_no, row
+            if row_no % BATCH_SIZE == 0:
+                progress(row_no, total)
+    finally:
+        workbook.close()
+
+
+def read_rows(path, progress=None):
+    """Yield (row number, cells) of the first sheet, header included
+
+    progress(done, total) is called every BATCH_SIZE rows, in bytes for
+    CSV files and in rows for Excel files.
+    """
+    progress = progress or (lambda done, total: None)
+    if os.path.splitext(path)[1].lower() == ".xlsx":
+        return _read_xlsx(path, progress)
+    return _read_csv(path, progress)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _number(value):
+    """int of a cell, None for an empty cell, raises ValueError otherwise"""
+    text = _text(value)
+    if not text:
+        return None
+    number = float(text.replace(",", "."))
+    if not number.is_integer():
+        raise ValueError(text)
+    return int(number)
+
+
+def _positions(header):
+    positions = {}
+    for position, name in enumerate(header):
+        name = _text(name).lower()
+        if name in COLUMNS and name not in positions:
+            positions[name] = position
+    if "naziv" not in positions:
+        raise ValueError("Fajl mora imati kolonu Naziv")
+    return positions
+
+
+def parse_row(row_no, cells, positions):
+    """Return (row number, id, naziv, kategorija, stanje) or a RowError"""
+    def cell(name):
+        position = positions.get(name)
+        return cells[position] if position is not None and position < len(cells) else None
+
+    naziv = _text(cell("naziv"))
+    if not naziv:
+        return RowError(row_no, "Nedostaje naziv")
+    try:
+        product_id = _number(cell("id"))
+    except ValueError:
+        return RowError(row_no, f"ID nije broj: {_text(cell('id'))}")
+    try:
+        stanje = _number(cell("stanje"))
+    except ValueError:
+        return RowError(row_no, f"Stanje nije ceo broj: {_text(cell('stanje'))}")
+    if stanje is not None and stanje < 0:
+        return RowError(row_no, f"Stanje ne može biti negativno: {stanje}")
+    return row_no, product_id, naziv, _text(cell("kategorija")) or None, stanje
+
+
+def import_file(path, progress=None, cancel_event=None):
+    """Import all rows of path, returns an ImportResult
+
+    progress(rows, done, total) is called after every batch, done and
+    total as described in read_rows(). Setting cancel_event stops the
+    import after the current batch with Cancelled, batches written until
+    then stay in the database.
+    """
+    rows_read = 0
+    last_position = (0, 0)
+    added = updated = categories_added = 0
+    errors = []
+
+    def read_progress(done, total):
+        nonlocal last_position
+        last_position = (done, total)
+
+    def write(batch):
+        nonlocal added, updated, categories_added
+        if cancel_event is not None and cancel_event.is_set():
+            raise Cancelled()
+        batch_added, batch_updated, batch_categories, batch_errors = baza.import_products(batch)
+        added += batch_added
+        updated += batch_updated
+        categories_added += batch_categories
+        errors.extend(RowError(*error) for error in batch_errors)
+        if progress is not None:
+            progress(rows_read, *last_position)
+
+    rows = read_rows(path, read_progress)
+    positions = None
+    batch = []
+    for row_no, cells in rows:
+        if positions is None:
+            positions = _positions(cells)
+            continue
+        if not any(_text(value) for value in cells):
+            continue
+        rows_read += 1
+        parsed = parse_row(row_no, cells, positions)
+        if isinstance(parsed, RowError):
+            errors.append(parsed)
+        else:
+            batch.append(parsed)
+        if len(batch) >= BATCH_SIZE:
+            write(batch)
+            batch = []
+    if positions is None:
+        raise ValueError("Fajl je prazan")
+    if batch:
+        write(batch)
+
+    errors.sort()
+    return ImportResult(added, updated, categories_added, errors)
+
+
+class ImportJob(threading.Thread):
+    """Import running on its own thread
+
+    The callbacks are called on the import thread: on_progress(rows, done,
+    total) after every batch, then exactly one of on_done(result),
+    on_error(exception) or on_cancel().
+    """
+
+    def __init__(self, path, on_progress=None, on_done=None, on_error=None, on_cancel=None):
+        super().__init__(name="uvoz")
+        self.path = path
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Stop the import after the batch that is being written"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            result = import_file(self.path, self.on_progress, self._cancel_event)
+        except Cancelled:
+            if self.on_cancel is not None:
+                self.on_cancel()
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+        else:
+            if self.on_done is not None:
+                self.on_done(result)
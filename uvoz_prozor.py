@@ -0,0 +1,136 @@
+import os
+import tkinter as tk
+from tkinter import ttk
+
+import uvoz
+import pozadina
+
+# Define an orange color scheme
+COLOR_BG = "#ffffff"
+COLOR_ACCENT = "#FF8C00"  # Dark Orange
+COLOR_BUTTON = "#FF8C00"  # Dark Orange
+COLOR_BUTTON_TEXT = "#ffffff"
+COLOR_TEXT = "#333333"
+COLOR_LIGHT_TEXT = "#666666"
+COLOR_ERROR = "#e74c3c"
+
+# Most skipped rows listed in the window, the count always covers all of them
+MAX_SHOWN_ERRORS = 500
+
+class ModernButton(tk.Button):
+    def __init__(self, master=None, **kwargs):
+        # Extract specific styling params or use defaults
+        bg_color = kwargs.pop('bg', COLOR_BUTTON)
+        fg_color = kwargs.pop('fg', COLOR_BUTTON_TEXT)
+
+        # Call the parent constructor with our modified parameters
+        super().__init__(
+            master,
+            bg=bg_color,
+            fg=fg_color,
+            relief=tk.FLAT,
+            padx=10,
+            pady=4,
+            font=('Segoe UI', 9),
+            cursor="hand2",
+            activebackground=COLOR_ACCENT,
+            activeforeground=COLOR_BUTTON_TEXT,
+            **kwargs
+        )
+
+class ImportWindow(tk.Toplevel):
+    """Runs an uvoz.ImportJob and shows its progress and the skipped rows
+
+    The tables show the imported products through the dogadjaji events
+    sent by every written batch. Stopping the import keeps the batches
+    that were already written.
+    """
+
+    def __init__(self, parent, path):
+        super().__init__(parent)
+        self.title("Uvoz")
+        self.geometry("480x380")
+        self.configure(bg=COLOR_BG)
+        try:
+            self.iconbitmap("ico.ico")
+        except tk.TclError:
+            pass
+
+        frame = tk.Frame(self, bg=COLOR_BG, padx=20, pady=20)
+        frame.pack(fill="both", expand=True)
+
+        self.message_label = tk.Label(frame, text=f"Uvoz iz {os.path.basename(path)}...",
+                                      font=("Segoe UI", 10), bg=COLOR_BG, fg=COLOR_TEXT,
+                                      wraplength=440, justify="center")
+        self.message_label.pack(pady=(0, 10))
+
+        self.progress = ttk.Progressbar(frame, mode="determinate", length=440)
+        self.progress.pack(fill="x")
+
+        self.count_label = tk.Label(frame, text="", font=("Segoe UI", 9),
+                                    bg=COLOR_BG, fg=COLOR_LIGHT_TEXT)
+        self.count_label.pack(pady=(5, 10))
+
+        # Skipped rows, filled in once the import is done
+        self.errors_frame = tk.Frame(frame, bg=COLOR_BG)
+        self.errors_label = tk.Label(self.errors_frame, text="", font=("Segoe UI", 9),
+                                     bg=COLOR_BG, fg=COLOR_ERROR, anchor="w")
+        self.errors_label.pack(fill="x")
+        self.errors_list = tk.Listbox(self.errors_frame, font=("Segoe UI", 9), height=8,
+                                      bd=1, relief=tk.SOLID, fg=COLOR_ERROR)
+        errors_scroll = ttk.Scrollbar(self.errors_frame, orient="vertical", command=self.errors_list.yview)
+        self.errors_list.configure(yscrollcommand=errors_scroll.set)
+        errors_scroll.pack(side="right", fill="y")
+        self.errors_list.pack(side="left", fill="both", expand=True)
+
+        self.button = ModernButton(frame, text="Prekini", bg=COLOR_ERROR, command=self.cancel)
+        self.button.pack(side="bottom", pady=(10, 0))
+
+        self.bind("<Escape>", lambda e: self.destroy())
+        self.bind("<Destroy>", self.on_destroy)
+
+        self.job = uvoz.ImportJob(
+            path,
+            on_progress=lambda rows, done, total: pozadina.call_in_main(self, self.show_progress, rows, done, total),
+            on_done=lambda result: pozadina.call_in_main(self, self.show_done, result),
+            on_error=lambda e: pozadina.call_in_main(self, self.show_error, e),
+            on_cancel=lambda: pozadina.call_in_main(self, self.show_cancelled)
+        )
+        pozadina.start(self)
+        self.job.start()
+
+    def show_progress(self, rows, done, total):
+        self.progress.config(maximum=max(total, 1), value=done)
+        self.count_label.config(text=f"Obrađeno redova: {rows}")
+
+    def show_done(self, result):
+        self.progress.config(maximum=1, value=1)
+        self.message_label.config(text="Uvoz je završen.")
+        self.count_label.config(text=f"Dodato: {result.added}, izmenjeno: {result.updated}, "
+                                     f"novih kategorija: {result.categories_added}")
+        if result.errors:
+            self.errors_label.config(text=f"Preskočeni redovi: {len(result.errors)}")
+            for error in result.errors[:MAX_SHOWN_ERRORS]:
+                self.errors_list.insert(tk.END, f"Red {error.row_no}: {error.message}")
+            self.errors_frame.pack(fill="both", expand=True)
+        self.button.config(text="OK", bg=COLOR_BUTTON, state=tk.NORMAL, command=self.destroy)
+
+    def show_error(self, e):
+        self.message_label.config(text=f"Došlo je do greške prilikom uvoza:\n{e}", fg=COLOR_ERROR)
+        self.button.config(text="OK", bg=COLOR_BUTTON, state=tk.NORMAL, command=self.destroy)
+
+    def show_cancelled(self):
+        self.message_label.config(text="Uvoz je prekinut, već upisani redovi su sačuvani.")
+        self.button.config(text="OK", bg=COLOR_BUTTON, state=tk.NORMAL, command=self.destroy)
+
+    def cancel(self):
+        # The window stays open to tell how far the import got
+        self.job.cancel()
+        self.button.config(state=tk.DISABLED)
+        self.message_label.config(text="Prekidanje uvoza...")
+
+    def on_destroy(self, event):
+        # Also called for every child widget, closing the window (or the
+        # whole application) stops an unfinished import
+        if event.widget is self and self.job.is_alive():
+            self.job.cancel()
@@ -2,7 +2,10 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog, Toplevel, messagebox, font
 import sqlite3
-from PIL import Image, ImageTk
+import baza
+from tabela import VirtualTable
+import pozadina
+import dogadjaji
 import os
 
 # Define an orange color scheme
@@ -58,7 +61,7 @@ class VrsteFrame(tk.Frame):
                              background=COLOR_BG,
                              fieldbackground=COLOR_BG)
         
-        # Initialize database if not exists
+        # Add default categories if there are none
         self.initialize_db()
 
         # Main container with two frames
@@ -114,8 +117,9 @@ class VrsteFrame(tk.Frame):
         self.kat_frame = tk.Frame(input_content, bg=COLOR_FRAME_BG)
         self.kat_frame.grid(row=2, column=1, padx=5, pady=8, sticky="ew")
         
-        # Load existing categories for the combobox
-        self.categories = self.load_categories()
+        # Existing categories are filled in by initialize_db
+        self.category_ids = {}
+        self.categories = []
         self.combo_kategorija = ttk.Combobox(
             self.kat_frame,
             values=self.categories,
@@ -124,6 +128,11 @@ class VrsteFrame(tk.Frame):
         )
         self.combo_kategorija.pack(side=tk.LEFT, fill="x", expand=True, padx=(0, 10))
 
+        # Sifra field, barcode or SKU, can be scanned in
+        tk.Label(input_content, text="Šifra:", font=("Segoe UI", 10), bg=COLOR_FRAME_BG, fg=COLOR_TEXT).grid(row=3, column=0, padx=5, pady=8, sticky="w")
+        self.entry_sifra = tk.Entry(input_content, font=("Segoe UI", 10), bd=1, relief=tk.SOLID)
+        self.entry_sifra.grid(row=3, column=1, padx=5, pady=8, sticky="ew")
+
         # Configure column weights
         input_content.columnconfigure(1, weight=1)
 
@@ -143,24 +152,19 @@ class VrsteFrame(tk.Frame):
                               relief=tk.GROOVE)
         self.frame_table.pack(expand=True, fill="both", pady=10)
 
-        # Add a scrollbar to the treeview
-        tree_frame = tk.Frame(self.frame_table, bg=COLOR_FRAME_BG)
-        tree_frame.pack(expand=True, fill="both", padx=5, pady=5)
-        
-        # Add vertical scrollbar
-        scrollbar_y = ttk.Scrollbar(tree_frame)
-        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Add horizontal scrollbar
-        scrollbar_x = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL)
-        scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        self.tree = ttk.Treeview(tree_frame, columns=("ID", "Naziv", "Kategorija"), show="headings",
-                                yscrollcommand=scrollbar_y.set, 
-                                xscrollcommand=scrollbar_x.set)
-        scrollbar_y.config(command=self.tree.yview)
-        scrollbar_x.config(command=self.tree.xview)
-        self.tree.pack(expand=True, fill="both")
+        # Thumbnails can be turned off, e.g. when the images are on a slow network drive
+        self.show_images = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.frame_table, text="Prikaži slike", variable=self.show_images,
+                       command=lambda: self.table.set_show_images(self.show_images.get()),
+                       font=("Segoe UI", 9), bg=COLOR_FRAME_BG, fg=COLOR_TEXT,
+                       activebackground=COLOR_FRAME_BG).pack(anchor="e", padx=5)
+
+        # Table with scrollbars, rows are read from the database as the user scrolls
+        self.table = VirtualTable(self.frame_table, ("ID", "Naziv", "Kategorija", "Slika"),
+                                  baza.product_list_query(with_image=True), bg=COLOR_FRAME_BG,
+                                  on_error=self.load_data_error, image_column="Slika")
+        self.table.pack(expand=True, fill="both", padx=5, pady=5)
+        self.tree = self.table.tree
         
         # Configure columns
         self.tree.heading("ID", text="ID")
@@ -174,59 +178,45 @@ class VrsteFrame(tk.Frame):
 
         self.tree.bind("<Button-3>", self.on_right_click)
 
+        # Changes made anywhere in the application only refresh the rows they touch
+        pozadina.subscribe(self, (dogadjaji.PRODUCT_ADDED, dogadjaji.PRODUCT_UPDATED,
+                                  dogadjaji.PRODUCT_DELETED),
+                           lambda event: self.table.refresh_rows(event.ids))
+        pozadina.subscribe(self, (dogadjaji.CATEGORY_CHANGED, dogadjaji.EXTERNAL_CHANGE),
+                           lambda event: self.refresh())
+
         self.load_data()
     
     def initialize_db(self):
-        """Create tables if they don't exist"""
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                
-                # Create zalihe table if not exists
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS zalihe (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        naziv TEXT NOT NULL,
-                        slika TEXT,
-                        kategorija TEXT NOT NULL
-                    )
-                ''')
-                
-                # Create categories table if not exists
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS kategorije (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        naziv TEXT NOT NULL UNIQUE
-                    )
-                ''')
-                
-                # Add some default categories if the table is empty
-                cursor.execute("SELECT COUNT(*) FROM kategorije")
-                if cursor.fetchone()[0] == 0:
-                    default_categories = ["Alati", "Srafovi"]
-                    for category in default_categories:
-                        cursor.execute("INSERT INTO kategorije (naziv) VALUES (?)", (category,))
-                
-                conn.commit()
-        except Exception as e:
+        """Add the default categories if there are none, then load them"""
+        def init():
+            baza.ensure_default_categories()
+            return baza.fetch_category_ids()
+
+        def failed(e):
             messagebox.showerror("Database Error", f"Failed to initialize database: {e}")
 
-    def load_categories(self):
-        """Load categories from the database"""
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT naziv FROM kategorije ORDER BY naziv")
-                categories = [row[0] for row in cursor.fetchall()]
-                return categories
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load categories: {e}")
-            return []
+        pozadina.run(self, init, on_done=self.set_categories, on_error=failed)
+
+    def set_categories(self, category_ids):
+        """Remember the loaded categories, products store the category id"""
+        self.category_ids = category_ids
+        self.categories = list(category_ids)
+        self.combo_kategorija['values'] = self.categories
+
+    def load_categories_error(self, e):
+        messagebox.showerror("Error", f"Failed to load categories: {e}")
     
     def update_categories_combobox(self):
         """Update the categories combobox with fresh data"""
-        self.categories = self.load_categories()
-        self.combo_kategorija['values'] = self.categories
+        pozadina.run(self, baza.fetch_category_ids, on_done=self.set_categories,
+                     on_error=self.load_categories_error)
+
+    def add_category_error(self, e):
+        if isinstance(e, sqlite3.IntegrityError):
+            messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
+        else:
+            messagebox.showerror("Greška", f"Greška pri dodavanju kategorije: {e}")
     
     def add_category(self):
         """Open dialog to add a new category"""
@@ -264,20 +254,16 @@ class VrsteFrame(tk.Frame):
                 messagebox.showerror("Greška", "Unesite naziv kategorije")
                 return
             
-            try:
-                with sqlite3.connect("garage.db") as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("INSERT INTO kategorije (naziv) VALUES (?)", (naziv,))
-                    conn.commit()
-                
-                self.update_categories_combobox()
+            def add():
+                baza.add_category(naziv)
+                return baza.fetch_category_ids()
+
+            def added(category_ids):
+                self.set_categories(category_ids)
                 self.combo_kategorija.set(naziv)  # Select the newly added category
                 popup.destroy()
-                
-            except sqlite3.IntegrityError:
-                messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
-            except Exception as e:
-                messagebox.showerror("Greška", f"Greška pri dodavanju kategorije: {e}")
+
+            pozadina.run(popup, add, on_done=added, on_error=self.add_category_error)
         
         # Buttons
         btn_frame = tk.Frame(main_frame, bg=COLOR_BG, pady=10)
@@ -306,12 +292,13 @@ class VrsteFrame(tk.Frame):
     def add_item(self):
         naziv = self.entry_naziv.get().strip()
         kategorija = self.combo_kategorija.get().strip()
+        sifra = self.entry_sifra.get().strip()
         
         if not naziv:
             messagebox.showerror("Greška", "Unesite naziv")
             return
         
-        if not kategorija:
+        if kategorija not in self.category_ids:
             messagebox.showerror("Greška", "Izaberite ili kreirajte kategoriju")
             return
         
@@ -319,42 +306,37 @@ class VrsteFrame(tk.Frame):
             messagebox.showerror("Greška", "Izaberite sliku")
             return
         
-        try:
-            # Insert the new item into the `zalihe` table
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("INSERT INTO zalihe (naziv, slika, kategorija) VALUES (?, ?, ?)", 
-                               (naziv, self.img_path, kategorija))
-                conn.commit()
-            
+        def added(product_id):
             # Clear the form
             self.entry_naziv.delete(0, tk.END)
+            self.entry_sifra.delete(0, tk.END)
             self.combo_kategorija.set('')
             self.img_path = None
             self.img_path_label.config(text="Nema slike")
             
-            self.load_data()  # Reload the table
             messagebox.showinfo("Uspeh", "Stavka uspešno dodata!")
 
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri dodavanju stavke: {e}")
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError) and "sifra" in str(e):
+                messagebox.showerror("Greška", f"Već postoji proizvod sa šifrom {sifra}")
+            else:
+                messagebox.showerror("Greška", f"Greška pri dodavanju stavke: {e}")
+
+        # Insert the new item into the `zalihe` table
+        pozadina.run(self, baza.add_product, naziv, self.img_path, self.category_ids[kategorija], sifra,
+                     on_done=added, on_error=failed)
 
     def load_data(self):
-        # Clear existing rows in the treeview
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        # Fetch data from the database and show it in the table
+        self.table.reload(keep_position=True)
 
-        # Fetch data from the database and insert into the treeview
-        try:
-            with sqlite3.connect("garage.db") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, naziv, kategorija FROM zalihe")
-                records = cursor.fetchall()
-
-                for record in records:
-                    self.tree.insert("", "end", values=record)
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri učitavanju podataka: {e}")
+    def refresh(self):
+        """Read the data again after it was changed while this view was hidden"""
+        self.load_data()
+        self.update_categories_combobox()
+
+    def load_data_error(self, e):
+        messagebox.showerror("Greška", f"Greška pri učitavanju podataka: {e}")
     
     def on_right_click(self, event):
         item = self.tree.identify_row(event.y)
@@ -370,22 +352,23 @@ class VrsteFrame(tk.Frame):
         menu.post(event.x_root, event.y_root)
 
     def edit_item(self, product_id):
-        # Get the current values for the item
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT naziv, kategorija, slika FROM zalihe WHERE id = ?", (product_id,))
-            item = cursor.fetchone()
-        
+        # Get the current values for the item and an updated list of categories
+        def load():
+            return baza.fetch_product_for_edit(product_id), baza.fetch_category_ids()
+
+        pozadina.run(self, load, on_done=lambda result: self.open_edit_popup(product_id, *result))
+
+    def open_edit_popup(self, product_id, item, category_ids):
         if not item:
             messagebox.showerror("Greška", "Stavka nije pronađena")
             return
 
-        naziv, kategorija, slika = item
+        naziv, kategorija, slika, sifra = item
 
         # Open an edit popup
         popup = Toplevel(self.master)
         popup.title("Izmeni stavku")
-        popup.geometry("400x300")
+        popup.geometry("400x340")
         popup.configure(bg=COLOR_BG)
         popup.grab_set()  # Make the popup modal
         
@@ -420,9 +403,8 @@ class VrsteFrame(tk.Frame):
         edit_kat_frame = tk.Frame(inner_frame, bg=COLOR_FRAME_BG)
         edit_kat_frame.grid(row=1, column=1, sticky="ew", pady=8, padx=5)
         
-        # Get updated list of categories
-        categories = self.load_categories()
-        combo_kategorija = ttk.Combobox(edit_kat_frame, values=categories, font=("Segoe UI", 10))
+        self.set_categories(category_ids)
+        combo_kategorija = ttk.Combobox(edit_kat_frame, values=self.categories, font=("Segoe UI", 10))
         combo_kategorija.set(kategorija)
         combo_kategorija.pack(side=tk.LEFT, fill="x", expand=True, padx=(0, 10))
         
@@ -463,22 +445,18 @@ class VrsteFrame(tk.Frame):
                     messagebox.showerror("Greška", "Unesite naziv kategorije")
                     return
                 
-                try:
-                    with sqlite3.connect("garage.db") as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("INSERT INTO kategorije (naziv) VALUES (?)", (new_cat_name,))
-                        conn.commit()
-                    
+                def add():
+                    baza.add_category(new_cat_name)
+                    return baza.fetch_category_ids()
+
+                def added(category_ids):
                     # Update categories in the edit dialog
-                    updated_categories = self.load_categories()
-                    combo_kategorija['values'] = updated_categories
+                    self.set_categories(category_ids)
+                    combo_kategorija['values'] = self.categories
                     combo_kategorija.set(new_cat_name)
                     popup_add_cat.destroy()
-                    
-                except sqlite3.IntegrityError:
-                    messagebox.showerror("Greška", "Kategorija sa ovim nazivom već postoji")
-                except Exception as e:
-                    messagebox.showerror("Greška", f"Greška pri dodavanju kategorije: {e}")
+
+                pozadina.run(popup_add_cat, add, on_done=added, on_error=self.add_category_error)
             
             # Buttons
             cat_btn_frame = tk.Frame(cat_main_frame, bg=COLOR_BG, pady=10)
@@ -518,6 +496,12 @@ class VrsteFrame(tk.Frame):
         upload_btn = ModernButton(img_frame, text="Učitaj", command=update_edit_image)
         upload_btn.pack(side=tk.LEFT, padx=(0, 10))
 
+        # Sifra field
+        tk.Label(inner_frame, text="Šifra:", bg=COLOR_FRAME_BG, fg=COLOR_TEXT, font=("Segoe UI", 10)).grid(row=3, column=0, sticky="w", pady=8)
+        entry_sifra = tk.Entry(inner_frame, font=("Segoe UI", 10), bd=1, relief=tk.SOLID)
+        entry_sifra.insert(0, sifra or "")
+        entry_sifra.grid(row=3, column=1, sticky="ew", pady=8, padx=5)
+
         # Configure column weights
         inner_frame.columnconfigure(1, weight=1)
 
@@ -525,12 +509,13 @@ class VrsteFrame(tk.Frame):
             new_naziv = entry_naziv.get().strip()
             new_kategorija = combo_kategorija.get().strip()
             new_img_path = edit_img_path.get()
+            new_sifra = entry_sifra.get().strip()
             
             if not new_naziv:
                 messagebox.showerror("Greška", "Unesite naziv")
                 return
                 
-            if not new_kategorija:
+            if new_kategorija not in self.category_ids:
                 messagebox.showerror("Greška", "Izaberite ili kreirajte kategoriju")
                 return
                 
@@ -538,19 +523,20 @@ class VrsteFrame(tk.Frame):
                 messagebox.showerror("Greška", "Izaberite sliku")
                 return
 
-            # Update the item in the database
-            try:
-                with sqlite3.connect("garage.db") as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE zalihe SET naziv = ?, kategorija = ?, slika = ? WHERE id = ?",
-                                (new_naziv, new_kategorija, new_img_path, product_id))
-                    conn.commit()
-
-                self.load_data()  # Reload table with updated data
+            def updated(result):
                 popup.destroy()
                 messagebox.showinfo("Uspeh", "Stavka uspešno izmenjena!")
-            except Exception as e:
-                messagebox.showerror("Greška", f"Greška pri izmeni stavke: {e}")
+
+            def failed(e):
+                if isinstance(e, sqlite3.IntegrityError) and "sifra" in str(e):
+                    messagebox.showerror("Greška", f"Već postoji proizvod sa šifrom {new_sifra}")
+                else:
+                    messagebox.showerror("Greška", f"Greška pri izmeni stavke: {e}")
+
+            # Update the item in the database
+            pozadina.run(popup, baza.update_product, product_id, new_naziv,
+                         self.category_ids[new_kategorija], new_img_path, new_sifra,
+                         on_done=updated, on_error=failed)
 
         # Buttons frame
         btn_frame = tk.Frame(main_frame, bg=COLOR_BG)
@@ -566,31 +552,23 @@ class VrsteFrame(tk.Frame):
         # Confirm deletion
         confirm = messagebox.askyesno("Potvrda brisanja", "Da li ste sigurni da želite da obrišete ovu stavku?")
         if confirm:
-            try:
-                with sqlite3.connect("garage.db") as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM zalihe WHERE id = ?", (product_id,))
-                    conn.commit()
-
-                self.load_data()  # Reload table
+            def deleted(result):
                 messagebox.showinfo("Uspeh", "Stavka uspešno obrisana!")
 
-            except Exception as e:
+            def failed(e):
                 messagebox.showerror("Greška", f"Greška pri brisanju stavke: {e}")
 
+            pozadina.run(self, baza.delete_product, product_id, on_done=deleted, on_error=failed)
+
     def delete_all_categories(self):
         """For testing purposes - deletes all categories"""
         confirm = messagebox.askyesno("Confirm Delete", "Are you sure you want to delete ALL categories?")
         if confirm:
-            try:
-                with sqlite3.connect("garage.db") as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("DELETE FROM kategorije")
-                    conn.commit()
-                self.update_categories_combobox()
-            except Exception as e:
+            def failed(e):
                 messagebox.showerror("Error", f"Error while deleting categories: {e}")
 
+            pozadina.run(self, baza.delete_all_categories, on_error=failed)
+
 if __name__ == "__main__":
     root = tk.Tk()
     root.title("Upravljanje zalihama")
@@ -603,4 +581,4 @@ if __name__ == "__main__":
         pass
     
     app = VrsteFrame(root)
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
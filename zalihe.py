@@ -1,11 +1,16 @@
 import tkinter as tk
 from tkinter import ttk
 import sqlite3
-from tkinter import Toplevel, Label, Button, Frame, messagebox
-from PIL import Image, ImageTk
-import time  # For retrying the database operation
-import os
-import pandas as pd
+import baza
+from tabela import VirtualTable
+import pozadina
+import dogadjaji
+from tkinter import Toplevel, Label, Button, Frame, messagebox, filedialog
+import slike
+from izvoz_prozor import ExportWindow
+from prijem_prozor import ReceiptWindow
+from skeniranje_prozor import ScanWindow
+from uvoz_prozor import ImportWindow
 from datetime import datetime
 
 # Define an orange color scheme
@@ -17,6 +22,12 @@ COLOR_BUTTON_TEXT = "#ffffff"
 COLOR_TEXT = "#333333"
 COLOR_LIGHT_TEXT = "#666666"
 
+# Pause in typing (ms) before the search box queries the database
+SEARCH_DELAY_MS = 200
+
+# Shorter input matches too many products to be useful
+SEARCH_MIN_LENGTH = 2
+
 class ModernButton(tk.Button):
     def __init__(self, master=None, **kwargs):
         # Extract specific styling params or use defaults
@@ -42,6 +53,9 @@ class ZaliheFrame(tk.Frame):
     def __init__(self, master=None):
         super().__init__(master, bg=COLOR_BG)
         self.master = master
+        # Search, detail and stock popups, closed after a stock change.
+        # Receipt, scan, import and export windows are left alone.
+        self.popups = []
         self.pack(expand=True, fill="both", padx=20, pady=10)
         
         # Configure custom styles
@@ -63,7 +77,11 @@ class ZaliheFrame(tk.Frame):
         
         # Use grid for better control of element placement
         title_frame.columnconfigure(0, weight=1)  # Title will expand
-        title_frame.columnconfigure(1, weight=0)  # Button stays fixed size
+        title_frame.columnconfigure(1, weight=0)  # Search box stays fixed size
+        title_frame.columnconfigure(2, weight=0)  # Buttons stay fixed size
+        title_frame.columnconfigure(3, weight=0)
+        title_frame.columnconfigure(4, weight=0)
+        title_frame.columnconfigure(5, weight=0)
         
         tk.Label(title_frame, 
                 text="Zalihe", 
@@ -71,9 +89,55 @@ class ZaliheFrame(tk.Frame):
                 bg=COLOR_BG, 
                 fg=COLOR_TEXT).grid(row=0, column=0, sticky="w")
         
-        # Export button positioned on the right
+        # Search box, results are shown while typing
+        search_frame = tk.Frame(title_frame, bg=COLOR_BG)
+        search_frame.grid(row=0, column=1, sticky="e", padx=(0, 10))
+        
+        tk.Label(search_frame, text="Pretraga:", 
+                font=("Segoe UI", 10), 
+                bg=COLOR_BG, 
+                fg=COLOR_TEXT).pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.search_entry = tk.Entry(search_frame, font=("Segoe UI", 10), bd=1, relief=tk.SOLID, width=30)
+        self.search_entry.pack(side=tk.LEFT)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        self.search_entry.bind("<Return>", self.on_search_enter)
+        self.search_entry.bind("<Down>", self.focus_search_results)
+        self.search_entry.bind("<Escape>", lambda e: self.hide_search_results())
+
+        # Barcode scanners type the code followed by Enter
+        tk.Label(search_frame, text="Šifra:", 
+                font=("Segoe UI", 10), 
+                bg=COLOR_BG, 
+                fg=COLOR_TEXT).pack(side=tk.LEFT, padx=(10, 5))
+        self.scan_entry = tk.Entry(search_frame, font=("Segoe UI", 10), bd=1, relief=tk.SOLID, width=16)
+        self.scan_entry.pack(side=tk.LEFT)
+        self.scan_entry.bind("<Return>", self.on_scan)
+        
+        # Dropdown list with the best matches, placed under the search box
+        self.search_results = []
+        self.search_after_id = None
+        self.search_list = tk.Listbox(self, 
+                                     font=("Segoe UI", 10),
+                                     bd=1,
+                                     relief=tk.SOLID,
+                                     height=10,
+                                     selectbackground=COLOR_ACCENT,
+                                     selectforeground=COLOR_BUTTON_TEXT,
+                                     activestyle="none")
+        self.search_list.bind("<Return>", self.open_search_result)
+        self.search_list.bind("<Double-1>", self.open_search_result)
+        self.search_list.bind("<Escape>", lambda e: self.hide_search_results())
+        
+        # Goods receipt, scanning, import and export buttons positioned on the right
+        receipt_btn = ModernButton(title_frame, text="Prijem robe", command=lambda: ReceiptWindow(self.master))
+        receipt_btn.grid(row=0, column=2, sticky="e", padx=(0, 5))
+        scan_btn = ModernButton(title_frame, text="Skeniranje", command=lambda: ScanWindow(self.master))
+        scan_btn.grid(row=0, column=3, sticky="e", padx=(0, 5))
+        import_btn = ModernButton(title_frame, text="Uvoz", command=self.import_file)
+        import_btn.grid(row=0, column=4, sticky="e", padx=(0, 5))
         export_btn = ModernButton(title_frame, text="Export", command=self.export_to_excel)
-        export_btn.grid(row=0, column=1, sticky="e")
+        export_btn.grid(row=0, column=5, sticky="e")
         
         # Create frame for the treeview
         self.frame_table = tk.LabelFrame(self, text="Pregled Zaliha", 
@@ -84,25 +148,19 @@ class ZaliheFrame(tk.Frame):
                               relief=tk.GROOVE)
         self.frame_table.pack(expand=True, fill="both", pady=10)
         
-        # Create a frame for the treeview and scrollbars
-        tree_frame = tk.Frame(self.frame_table, bg=COLOR_FRAME_BG)
-        tree_frame.pack(expand=True, fill="both", padx=5, pady=5)
-        
-        # Add vertical scrollbar
-        scrollbar_y = ttk.Scrollbar(tree_frame)
-        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Add horizontal scrollbar
-        scrollbar_x = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL)
-        scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        # Create the treeview
-        self.tree = ttk.Treeview(tree_frame, columns=("ID", "Naziv", "Kategorija", "Stanje"), show="headings",
-                                yscrollcommand=scrollbar_y.set,
-                                xscrollcommand=scrollbar_x.set)
-        scrollbar_y.config(command=self.tree.yview)
-        scrollbar_x.config(command=self.tree.xview)
-        self.tree.pack(expand=True, fill="both")
+        # Thumbnails can be turned off, e.g. when the images are on a slow network drive
+        self.show_images = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.frame_table, text="Prikaži slike", variable=self.show_images,
+                       command=lambda: self.table.set_show_images(self.show_images.get()),
+                       font=("Segoe UI", 9), bg=COLOR_FRAME_BG, fg=COLOR_TEXT,
+                       activebackground=COLOR_FRAME_BG).pack(anchor="e", padx=5)
+
+        # Create the table, rows are read from the database as the user scrolls
+        self.table = VirtualTable(self.frame_table, ("ID", "Naziv", "Kategorija", "Stanje", "Slika"),
+                                  baza.products_query(with_image=True), bg=COLOR_FRAME_BG,
+                                  image_column="Slika")
+        self.table.pack(expand=True, fill="both", padx=5, pady=5)
+        self.tree = self.table.tree
 
         # Configure columns
         self.tree.heading("ID", text="ID", command=lambda: self.on_column_click("ID"))
@@ -119,38 +177,109 @@ class ZaliheFrame(tk.Frame):
         self.tree.bind("<Button-3>", self.on_right_click)  # Right-click binding
         self.tree.bind("<Double-1>", self.on_double_click)  # Double-click binding
 
+        # Changes made anywhere in the application only refresh the rows they touch
+        pozadina.subscribe(self, dogadjaji.PRODUCT_EVENTS,
+                           lambda event: self.table.refresh_rows(event.ids))
+        pozadina.subscribe(self, (dogadjaji.CATEGORY_CHANGED, dogadjaji.EXTERNAL_CHANGE),
+                           lambda event: self.reload_data())
+
         self.load_data()
 
     def export_to_excel(self):
-        try:
-            # Create Documents/Garaza directory if it doesn't exist
-            documents_path = os.path.join(os.path.expanduser("~"), "Documents")
-            garaza_path = os.path.join(documents_path, "Garaza")
-            
-            if not os.path.exists(garaza_path):
-                os.makedirs(garaza_path)
-            
-            # Get current date and time for filename
-            current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"export-{current_datetime}.xlsx"
-            filepath = os.path.join(garaza_path, filename)
-            
-            # Get data from database
-            with sqlite3.connect("garage.db") as conn:
-                # Read directly into pandas DataFrame
-                df = pd.read_sql_query("SELECT id, naziv, kategorija, stanje FROM zalihe", conn)
-                
-                # Rename columns for better Excel formatting
-                df.columns = ['ID', 'Naziv', 'Kategorija', 'Stanje']
-                
-                # Export to Excel
-                df.to_excel(filepath, index=False, engine='openpyxl')
-            
-            # Show success message
-            messagebox.showinfo("Uspešno", f"Podaci uspešno exportovani u:\n{filepath}")
-            
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška prilikom exportovanja: {str(e)}")
+        # Get current date and time for filename
+        current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = f"export-{current_datetime}.xlsx"
+        
+        # Written on its own thread into Documents/Garaza, with a progress bar
+        ExportWindow(self.master, baza.products_query(), ('ID', 'Naziv', 'Kategorija', 'Stanje'), filename)
+
+    def import_file(self):
+        # Same columns as the export writes, only Naziv is required
+        path = filedialog.askopenfilename(filetypes=[("Excel i CSV fajlovi", "*.xlsx;*.csv")])
+        if path:
+            ImportWindow(self.master, path)
+
+    def on_search_key(self, event):
+        # Keys that move around or pick a result don't start a new search
+        if event.keysym in ("Return", "Down", "Up", "Escape"):
+            return
+        # Debounce, only search once the user stops typing for a moment
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        text = self.search_entry.get().strip()
+        if len(text) < SEARCH_MIN_LENGTH:
+            self.hide_search_results()
+            return
+
+        pozadina.run(self, baza.search_products, text,
+                     on_done=lambda results: self.show_search_results(text, results))
+
+    def show_search_results(self, text, results):
+        # Typing went on while the search ran, a newer search will follow
+        if text != self.search_entry.get().strip():
+            return
+
+        self.search_results = results
+        if not self.search_results:
+            self.hide_search_results()
+            return
+
+        self.search_list.delete(0, tk.END)
+        for id_, naziv, kategorija, stanje in self.search_results:
+            self.search_list.insert(tk.END, f"{naziv}  ({kategorija}, stanje: {stanje})")
+        self.search_list.config(height=min(10, len(self.search_results)))
+        self.search_list.place(in_=self.search_entry, relx=1, rely=1, relwidth=1.6, y=2, anchor="ne")
+        self.search_list.lift()
+
+    def hide_search_results(self):
+        self.search_list.place_forget()
+
+    def focus_search_results(self, event=None):
+        if self.search_list.winfo_ismapped():
+            self.search_list.focus_set()
+            self.search_list.selection_clear(0, tk.END)
+            self.search_list.selection_set(0)
+            self.search_list.activate(0)
+
+    def open_search_result(self, event=None):
+        selection = self.search_list.curselection()
+        if selection:
+            product_id = self.search_results[selection[0]][0]
+            self.hide_search_results()
+            self.show_product_details(product_id)
+
+    def on_search_enter(self, event=None):
+        # Enter shows all matching products, not only the best few
+        naziv = self.search_entry.get().strip()
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        self.hide_search_results()
+        if naziv:
+            self.open_filtered_table(naziv_filter=naziv)
+
+    def on_scan(self, event=None):
+        # The field is emptied right away, so the next scan can follow
+        sifra = self.scan_entry.get().strip()
+        self.scan_entry.delete(0, tk.END)
+        if not sifra:
+            return
+
+        def not_found():
+            self.bell()
+            messagebox.showerror("Greška", f"Ne postoji proizvod sa šifrom {sifra}.")
+
+        def found(product_id):
+            if product_id is None:
+                not_found()
+            else:
+                self.table.show_row(product_id, on_missing=not_found)
+
+        pozadina.run(self, baza.find_product_by_sifra, sifra, on_done=found)
 
     def on_double_click(self, event):
         item = self.tree.selection()
@@ -159,11 +288,7 @@ class ZaliheFrame(tk.Frame):
             self.show_product_details(product_id)
 
     def load_data(self):
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, naziv, kategorija, stanje FROM zalihe")
-            for record in cursor.fetchall():
-                self.tree.insert("", "end", values=record)
+        self.table.reload()
 
     def on_column_click(self, column):
         if column == "ID":
@@ -175,6 +300,7 @@ class ZaliheFrame(tk.Frame):
 
     def open_id_popup(self):
         popup = tk.Toplevel(self.master)
+        self.popups.append(popup)
         popup.iconbitmap("ico.ico")
         popup.title("Pretraga po ID-u")
         popup.geometry("300x150")
@@ -210,18 +336,29 @@ class ZaliheFrame(tk.Frame):
         popup.bind("<Escape>", lambda e: popup.destroy())
 
     def show_product_details(self, product_id, parent_popup=None):
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM zalihe WHERE id = ?", (product_id,))
-            record = cursor.fetchone()
+        def load():
+            record = baza.fetch_product(product_id)
+            thumbnail = None
+            if record and record[2]:
+                # Cached thumbnail instead of decoding the original photo
+                try:
+                    thumbnail = slike.load(record[2])
+                except Exception:
+                    thumbnail = None
+            return record, thumbnail
 
+        pozadina.run(self, load,
+                     on_done=lambda result: self.show_product_record(*result, parent_popup))
+
+    def show_product_record(self, record, thumbnail, parent_popup=None):
         if record:
-            id_, naziv, slika, kategorija, stanje = record
+            id_, naziv, slika, kategorija, stanje, sifra = record
 
             dp = Toplevel(self.master)
+            self.popups.append(dp)
             dp.title(f"Proizvod {id_}")
             dp.iconbitmap("ico.ico")
-            dp.geometry("650x400")
+            dp.geometry("650x440")
             dp.configure(bg=COLOR_BG)
             dp.resizable(False, False)
             dp.grab_set()
@@ -242,7 +379,7 @@ class ZaliheFrame(tk.Frame):
             d = Frame(content, bg=COLOR_BG)
             d.grid(row=0, column=0, sticky="n")
 
-            for i, (label, value) in enumerate([("ID:", id_), ("Naziv:", naziv),
+            for i, (label, value) in enumerate([("ID:", id_), ("Šifra:", sifra or "-"), ("Naziv:", naziv),
                                                 ("Kategorija:", kategorija), ("Stanje:", stanje)]):
                 tk.Label(d, text=label, font=("Segoe UI", 12, "bold"), 
                        bg=COLOR_BG, fg=COLOR_TEXT).grid(row=i, column=0, sticky="w", pady=8)
@@ -259,9 +396,9 @@ class ZaliheFrame(tk.Frame):
             # Handle image display
             if slika:
                 try:
-                    img = Image.open(slika)
-                    img.thumbnail((150, 150))
-                    img_tk = ImageTk.PhotoImage(img)
+                    if thumbnail is None:
+                        raise OSError(f"Ne mogu da učitam {slika}")
+                    img_tk = slike.photo(*thumbnail)
                     tk.Label(img_frame, image=img_tk, bg=COLOR_FRAME_BG).pack(padx=5, pady=5)
                     dp.img_ref = img_tk  # Keep a reference to prevent garbage collection
                 except Exception as e:
@@ -279,11 +416,15 @@ class ZaliheFrame(tk.Frame):
             
             ok_btn = ModernButton(btn_frame, text="OK", 
                                 command=lambda: [dp.destroy(), parent_popup.destroy() if parent_popup else None])
-            ok_btn.pack()
+            ok_btn.pack(side="left")
+
+            ModernButton(btn_frame, text="Istorija stanja",
+                         command=lambda: self.show_stock_history(id_, naziv, dp)).pack(side="left", padx=(10, 0))
             
         else:
             # Error popup when product not found
             error = Toplevel(self.master)
+            self.popups.append(error)
             error.title("Greška")
             error.geometry("300x150")
             error.configure(bg=COLOR_BG)
@@ -299,8 +440,45 @@ class ZaliheFrame(tk.Frame):
                                command=lambda: [error.destroy(), parent_popup.destroy() if parent_popup else None])
             ok_btn.pack()
 
+    def show_stock_history(self, product_id, naziv, parent):
+        """Every change of stanje of a product, as written to promene_stanja"""
+        window = Toplevel(parent)
+        window.title(f"Istorija stanja - {naziv}")
+        window.geometry("520x450")
+        window.configure(bg=COLOR_BG)
+        try:
+            window.iconbitmap("ico.ico")
+        except tk.TclError:
+            pass
+        window.grab_set()
+
+        tk.Label(window, text=f"Istorija stanja: {naziv}",
+                 font=("Segoe UI", 12, "bold"), bg=COLOR_BG, fg=COLOR_TEXT).pack(anchor="w", padx=20, pady=(15, 0))
+        count_label = tk.Label(window, text="", font=("Segoe UI", 10), bg=COLOR_BG, fg=COLOR_LIGHT_TEXT)
+        count_label.pack(anchor="w", padx=20)
+
+        columns = ("ID", "Vreme", "Promena", "Razlog")
+        table = VirtualTable(window, columns, baza.movements_query(product_id), bg=COLOR_FRAME_BG,
+                             on_reload=lambda total: count_label.config(text=f"Ukupno promena: {total}"))
+        table.pack(expand=True, fill="both", padx=20, pady=10)
+        for col, width in zip(columns, (60, 160, 80, 100)):
+            table.tree.heading(col, text=col)
+            table.tree.column(col, width=width, anchor="center")
+        table.reload()
+
+        # New changes are new rows, the table is read again to show them
+        def on_stock_changed(event):
+            if not event.ids or product_id in event.ids:
+                table.reload(keep_position=True)
+
+        pozadina.subscribe(window, (dogadjaji.STOCK_CHANGED, dogadjaji.PRODUCT_DELETED,
+                                    dogadjaji.EXTERNAL_CHANGE), on_stock_changed)
+
+        ModernButton(window, text="Zatvori", command=window.destroy).pack(pady=(0, 10))
+
     def open_naziv_popup(self):
         popup = tk.Toplevel(self.master)
+        self.popups.append(popup)
         popup.title("Pretraga po Nazivu")
         popup.geometry("300x150")
         popup.configure(bg=COLOR_BG)
@@ -339,17 +517,16 @@ class ZaliheFrame(tk.Frame):
         popup.bind("<Escape>", lambda e: popup.destroy())
 
     def open_kategorija_popup(self):
-        # Get unique categories from database
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT kategorija FROM zalihe")
-            categories = [row[0] for row in cursor.fetchall()]
-        
+        # Get categories that have products
+        pozadina.run(self, baza.fetch_used_categories, on_done=self.show_kategorija_popup)
+
+    def show_kategorija_popup(self, categories):
         if not categories:
             messagebox.showinfo("Info", "Nema dostupnih kategorija u bazi.")
             return
             
         popup = tk.Toplevel(self.master)
+        self.popups.append(popup)
         popup.title("Pretraga po Kategoriji")
         popup.geometry("300x250")
         popup.configure(bg=COLOR_BG)
@@ -383,13 +560,13 @@ class ZaliheFrame(tk.Frame):
         scrollbar.config(command=listbox.yview)
         
         # Insert categories into listbox
-        for category in categories:
+        for category_id, category in categories:
             listbox.insert(tk.END, category)
 
         def search():
             selection = listbox.curselection()
             if selection:
-                category = listbox.get(selection[0])
+                category = categories[selection[0]]
                 popup.destroy()
                 self.open_filtered_table(kategorija_filter=category)
             else:
@@ -410,7 +587,9 @@ class ZaliheFrame(tk.Frame):
         popup.bind("<Escape>", lambda e: popup.destroy())
 
     def open_filtered_table(self, naziv_filter=None, kategorija_filter=None):
+        # kategorija_filter is an (id, naziv) pair
         window = Toplevel(self.master)
+        self.popups.append(window)
         window.title("Rezultati pretrage")
         window.geometry("700x400")
         window.iconbitmap("ico.ico")
@@ -421,7 +600,7 @@ class ZaliheFrame(tk.Frame):
         if naziv_filter:
             title_text = f"Rezultati pretrage za naziv: '{naziv_filter}'"
         elif kategorija_filter:
-            title_text = f"Rezultati pretrage za kategoriju: '{kategorija_filter}'"
+            title_text = f"Rezultati pretrage za kategoriju: '{kategorija_filter[1]}'"
         else:
             title_text = "Rezultati pretrage"
             
@@ -433,6 +612,13 @@ class ZaliheFrame(tk.Frame):
                 bg=COLOR_BG, 
                 fg=COLOR_TEXT).pack(anchor="w")
 
+        # Result count, filled in once the table is loaded
+        count_label = tk.Label(title_frame, text="", 
+                font=("Segoe UI", 10), 
+                bg=COLOR_BG, 
+                fg=COLOR_LIGHT_TEXT)
+        count_label.pack(anchor="w")
+
         # Frame for the treeview
         tree_frame = tk.LabelFrame(window, text="Pronađeni proizvodi", 
                               font=("Segoe UI", 10), 
@@ -442,25 +628,15 @@ class ZaliheFrame(tk.Frame):
                               relief=tk.GROOVE)
         tree_frame.pack(expand=True, fill="both", padx=20, pady=10)
         
-        # Create a frame for the treeview and scrollbars
-        inner_frame = tk.Frame(tree_frame, bg=COLOR_FRAME_BG)
-        inner_frame.pack(expand=True, fill="both", padx=5, pady=5)
-        
-        # Add vertical scrollbar
-        scrollbar_y = ttk.Scrollbar(inner_frame)
-        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Add horizontal scrollbar
-        scrollbar_x = ttk.Scrollbar(inner_frame, orient=tk.HORIZONTAL)
-        scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-
-        # Create the filtered tree
-        tree = ttk.Treeview(inner_frame, columns=("ID", "Naziv", "Kategorija", "Stanje"), show="headings",
-                           yscrollcommand=scrollbar_y.set,
-                           xscrollcommand=scrollbar_x.set)
-        scrollbar_y.config(command=tree.yview)
-        scrollbar_x.config(command=tree.xview)
-        tree.pack(expand=True, fill="both")
+        # Create the filtered table
+        if naziv_filter:
+            query = baza.naziv_search_query(naziv_filter)
+        else:
+            query = baza.kategorija_query(kategorija_filter[0])
+        table = VirtualTable(tree_frame, ("ID", "Naziv", "Kategorija", "Stanje"), query, bg=COLOR_FRAME_BG,
+                             on_reload=lambda total: count_label.config(text=f"Ukupno pronađeno: {total}"))
+        table.pack(expand=True, fill="both", padx=5, pady=5)
+        tree = table.tree
 
         # Configure columns
         for col in ("ID", "Naziv", "Kategorija", "Stanje"):
@@ -473,24 +649,11 @@ class ZaliheFrame(tk.Frame):
         tree.column("Stanje", width=80, anchor="center")
 
         # Get results from database
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-
-            if naziv_filter:
-                cursor.execute("SELECT id, naziv, kategorija, stanje FROM zalihe WHERE naziv LIKE ?", ('%' + naziv_filter + '%',))
-            elif kategorija_filter:
-                cursor.execute("SELECT id, naziv, kategorija, stanje FROM zalihe WHERE kategorija = ?", (kategorija_filter,))
-            results = cursor.fetchall()
-
-        # Insert results into the tree
-        for record in results:
-            tree.insert("", "end", values=record)
-
-        # Show result count in the title
-        tk.Label(title_frame, text=f"Ukupno pronađeno: {len(results)}", 
-                font=("Segoe UI", 10), 
-                bg=COLOR_BG, 
-                fg=COLOR_LIGHT_TEXT).pack(anchor="w")
+        table.reload()
+        pozadina.subscribe(window, dogadjaji.PRODUCT_EVENTS,
+                           lambda event: table.refresh_rows(event.ids))
+        pozadina.subscribe(window, (dogadjaji.CATEGORY_CHANGED, dogadjaji.EXTERNAL_CHANGE),
+                           lambda event: table.reload(keep_position=True))
 
         # Button at the bottom
         button_frame = tk.Frame(window, bg=COLOR_BG)
@@ -547,9 +710,15 @@ class ZaliheFrame(tk.Frame):
         menu.post(event.x_root, event.y_root)
 
     def save_status(self, product_id):
+        # Dohvati trenutno stanje iz baze
+        pozadina.run(self, baza.fetch_stock, product_id,
+                     on_done=lambda result: self.open_status_popup(product_id, result))
+
+    def open_status_popup(self, product_id, result):
         popup = tk.Toplevel(self.master)
-        popup.title("Unesite količinu")
-        popup.geometry("300x150")
+        self.popups.append(popup)
+        popup.title("Promena stanja")
+        popup.geometry("380x190")
         popup.iconbitmap("ico.ico")
         popup.configure(bg=COLOR_BG)
         popup.grab_set()
@@ -559,23 +728,14 @@ class ZaliheFrame(tk.Frame):
         frame = tk.Frame(popup, bg=COLOR_BG, padx=20, pady=20)
         frame.pack(expand=True, fill="both")
 
-        tk.Label(frame, text="Unesite broj količine:", 
+        # Only shown, the change itself doesn't depend on it
+        current_status = str(result) if result is not None else "0"
+        tk.Label(frame, text=f"Trenutno stanje: {current_status}. Unesite količinu:", 
                 font=("Segoe UI", 10), 
                 bg=COLOR_BG, 
                 fg=COLOR_TEXT).pack(pady=(0, 10))
 
-        # Dohvati trenutno stanje iz baze
-        conn = sqlite3.connect("garage.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT stanje FROM zalihe WHERE id = ?", (product_id,))
-        result = cursor.fetchone()
-        conn.close()
-
-        # Podrazumevana vrednost (npr. 0 ako nije nađeno)
-        current_status = str(result[0]) if result else "0"
-
         entry_status = tk.Entry(frame, font=("Segoe UI", 10), bd=1, relief=tk.SOLID)
-        entry_status.insert(0, current_status)
         entry_status.pack(fill="x", pady=(0, 15))
         
         # Error label that will be shown if input is invalid
@@ -583,82 +743,106 @@ class ZaliheFrame(tk.Frame):
                              bg=COLOR_BG, fg="#e74c3c")
         error_label.pack()
 
-        def update_status(event=None):
+        def read_quantity():
             try:
-                new_status = int(entry_status.get())  # Ensure it's a number
-                if new_status < 0:
-                    error_label.config(text="Količina ne može biti negativna")
-                    return
-                self.update_product_status(product_id, new_status)
-                popup.destroy()
+                quantity = int(entry_status.get())  # Ensure it's a number
             except ValueError:
                 # Show an error if input is not a valid number
                 error_label.config(text="Molimo unesite važeći broj")
+                return None
+            if quantity < 0:
+                error_label.config(text="Količina ne može biti negativna")
+                return None
+            return quantity
+
+        def change_status(sign):
+            quantity = read_quantity()
+            if quantity:
+                self.adjust_product_status(product_id, sign * quantity)
+                popup.destroy()
+            elif quantity == 0:
+                error_label.config(text="Unesite količinu veću od 0")
+
+        def set_status():
+            quantity = read_quantity()
+            if quantity is not None:
+                self.update_product_status(product_id, quantity)
+                popup.destroy()
 
         button_frame = tk.Frame(frame, bg=COLOR_BG)
         button_frame.pack(pady=(5, 0))
         
-        update_btn = ModernButton(button_frame, text="Ažuriraj", command=update_status)
-        update_btn.pack(side=tk.LEFT, padx=5)
+        add_btn = ModernButton(button_frame, text="+ Dodaj", command=lambda: change_status(1))
+        add_btn.pack(side=tk.LEFT, padx=5)
+
+        remove_btn = ModernButton(button_frame, text="- Oduzmi", command=lambda: change_status(-1))
+        remove_btn.pack(side=tk.LEFT, padx=5)
+
+        # Overwrites what other stations changed in the meantime, for stocktaking
+        set_btn = ModernButton(button_frame, text="Postavi", bg=COLOR_LIGHT_TEXT, command=set_status)
+        set_btn.pack(side=tk.LEFT, padx=5)
         
         cancel_btn = ModernButton(button_frame, text="Odustani", bg="#e74c3c", command=popup.destroy)
         cancel_btn.pack(side=tk.LEFT, padx=5)
 
-        entry_status.bind("<Return>", update_status)
+        entry_status.bind("<Return>", lambda event: change_status(1))
         entry_status.focus()
         popup.bind("<Escape>", lambda e: popup.destroy())
 
     def update_product_status(self, product_id, new_status):
-        for _ in range(3):  # Retry 3 times
-            try:
-                # Open connection within the try block
-                conn = sqlite3.connect("garage.db")
-                cursor = conn.cursor()
-
-                # Check if the product exists before attempting to update
-                cursor.execute("SELECT 1 FROM zalihe WHERE id = ?", (product_id,))
-                if cursor.fetchone() is None:
-                    messagebox.showerror("Greška", f"Proizvod sa ID {product_id} ne postoji.")
-                    conn.close()
-                    return
-
-                # Perform the update query
-                cursor.execute("UPDATE zalihe SET stanje = ? WHERE id = ?", (new_status, product_id))
-                conn.commit()
-                conn.close()  # Close the connection after commit
-
-                # Close all open windows except the main one
-                self.close_all_windows()
-
-                # Show success message
-                messagebox.showinfo("Uspeh", f"Stanje proizvoda je ažurirano na {new_status}.")
-                
-                self.reload_data()
-
-                break  # If update is successful, exit loop
-            except sqlite3.OperationalError:
-                time.sleep(1)  # Wait for a second and retry if database is locked
-            except Exception as e:
+        # A locked database is waited on by the connection itself (busy timeout)
+        def updated(found):
+            # Nothing is updated if the product doesn't exist
+            if not found:
+                messagebox.showerror("Greška", f"Proizvod sa ID {product_id} ne postoji.")
+                return
+
+            # Close all open windows except the main one
+            self.close_all_windows()
+
+            # Show success message, the row itself is updated by the
+            # STOCK_CHANGED event
+            messagebox.showinfo("Uspeh", f"Stanje proizvoda je ažurirano na {new_status}.")
+
+        def failed(e):
+            messagebox.showerror("Greška", f"Greška pri ažuriranju: {e}")
+
+        pozadina.run(self, baza.set_stock, product_id, new_status, on_done=updated, on_error=failed)
+
+    def adjust_product_status(self, product_id, delta):
+        # One UPDATE on the database, stations changing the same product
+        # at the same time don't overwrite each other
+        def adjusted(new_status):
+            if new_status is None:
+                messagebox.showerror("Greška", f"Proizvod sa ID {product_id} ne postoji.")
+                return
+
+            self.close_all_windows()
+            messagebox.showinfo("Uspeh", f"Stanje proizvoda je sada {new_status}.")
+
+        def failed(e):
+            if isinstance(e, sqlite3.IntegrityError):
+                messagebox.showerror("Greška", "Na stanju nema dovoljno proizvoda.")
+            else:
                 messagebox.showerror("Greška", f"Greška pri ažuriranju: {e}")
-                break
+
+        pozadina.run(self, baza.adjust_stock, product_id, delta, on_done=adjusted, on_error=failed)
 
     def close_all_windows(self):
-        # Close all child windows (popups, detail views, etc.) except the main window
-        for window in self.master.winfo_children():
-            if isinstance(window, Toplevel):  # Toplevel windows are child windows
+        # Close the popups opened from this view (search, details, stock)
+        for window in self.popups:
+            if window.winfo_exists():
                 window.destroy()
+        self.popups.clear()
 
     def reload_data(self):
-        # Clear the existing rows in the Treeview
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        # Re-load the data from the database, staying at the same scroll position
+        self.table.reload(keep_position=True)
 
-        # Re-load the data from the database and update the Treeview
-        with sqlite3.connect("garage.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, naziv, kategorija, stanje FROM zalihe")
-            for record in cursor.fetchall():
-                self.tree.insert("", "end", values=record)
+    def refresh(self):
+        """Read the data again after it was changed while this view was hidden"""
+        self.hide_search_results()
+        self.reload_data()
 
 
 #
@@ -669,4 +853,4 @@ if __name__ == "__main__":
     try:
         root.iconbitmap("icon.ico")  # Replace with your icon path if you have one
     except:
-        pass
\ No newline at end of file
+        pass